@@ -5,6 +5,7 @@ API v1 Router - Main entry point for all API endpoints.
 from fastapi import APIRouter
 
 from app.api.v1.endpoints import (
+    exports,
     merchants,
     payments,
     retry_config,
@@ -20,6 +21,8 @@ router.include_router(merchants.router, prefix="/merchants", tags=["Merchants"])
 
 router.include_router(payments.router, prefix="/payments", tags=["Payments"])
 
+router.include_router(exports.router, prefix="/exports", tags=["Exports"])
+
 router.include_router(
     retry_config.router, prefix="/retry-config", tags=["Retry Configuration"]
 )
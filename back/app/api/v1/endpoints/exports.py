@@ -0,0 +1,62 @@
+"""
+Export endpoints - stream full payment and audit log exports.
+"""
+
+from datetime import datetime
+from typing import Literal
+from uuid import UUID
+
+from fastapi import APIRouter, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select
+
+from app.models.payment import PaymentStatus
+from app.services.export_formats import MEDIA_TYPES
+from app.services.exports import (
+    audit_logs_export_query,
+    payments_export_query,
+    stream_export,
+)
+
+router = APIRouter()
+
+ExportFormat = Literal["ndjson", "csv"]
+
+
+def _export_response(
+    query: Select, name: str, export_format: ExportFormat, compress: bool
+) -> StreamingResponse:
+    filename = f"{name}.{export_format}" + (".gz" if compress else "")
+    return StreamingResponse(
+        stream_export(query, export_format, compress),
+        media_type="application/gzip" if compress else MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.get("/payments")
+async def export_payments(
+    format: ExportFormat = Query("ndjson", description="ndjson or csv"),
+    gzip: bool = Query(False, description="Compress the export"),
+    merchant_id: UUID | None = Query(None, description="Filter by merchant"),
+    status: PaymentStatus | None = Query(None, description="Filter by status"),
+    created_from: datetime | None = Query(None, description="created_at >= this"),
+    created_to: datetime | None = Query(None, description="created_at < this"),
+):
+    """Stream every matching payment, oldest first."""
+    query = payments_export_query(merchant_id, status, created_from, created_to)
+    return _export_response(query, "payments", format, gzip)
+
+
+@router.get("/audit-logs")
+async def export_audit_logs(
+    format: ExportFormat = Query("ndjson", description="ndjson or csv"),
+    gzip: bool = Query(False, description="Compress the export"),
+    merchant_id: UUID | None = Query(None, description="Filter by merchant"),
+    event_type: str | None = Query(None, description="Filter by event type"),
+    created_from: datetime | None = Query(None, description="created_at >= this"),
+    created_to: datetime | None = Query(None, description="created_at < this"),
+):
+    """Stream every matching retry audit log, oldest first."""
+    query = audit_logs_export_query(merchant_id, event_type, created_from, created_to)
+    return _export_response(query, "retry_audit_logs", format, gzip)
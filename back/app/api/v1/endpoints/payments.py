@@ -2,34 +2,114 @@
 Payments endpoints - CRUD and management for payments.
 """
 
-from typing import List
+from typing import List, Literal
 from uuid import UUID
 
-from fastapi import APIRouter, HTTPException, Query, status
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
 
-from app.core.database import SessionDep
+from app.core.config import settings
+from app.core.database import ReadSessionDep, SessionDep
 from app.models.payment import PaymentRead, PaymentStatus
-from app.services.audit_logs import get_log_audits_by_payment_id
-from app.services.payments import filter_payments, get_payment_by_id
-from app.services.retry_jobs import get_retry_job_by_payment_id
+from app.services.audit_logs import AUDIT_LOG_COLUMNS, get_log_audits_by_payment_id
+from app.services.ingest_records import (
+    BodyTooLarge,
+    IngestResult,
+    RejectedLine,
+    decode_body,
+    parse_records,
+)
+from app.services.json_rows import encode_json, encode_rows, row_dicts
+from app.services.payment_ingest import ingest_failed_payments, split_records
+from app.services.payments import (
+    PAYMENT_READ_COLUMNS,
+    filter_payments,
+    get_payment_by_id,
+)
+from app.services.retry_jobs import RETRY_JOB_COLUMNS, get_retry_job_by_payment_id
 
 router = APIRouter()
 
 
 @router.get("/", response_model=List[PaymentRead])
 async def list_payments(
-    session: SessionDep,
+    session: ReadSessionDep,
     merchant_id: UUID | None = Query(None, description="Filter by merchant"),
     status: PaymentStatus | None = Query(None, description="Filter by status"),
-    limit: int = Query(50, le=100),
+    limit: int = Query(50, ge=1, le=100),
+    cursor: str | None = Query(None, description="X-Next-Cursor of the previous page"),
 ):
-    """List payments with optional filters."""
-    return await filter_payments(
+    """
+    List payments with optional filters, newest first.
+
+    When there are more results, the X-Next-Cursor header holds the cursor
+    for the next page.
+    """
+    payments, next_cursor = await filter_payments(
         session=session,
         merchant_id=merchant_id,
         status=status,
         limit=limit,
+        cursor=cursor,
+    )
+    # Rows are encoded directly; response_model only documents the schema
+    response = Response(
+        content=encode_rows(PAYMENT_READ_COLUMNS, payments),
+        media_type="application/json",
     )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response
+
+
+@router.post("/ingest", response_model=IngestResult)
+async def ingest_payments(
+    request: Request,
+    session: SessionDep,
+    format: Literal["ndjson", "csv"] = Query("ndjson", description="ndjson or csv"),
+):
+    """
+    Bulk-load failed payments from an NDJSON or CSV body.
+
+    Each valid record becomes a failed payment with its first retry job
+    scheduled as in POST /simulate/failure, all in one transaction. Lines
+    that fail validation, or name an unknown merchant, are returned in
+    `rejected`. Accepts Content-Encoding: gzip; bodies over
+    INGEST_MAX_BODY_BYTES once decompressed are rejected with 413.
+
+    Ingested jobs only run on the native scheduler (n8n is not notified),
+    so the endpoint answers 409 while RETRY_NATIVE_SCHEDULING is off.
+    """
+    if not settings.native_scheduling:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Ingested retries need RETRY_NATIVE_SCHEDULING=true",
+        )
+    try:
+        text = decode_body(
+            await request.body(),
+            gzipped=request.headers.get("content-encoding") == "gzip",
+            max_bytes=settings.INGEST_MAX_BODY_BYTES,
+        )
+    except BodyTooLarge as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    lines = text.splitlines(keepends=True)
+
+    rejected: list[RejectedLine] = []
+    records = list(split_records(parse_records(lines, format), rejected))
+    if len(records) > settings.INGEST_MAX_RECORDS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {settings.INGEST_MAX_RECORDS} records per request",
+        )
+
+    result = await ingest_failed_payments(session, records)
+    await session.commit()
+    result.rejected = sorted(rejected + result.rejected, key=lambda r: r.line)
+    return result
 
 
 @router.get("/{payment_id}", response_model=PaymentRead)
@@ -49,7 +129,7 @@ async def get_payment(
 @router.get("/{payment_id}/retry-history")
 async def get_payment_retry_history(
     payment_id: UUID,
-    session: SessionDep,
+    session: ReadSessionDep,
 ):
     """Get retry history for a specific payment."""
 
@@ -59,4 +139,13 @@ async def get_payment_retry_history(
     # Get audit logs
     logs = await get_log_audits_by_payment_id(session, payment_id)
 
-    return {"payment_id": str(payment_id), "retry_jobs": jobs, "audit_logs": logs}
+    return Response(
+        content=encode_json(
+            {
+                "payment_id": str(payment_id),
+                "retry_jobs": row_dicts(RETRY_JOB_COLUMNS, jobs),
+                "audit_logs": row_dicts(AUDIT_LOG_COLUMNS, logs),
+            }
+        ),
+        media_type="application/json",
+    )
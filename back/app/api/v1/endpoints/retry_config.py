@@ -5,16 +5,16 @@ Retry Configuration endpoints - Merchant retry settings.
 from uuid import UUID
 
 from fastapi import APIRouter, HTTPException, status
-from sqlmodel import select
 
 from app.core.database import SessionDep
+from app.models.payment import FailureType
 from app.models.retry_config import (
-    MerchantRetryConfig,
     RetryConfigRead,
     RetryConfigUpdate,
 )
 from app.services.retry_config import (
     get_config_by_merchant_id,
+    get_policy_by_merchant_id,
     update_retry_config_by_merchant_id,
 )
 
@@ -62,14 +62,9 @@ async def preview_retry_settings(
     Preview what would happen with current retry settings.
     Returns estimated recovery rates based on configuration.
     """
-    result = await session.exec(
-        select(MerchantRetryConfig).where(
-            MerchantRetryConfig.merchant_id == merchant_id
-        )
-    )
-    config = result.one_or_none()
+    policy = await get_policy_by_merchant_id(session, merchant_id)
 
-    if not config:
+    if not policy:
         raise HTTPException(status_code=404, detail="Retry config not found")
 
     # Estimated recovery rates by failure type (from PRD data)
@@ -84,10 +79,7 @@ async def preview_retry_settings(
     breakdown = []
 
     for failure_type, data in recovery_rates.items():
-        enabled_field = f"{failure_type}_enabled"
-        is_enabled = getattr(config, enabled_field, False)
-
-        if is_enabled and config.retry_enabled:
+        if policy.allows(FailureType(failure_type)):
             recoverable = data["rate"] * data["pct_of_failures"] * 100
             total_recoverable += recoverable
             breakdown.append(
@@ -110,8 +102,8 @@ async def preview_retry_settings(
 
     return {
         "merchant_id": str(merchant_id),
-        "retry_enabled": config.retry_enabled,
-        "max_attempts": config.max_attempts,
+        "retry_enabled": policy.retry_enabled,
+        "max_attempts": policy.max_attempts,
         "estimated_total_recovery": f"{total_recoverable:.1f}%",
         "message": f"With these settings, approximately {total_recoverable:.1f}% of failed payments could be recovered",
         "breakdown": breakdown,
@@ -3,24 +3,56 @@ Retry Logic endpoints - Core retry processing logic.
 These endpoints are called by n8n to execute the retry logic in Python.
 """
 
-import random
-from datetime import datetime
+import math
+import time
+from datetime import datetime, timedelta
 from typing import Optional
 from uuid import UUID
 
 from fastapi import APIRouter, HTTPException, status
-from pydantic import BaseModel
-from sqlmodel import select
+from pydantic import BaseModel, Field
 
+from app.core.config import settings
 from app.core.database import SessionDep
 from app.models.audit_log import RetryAuditLog
-from app.models.payment import FailureType, PaymentStatus
-from app.models.retry_config import MerchantRetryConfig
-from app.services.payments import get_payment_by_id
-from app.services.retry_config import get_config_by_merchant_id
+from app.models.payment import FailureType
+from app.services.audit_logs import audit_writer
+from app.services.audit_partitions import audit_partition_maintenance
+from app.services.config_listener import config_listener
+from app.services.payments import (
+    get_payment_by_id,
+    transition_payment_after_attempt,
+)
+from app.services.replica_monitor import replica_monitor
+from app.services.retry_execution import (
+    RetryAttempt,
+    card_limiter,
+    execute_retry_batch,
+    processor_breakers,
+    processor_limiter,
+)
+from app.services.retry_jobs import defer_pending_jobs_for_processor
+from app.services.retry_config import (
+    config_cache,
+    get_policies_by_merchant_ids,
+    get_policy_by_merchant_id,
+)
+from app.services.retry_logic import (
+    NON_RETRIABLE_TYPES,
+    PROCESSOR_FAULT_TYPES,
+    SUCCESS_RATES,
+    TRANSITION_EVENT_TYPES,
+    build_result_message,
+    parse_failure_type,
+    simulate_processor_retry,
+)
+from app.services.retry_policy import DEFAULT_RETRY_POLICY, RetryPolicy
 
 router = APIRouter()
 
+# Upper bound for items accepted by the batch endpoints
+MAX_BATCH_ITEMS = 1000
+
 
 # ============================================
 # Request/Response Models
@@ -47,6 +79,20 @@ class ClassifyFailureResponse(BaseModel):
     max_attempts: int
 
 
+class ClassifyFailureBatchRequest(BaseModel):
+    """Request to classify many payment failures at once."""
+
+    items: list[ClassifyFailureRequest] = Field(
+        min_length=1, max_length=MAX_BATCH_ITEMS
+    )
+
+
+class ClassifyFailureBatchResponse(BaseModel):
+    """Per-item classification results, in request order."""
+
+    results: list[ClassifyFailureResponse]
+
+
 class ExecuteRetryRequest(BaseModel):
     """Request to execute a retry attempt."""
 
@@ -70,6 +116,25 @@ class ExecuteRetryResponse(BaseModel):
     next_attempt: Optional[int]
 
 
+class ExecuteRetryBatchRequest(BaseModel):
+    """Request to execute many retry attempts and apply their outcomes."""
+
+    items: list[ExecuteRetryRequest] = Field(min_length=1, max_length=MAX_BATCH_ITEMS)
+
+
+class ExecuteRetryBatchItem(ExecuteRetryResponse):
+    """Per-attempt result, including the payment status transition applied."""
+
+    new_status: Optional[str]
+    event_logged: Optional[str]
+
+
+class ExecuteRetryBatchResponse(BaseModel):
+    """Per-attempt results, in request order."""
+
+    results: list[ExecuteRetryBatchItem]
+
+
 class UpdatePaymentStatusRequest(BaseModel):
     """Request to update payment status after retry."""
 
@@ -80,45 +145,23 @@ class UpdatePaymentStatusRequest(BaseModel):
     result_message: str
 
 
-# ============================================
-# Success rates by failure type (from PRD)
-# ============================================
-
-SUCCESS_RATES = {
-    FailureType.INSUFFICIENT_FUNDS: 0.20,  # 20% success
-    FailureType.CARD_DECLINED: 0.15,  # 15% success
-    FailureType.NETWORK_TIMEOUT: 0.60,  # 60% success
-    FailureType.PROCESSOR_DOWNTIME: 0.80,  # 80% success
-    FailureType.UNKNOWN: 0.10,  # 10% success
-    FailureType.FRAUD: 0.0,  # Never succeeds (non-retriable)
-    FailureType.EXPIRED: 0.0,  # Never succeeds (non-retriable)
-}
-
-# Non-retriable failure types
-NON_RETRIABLE_TYPES = {FailureType.FRAUD, FailureType.EXPIRED}
-
-
 # ============================================
 # Endpoints
 # ============================================
 
 
-@router.post("/classify", response_model=ClassifyFailureResponse)
-async def classify_failure(
+def _classify(
     request: ClassifyFailureRequest,
-    session: SessionDep,
-):
+    policy: RetryPolicy | None,
+) -> tuple[ClassifyFailureResponse, RetryAuditLog | None]:
     """
-    Classify a payment failure and determine if it should be retried.
+    Classify one failure against its merchant retry policy.
 
-    This is called by n8n after receiving a payment failure webhook.
-    Returns whether the failure is retriable and the retry configuration.
+    Returns the response and, for retriable failures, the "classified"
+    audit log to persist.
     """
     # Parse failure type
-    try:
-        failure_type = FailureType(request.failure_type)
-    except ValueError:
-        failure_type = FailureType.UNKNOWN
+    failure_type = parse_failure_type(request.failure_type)
 
     # Check if failure type is retriable
     is_retriable = failure_type not in NON_RETRIABLE_TYPES
@@ -132,12 +175,9 @@ async def classify_failure(
             retry_enabled=False,
             delay_minutes=0,
             max_attempts=0,
-        )
+        ), None
 
-    # Get merchant retry configuration
-    config = await get_config_by_merchant_id(session, request.merchant_id)
-
-    if not config:
+    if not policy:
         return ClassifyFailureResponse(
             payment_id=request.payment_id,
             failure_type=failure_type.value,
@@ -146,10 +186,10 @@ async def classify_failure(
             retry_enabled=False,
             delay_minutes=0,
             max_attempts=0,
-        )
+        ), None
 
     # Check if retry is enabled globally
-    if not config.retry_enabled:
+    if not policy.retry_enabled:
         return ClassifyFailureResponse(
             payment_id=request.payment_id,
             failure_type=failure_type.value,
@@ -158,16 +198,12 @@ async def classify_failure(
             retry_enabled=False,
             delay_minutes=0,
             max_attempts=0,
-        )
+        ), None
 
     # Check if retry is enabled for this specific failure type
-    failure_type_enabled_field = f"{failure_type.value}_enabled"
-    failure_type_delay_field = f"{failure_type.value}_delay"
+    rule = policy.rule(failure_type)
 
-    is_enabled_for_type = getattr(config, failure_type_enabled_field, False)
-    delay_minutes = getattr(config, failure_type_delay_field, 60)
-
-    if not is_enabled_for_type:
+    if not rule.enabled:
         return ClassifyFailureResponse(
             payment_id=request.payment_id,
             failure_type=failure_type.value,
@@ -176,7 +212,7 @@ async def classify_failure(
             retry_enabled=False,
             delay_minutes=0,
             max_attempts=0,
-        )
+        ), None
 
     # Log classification
     audit_log = RetryAuditLog(
@@ -186,12 +222,10 @@ async def classify_failure(
         failure_type=failure_type,
         metadata_json={
             "is_retriable": True,
-            "delay_minutes": delay_minutes,
-            "max_attempts": config.max_attempts,
+            "delay_minutes": rule.delay_minutes,
+            "max_attempts": rule.max_attempts,
         },
     )
-    session.add(audit_log)
-    await session.commit()
 
     return ClassifyFailureResponse(
         payment_id=request.payment_id,
@@ -199,8 +233,77 @@ async def classify_failure(
         is_retriable=True,
         reason="Failure is eligible for retry",
         retry_enabled=True,
-        delay_minutes=delay_minutes,
-        max_attempts=config.max_attempts,
+        delay_minutes=rule.delay_minutes,
+        max_attempts=rule.max_attempts,
+    ), audit_log
+
+
+@router.post("/classify", response_model=ClassifyFailureResponse)
+async def classify_failure(
+    request: ClassifyFailureRequest,
+    session: SessionDep,
+):
+    """
+    Classify a payment failure and determine if it should be retried.
+
+    This is called by n8n after receiving a payment failure webhook.
+    Returns whether the failure is retriable and the retry configuration.
+    """
+    # Non-retriable types are answered without touching the database
+    policy = None
+    if parse_failure_type(request.failure_type) not in NON_RETRIABLE_TYPES:
+        policy = await get_policy_by_merchant_id(session, request.merchant_id)
+
+    response, audit_log = _classify(request, policy)
+
+    if audit_log and audit_writer.record(session, audit_log):
+        await session.commit()
+
+    return response
+
+
+@router.post("/classify-batch", response_model=ClassifyFailureBatchResponse)
+async def classify_failure_batch(
+    request: ClassifyFailureBatchRequest,
+    session: SessionDep,
+):
+    """
+    Classify many payment failures in one call.
+
+    Loads every needed merchant retry policy in at most one query and writes all
+    "classified" audit logs in one bulk insert. Results are returned in
+    the same order as the request items.
+    """
+    merchant_ids = {
+        item.merchant_id
+        for item in request.items
+        if parse_failure_type(item.failure_type) not in NON_RETRIABLE_TYPES
+    }
+    policies = await get_policies_by_merchant_ids(session, merchant_ids)
+
+    results = []
+    audit_logs = []
+    for item in request.items:
+        response, audit_log = _classify(item, policies.get(item.merchant_id))
+        results.append(response)
+        if audit_log:
+            audit_logs.append(audit_log)
+
+    if audit_writer.record(session, *audit_logs):
+        await session.commit()
+
+    return ClassifyFailureBatchResponse(results=results)
+
+
+async def _acquire_processor_slot(session: SessionDep, processor: str) -> bool:
+    """Take a call slot for `processor`, waiting without holding a connection."""
+    if processor_limiter.try_acquire(processor):
+        return True
+    # End the payment lookup's transaction so its connection goes back to
+    # the pool for the up to PROCESSOR_LIMIT_MAX_WAIT_SECONDS spent waiting
+    await session.commit()
+    return await processor_limiter.acquire(
+        processor, settings.PROCESSOR_LIMIT_MAX_WAIT_SECONDS
     )
 
 
@@ -215,46 +318,108 @@ async def execute_retry(
     This simulates calling the payment processor to retry the payment.
     In production, this would call Stripe/PSE/Nequi APIs.
     Returns whether the retry succeeded and if more attempts should be made.
+
+    Calls are subject to the card's retry budget, the processor's circuit
+    breaker and its rate and concurrency limits. A card over budget, or a
+    processor with no free slot within PROCESSOR_LIMIT_MAX_WAIT_SECONDS,
+    logs a "card_limited"/"rate_limited" event and returns 429; an open
+    breaker logs "circuit_open" and returns 503. Both set Retry-After.
     """
     # Parse failure type
-    try:
-        failure_type = FailureType(request.failure_type)
-    except ValueError:
-        failure_type = FailureType.UNKNOWN
+    failure_type = parse_failure_type(request.failure_type)
 
-    # Get success probability for this failure type
-    success_probability = SUCCESS_RATES.get(failure_type, 0.10)
+    payment = await get_payment_by_id(session, request.payment_id)
+    processor = payment.processor if payment else None
+    card = payment.card_fingerprint if payment else None
+    breaker = processor_breakers.get(processor) if processor else None
+
+    # Check the card's budget and the processor's breaker, then wait for a slot
+    limited = None
+    card_wait = card_limiter.retry_after(card, time.time()) if card else 0.0
+    if card_wait:
+        limited = (
+            status.HTTP_429_TOO_MANY_REQUESTS,
+            "card_limited",
+            "Card reached its retry limit",
+            card_wait,
+        )
+    elif breaker and not breaker.allow(time.monotonic()):
+        limited = (
+            status.HTTP_503_SERVICE_UNAVAILABLE,
+            "circuit_open",
+            f"Processor {processor} circuit is open",
+            breaker.retry_after(time.monotonic()),
+        )
+    elif processor and not await _acquire_processor_slot(session, processor):
+        breaker.release()  # type: ignore
+        limited = (
+            status.HTTP_429_TOO_MANY_REQUESTS,
+            "rate_limited",
+            f"Processor {processor} is at its rate limit",
+            processor_limiter.retry_after(processor),
+        )
+
+    if limited:
+        status_code, event_type, detail, wait_seconds = limited
+        retry_after = max(1, math.ceil(wait_seconds))
+        if audit_writer.record(
+            session,
+            RetryAuditLog(
+                event_type=event_type,
+                payment_id=request.payment_id,
+                merchant_id=request.merchant_id,
+                attempt_number=request.attempt_number,
+                failure_type=failure_type,
+                metadata_json={
+                    "processor": processor,
+                    "retry_after_seconds": retry_after,
+                },
+            ),
+        ):
+            await session.commit()
+        raise HTTPException(
+            status_code=status_code,
+            detail=detail,
+            headers={"Retry-After": str(retry_after)},
+        )
+
+    if card:
+        card_limiter.record(card, time.time())
 
     # Simulate the retry - random success based on probability
-    random_value = random.random()
-    success = random_value < success_probability
+    try:
+        success, success_probability, random_value = simulate_processor_retry(
+            failure_type
+        )
+    finally:
+        if processor:
+            processor_limiter.release(processor)
+
+    needs_commit = False
+    if breaker:
+        processor_ok = success or failure_type not in PROCESSOR_FAULT_TYPES
+        if breaker.record(processor_ok, time.monotonic()):
+            # Push the processor's whole queue back until the breaker half-opens
+            await defer_pending_jobs_for_processor(
+                session,
+                processor,  # type: ignore
+                datetime.now() + timedelta(seconds=breaker.open_seconds),
+                spread_seconds=breaker.open_seconds,
+            )
+            needs_commit = True
 
     # Get merchant config for max attempts
-    result = await session.exec(
-        select(MerchantRetryConfig).where(
-            MerchantRetryConfig.merchant_id == request.merchant_id
-        )
-    )
-    config = result.one_or_none()
-    max_attempts = config.max_attempts if config else 3
+    policy = await get_policy_by_merchant_id(session, request.merchant_id)
+    max_attempts = (policy or DEFAULT_RETRY_POLICY).max_attempts
 
     # Determine if we should continue retrying
     should_continue = not success and request.attempt_number < max_attempts
     next_attempt = request.attempt_number + 1 if should_continue else None
 
     # Prepare result
-    if success:
-        result_code = "succeeded"
-        result_message = (
-            f"Payment recovered successfully on attempt {request.attempt_number}"
-        )
-    else:
-        result_code = failure_type.value
-        result_message = (
-            f"Retry attempt {request.attempt_number} failed: {failure_type.value}"
-        )
-        if not should_continue:
-            result_message += " (all attempts exhausted)"
+    result_code, result_message = build_result_message(
+        failure_type, request.attempt_number, success, should_continue
+    )
 
     # Log the retry attempt
     audit_log = RetryAuditLog(
@@ -270,8 +435,8 @@ async def execute_retry(
             "should_continue": should_continue,
         },
     )
-    session.add(audit_log)
-    await session.commit()
+    if audit_writer.record(session, audit_log) or needs_commit:
+        await session.commit()
 
     return ExecuteRetryResponse(
         payment_id=request.payment_id,
@@ -286,78 +451,90 @@ async def execute_retry(
     )
 
 
-@router.post("/update-status")
-async def update_payment_status(
-    request: UpdatePaymentStatusRequest,
+@router.post("/execute-batch", response_model=ExecuteRetryBatchResponse)
+async def execute_retry_batch_endpoint(
+    request: ExecuteRetryBatchRequest,
     session: SessionDep,
 ):
     """
-    Update the payment status after a retry attempt.
-
-    This is called by n8n after the retry result is determined.
-    Updates the payment record and creates appropriate audit logs.
+    Execute many retry attempts and update their payments in one transaction.
+
+    Combines /execute and /update-status for a whole tick of due jobs:
+    payment transitions are applied with set-based UPDATEs and audit logs
+    are bulk inserted. Payments that are missing or no longer retryable
+    are skipped and reported with should_continue=false. Attempts over
+    their card's retry budget or their processor's limits are reported as
+    "card_limited"/"rate_limited" with should_continue=true and the same
+    attempt number, to be sent again.
     """
-    # Get the payment
-    payment = await get_payment_by_id(session, request.payment_id)
-    if not payment:
+    payment_ids = [item.payment_id for item in request.items]
+    if len(set(payment_ids)) != len(payment_ids):
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Payment not found"
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Each payment can appear only once per batch",
         )
 
-    # Update payment based on result
-    if request.success:
-        payment.status = PaymentStatus.RECOVERED
-        payment.recovered_via_retry = True
-        event_type = "retry_success"
-    else:
-        payment.retry_count = request.attempt_number
-        payment.last_retry_at = datetime.now()
-
-        # Check if this was the final attempt
-        result = await session.exec(
-            select(MerchantRetryConfig).where(
-                MerchantRetryConfig.merchant_id == payment.merchant_id
+    outcomes = await execute_retry_batch(
+        session,
+        [
+            RetryAttempt(
+                payment_id=item.payment_id,
+                merchant_id=item.merchant_id,
+                attempt_number=item.attempt_number,
+                failure_type=parse_failure_type(item.failure_type),
             )
-        )
-        config = result.one_or_none()
-        max_attempts = config.max_attempts if config else 3
+            for item in request.items
+        ],
+    )
 
-        if request.attempt_number >= max_attempts:
-            payment.status = PaymentStatus.EXHAUSTED
-            event_type = "exhausted"
-        else:
-            payment.status = PaymentStatus.RETRYING
-            event_type = "retry_failed"
+    return ExecuteRetryBatchResponse(
+        results=[
+            ExecuteRetryBatchItem(
+                payment_id=outcome.attempt.payment_id,
+                attempt_number=outcome.attempt.attempt_number,
+                success=outcome.success,
+                result_code=outcome.result_code,
+                result_message=outcome.result_message,
+                success_probability=outcome.success_probability,
+                random_value=round(outcome.random_value, 4),
+                should_continue=outcome.should_continue,
+                next_attempt=outcome.next_attempt,
+                new_status=outcome.new_status.value if outcome.new_status else None,
+                event_logged=outcome.event_type,
+            )
+            for outcome in outcomes
+        ]
+    )
 
-    payment.updated_at = datetime.now()
-    session.add(payment)
 
-    # Create audit log
-    audit_log = RetryAuditLog(
-        event_type=event_type,
-        payment_id=request.payment_id,
-        merchant_id=payment.merchant_id,
+@router.post("/update-status")
+async def update_payment_status(
+    request: UpdatePaymentStatusRequest,
+    session: SessionDep,
+):
+    """
+    Update the payment status after a retry attempt.
+
+    This is called by n8n after the retry result is determined. The status
+    change and its audit log are written in a single statement; payments
+    that already reached a final status are rejected with 409.
+    """
+    payment = await transition_payment_after_attempt(
+        session,
+        request.payment_id,
         attempt_number=request.attempt_number,
-        failure_type=payment.failure_type,
-        result="success" if request.success else "failure",
-        card_last4=payment.card_last4,
-        amount_cents=payment.amount_cents,
-        currency=payment.currency,
-        metadata_json={
-            "result_code": request.result_code,
-            "result_message": request.result_message,
-        },
+        success=request.success,
+        result_code=request.result_code,
+        result_message=request.result_message,
+        retry_count=None if request.success else request.attempt_number,
     )
-    session.add(audit_log)
-
     await session.commit()
-    await session.refresh(payment)
 
     return {
         "status": "updated",
         "payment_id": str(request.payment_id),
         "new_status": payment.status.value,
-        "event_logged": event_type,
+        "event_logged": TRANSITION_EVENT_TYPES[payment.status],
         "attempt_number": request.attempt_number,
         "recovered": request.success,
     }
@@ -371,4 +548,11 @@ async def retry_logic_health():
         "service": "retry-logic",
         "success_rates": {k.value: v for k, v in SUCCESS_RATES.items()},
         "non_retriable_types": [t.value for t in NON_RETRIABLE_TYPES],
+        "processor_limits": processor_limiter.snapshot(),
+        "circuit_breakers": processor_breakers.snapshot(),
+        "config_cache": config_cache.stats(),
+        "config_listener": config_listener.snapshot(),
+        "audit_writer": audit_writer.snapshot(),
+        "audit_partitions": audit_partition_maintenance.snapshot(),
+        "replica": replica_monitor.snapshot(),
     }
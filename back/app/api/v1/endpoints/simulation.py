@@ -2,21 +2,28 @@
 Simulation endpoints - For testing and demos.
 """
 
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import Optional
 from uuid import UUID
 
 import httpx
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from sqlmodel import select
 
 from app.core.config import settings
-from app.core.database import SessionDep
+from app.core.database import ReadSessionDep, SessionDep
 from app.models.audit_log import RetryAuditLog
 from app.models.payment import FailureType, Payment, PaymentStatus
-from app.models.retry_config import MerchantRetryConfig
 from app.models.retry_job import RetryJob, RetryJobStatus
+from app.services.audit_logs import audit_writer
+from app.services.payment_stats import (
+    PaymentStatsDelta,
+    apply_payment_stats_delta,
+    get_payment_stats_by_merchant_id,
+)
+from app.services.retry_config import get_policy_by_merchant_id
+from app.services.retry_execution import retry_planner
+from app.services.retry_policy import DEFAULT_RETRY_POLICY
 
 router = APIRouter()
 
@@ -56,17 +63,13 @@ async def simulate_payment_failure(
     1. Creates a failed payment in the database
     2. Checks merchant retry configuration
     3. Schedules a retry job if enabled
-    4. Triggers the n8n workflow via webhook
+    4. Triggers the n8n workflow via webhook, unless retries are
+       scheduled natively (RETRY_NATIVE_SCHEDULING)
     """
     # Get merchant retry config
-    config_result = await session.execute(
-        select(MerchantRetryConfig).where(
-            MerchantRetryConfig.merchant_id == request.merchant_id
-        )
-    )
-    config = config_result.scalar_one_or_none()
+    policy = await get_policy_by_merchant_id(session, request.merchant_id)
 
-    if not config:
+    if not policy:
         raise HTTPException(
             status_code=404,
             detail="Merchant retry configuration not found. Create merchant first.",
@@ -98,13 +101,11 @@ async def simulate_payment_failure(
         amount_cents=request.amount_cents,
         currency=request.currency,
     )
-    session.add(audit_log)
+    audit_writer.record(session, audit_log)
 
     # Check if retry is enabled for this failure type
-    retry_enabled_field = f"{request.failure_type.value}_enabled"
-    delay_field = f"{request.failure_type.value}_delay"
-
-    should_retry = config.retry_enabled and getattr(config, retry_enabled_field, False)
+    rule = policy.rule(request.failure_type)
+    should_retry = rule.enabled
 
     retry_scheduled = False
     scheduled_at = None
@@ -112,8 +113,9 @@ async def simulate_payment_failure(
 
     if should_retry:
         # Calculate delay
-        delay_minutes = getattr(config, delay_field, 60)
-        scheduled_at = datetime.now() + timedelta(minutes=delay_minutes)
+        delay_minutes = rule.delay_minutes
+        now = datetime.now()
+        scheduled_at = retry_planner.plan(now, delay_minutes * 60)
 
         # Create retry job
         retry_job = RetryJob(
@@ -138,34 +140,43 @@ async def simulate_payment_failure(
                 "delay_minutes": delay_minutes,
             },
         )
-        session.add(schedule_log)
+        audit_writer.record(session, schedule_log)
 
         payment.status = PaymentStatus.RETRYING
         retry_scheduled = True
 
-        # Trigger n8n webhook
-        try:
-            async with httpx.AsyncClient() as client:
-                webhook_url = f"{settings.N8N_WEBHOOK_URL}/payment-failed"
-                payload = {
-                    "payment_id": str(payment.id),
-                    "merchant_id": str(request.merchant_id),
-                    "amount_cents": request.amount_cents,
-                    "currency": request.currency,
-                    "failure_type": request.failure_type.value,
-                    "card_last4": request.card_last4,
-                    "attempt_number": 1,
-                    "scheduled_at": scheduled_at.isoformat(),
-                    "delay_minutes": delay_minutes,
-                    "max_attempts": config.max_attempts,
-                    "callback_url": "http://backend:8000/api/v1/webhooks/retry-result",
-                }
-                response = await client.post(webhook_url, json=payload, timeout=5.0)
-                n8n_triggered = response.status_code == 200
-        except Exception as e:
-            # Log but don't fail - n8n might not be running
-            print(f"Warning: Could not trigger n8n webhook: {e}")
-            n8n_triggered = False
+        # Trigger n8n webhook (the native scheduler picks up the job otherwise)
+        if not settings.native_scheduling:
+            try:
+                async with httpx.AsyncClient() as client:
+                    webhook_url = f"{settings.N8N_WEBHOOK_URL}/payment-failed"
+                    payload = {
+                        "payment_id": str(payment.id),
+                        "merchant_id": str(request.merchant_id),
+                        "amount_cents": request.amount_cents,
+                        "currency": request.currency,
+                        "failure_type": request.failure_type.value,
+                        "card_last4": request.card_last4,
+                        "attempt_number": 1,
+                        "scheduled_at": scheduled_at.isoformat(),
+                        # n8n waits on this, so it must include the planner's
+                        # jitter and capacity shift, not just the configured delay
+                        "delay_minutes": round(
+                            (scheduled_at - now).total_seconds() / 60, 2
+                        ),
+                        "max_attempts": rule.max_attempts,
+                        "callback_url": "http://backend:8000/api/v1/webhooks/retry-result",
+                    }
+                    response = await client.post(webhook_url, json=payload, timeout=5.0)
+                    n8n_triggered = response.status_code == 200
+            except Exception as e:
+                # Log but don't fail - n8n might not be running
+                print(f"Warning: Could not trigger n8n webhook: {e}")
+                n8n_triggered = False
+
+    stats_delta = PaymentStatsDelta()
+    stats_delta.add(request.merchant_id, payment.status, request.amount_cents)
+    await apply_payment_stats_delta(session, stats_delta)
 
     await session.commit()
     await session.refresh(payment)
@@ -197,12 +208,7 @@ async def manually_trigger_retry(
         raise HTTPException(status_code=404, detail="Payment not found")
 
     # Get config
-    config_result = await session.execute(
-        select(MerchantRetryConfig).where(
-            MerchantRetryConfig.merchant_id == payment.merchant_id
-        )
-    )
-    config = config_result.scalar_one_or_none()
+    policy = await get_policy_by_merchant_id(session, payment.merchant_id)
 
     # Trigger n8n
     try:
@@ -218,7 +224,7 @@ async def manually_trigger_retry(
                 else "unknown",
                 "card_last4": payment.card_last4,
                 "attempt_number": payment.retry_count + 1,
-                "max_attempts": config.max_attempts if config else 3,
+                "max_attempts": (policy or DEFAULT_RETRY_POLICY).max_attempts,
                 "callback_url": "http://backend:8000/api/v1/webhooks/retry-result",
             }
             response = await client.post(webhook_url, json=payload, timeout=5.0)
@@ -238,51 +244,22 @@ async def manually_trigger_retry(
 @router.get("/stats/{merchant_id}")
 async def get_simulation_stats(
     merchant_id: UUID,
-    session: SessionDep,
+    session: ReadSessionDep,
 ):
     """Get retry statistics for a merchant."""
-    from sqlalchemy import func
-
-    # Count payments by status
-    result = await session.exec(
-        select(Payment.status, func.count(Payment.id))  # type: ignore
-        .where(Payment.merchant_id == merchant_id)
-        .group_by(Payment.status)
-    )
-    status_counts = {row[0].value: row[1] for row in result.all()}  # type: ignore
-
-    # Sum amount_cents for recovered payments
-    recovered_amount_result = await session.exec(
-        select(func.coalesce(func.sum(Payment.amount_cents), 0))  # type: ignore
-        .where(Payment.merchant_id == merchant_id)
-        .where(Payment.status == PaymentStatus.RECOVERED)
-    )
-    recovered_amount = recovered_amount_result.one()
-
-    # Sum amount_cents for retrying payments
-    retrying_amount_result = await session.exec(
-        select(func.coalesce(func.sum(Payment.amount_cents), 0))  # type: ignore
-        .where(Payment.merchant_id == merchant_id)
-        .where(
-            Payment.status == PaymentStatus.RETRYING,
-            Payment.status == PaymentStatus.SUCCEEDED,
-        )  # type: ignore
-    )
-    retrying_amount = retrying_amount_result.one()
-
-    # Sum amount_cents for failed + exhausted payments (lost)
-    lost_amount_result = await session.exec(
-        select(func.coalesce(func.sum(Payment.amount_cents), 0))  # type: ignore
-        .where(Payment.merchant_id == merchant_id)
-        .where(Payment.status.in_([PaymentStatus.FAILED, PaymentStatus.EXHAUSTED]))  # type: ignore
-    )
-    lost_amount = lost_amount_result.one()
+    stats = await get_payment_stats_by_merchant_id(session, merchant_id)
+    status_counts = {
+        payment_status.value: count
+        for payment_status, (count, _) in stats.items()
+        if count
+    }
 
-    # Count recovered payments
-    recovered = status_counts.get("recovered", 0)
-    failed = status_counts.get("failed", 0)
-    exhausted = status_counts.get("exhausted", 0)
-    retrying = status_counts.get("retrying", 0)
+    recovered, recovered_amount = stats[PaymentStatus.RECOVERED]
+    retrying, retrying_amount = stats[PaymentStatus.RETRYING]
+    failed, failed_amount = stats[PaymentStatus.FAILED]
+    exhausted, exhausted_amount = stats[PaymentStatus.EXHAUSTED]
+    # Failed + exhausted payments are lost
+    lost_amount = failed_amount + exhausted_amount
 
     total_eligible = failed + exhausted + recovered + retrying
     recovery_rate = (recovered / total_eligible * 100) if total_eligible > 0 else 0
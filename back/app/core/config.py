@@ -2,6 +2,8 @@
 Application configuration using pydantic-settings.
 """
 
+from typing import Literal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -17,10 +19,127 @@ class Settings(BaseSettings):
     # Environment
     ENVIRONMENT: str = "development"
 
+    # Database engine and connection pool (per process; workers open their own)
+    DB_POOL_SIZE: int = 20
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # Prepared statements cached per connection by the asyncpg driver
+    # (0 disables, e.g. behind pgbouncer in transaction mode)
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    # Log every SQL statement; expensive, keep off outside local debugging
+    DB_ECHO: bool = False
+
+    # Optional read replica for read-only endpoints (same pool settings).
+    # Reads fall back to the primary while the replica lags more than
+    # REPLICA_MAX_LAG_SECONDS or its lag is unknown.
+    DATABASE_REPLICA_URL: str | None = None
+    REPLICA_MAX_LAG_SECONDS: float = 5.0
+    REPLICA_LAG_CHECK_SECONDS: float = 2.0
+
     # API Settings
     API_V1_PREFIX: str = "/api/v1"
     PROJECT_NAME: str = "Payment Retry System"
 
+    # Native retry scheduling: retry_jobs are run by the scheduler (in the
+    # API or in app.worker processes) and n8n is not notified. The loops
+    # only run in the API with RETRY_SCHEDULER_ENABLED, which implies it
+    RETRY_NATIVE_SCHEDULING: bool = False
+    RETRY_SCHEDULER_ENABLED: bool = False
+    RETRY_SCHEDULER_BATCH_SIZE: int = 500
+    RETRY_SCHEDULER_POLL_INTERVAL_SECONDS: float = 1.0
+    RETRY_SCHEDULER_CONCURRENCY: int = 10
+    RETRY_SCHEDULER_LEASE_SECONDS: int = 300
+
+    # Timing wheel holding jobs due within the scheduler horizon
+    RETRY_SCHEDULER_HORIZON_SECONDS: float = 60.0
+    RETRY_WHEEL_TICK_MS: int = 100
+    RETRY_WHEEL_SLOTS: int = 64
+    RETRY_WHEEL_LEVELS: int = 3
+
+    # Priority of due work: amount x success rate, discounted per attempt.
+    # Claims rank the next LOOKAHEAD x batch due jobs; one merchant gets at
+    # most MERCHANT_MAX_SHARE of a batch while others are waiting.
+    RETRY_PRIORITY_ATTEMPT_DECAY: float = 0.5
+    RETRY_CLAIM_LOOKAHEAD: int = 10
+    RETRY_MERCHANT_MAX_SHARE: float = 0.2
+
+    # Processor limits (per process): calls per second and in-flight calls
+    PROCESSOR_RATE_LIMITS: dict[str, float] = {
+        "stripe": 100.0,
+        "dlocal": 50.0,
+        "pse": 20.0,
+        "nequi": 20.0,
+    }
+    PROCESSOR_MAX_CONCURRENCY: dict[str, int] = {
+        "stripe": 50,
+        "dlocal": 25,
+        "pse": 10,
+        "nequi": 10,
+    }
+    PROCESSOR_DEFAULT_RATE_LIMIT: float = 20.0
+    PROCESSOR_DEFAULT_MAX_CONCURRENCY: int = 10
+    PROCESSOR_BURST_SECONDS: float = 1.0
+    PROCESSOR_LIMIT_MAX_WAIT_SECONDS: float = 5.0
+
+    # Per-card retry limit (sliding window, in memory per process)
+    CARD_RETRY_LIMIT: int = 5
+    CARD_RETRY_WINDOW_HOURS: int = 24
+    CARD_LIMITER_MAX_CARDS: int = 1_000_000
+    CARD_LIMITER_FLUSH_SECONDS: float = 30.0
+
+    # Per-processor circuit breakers (processor_downtime/network_timeout failures)
+    BREAKER_FAILURE_RATIO: float = 0.8
+    BREAKER_WINDOW_SIZE: int = 50
+    BREAKER_MIN_CALLS: int = 20
+    BREAKER_OPEN_SECONDS: float = 30.0
+    BREAKER_HALF_OPEN_PROBES: int = 3
+
+    # Retry time planning: jitter after the configured delay and a per-minute
+    # target of retries coming due (0 disables the target)
+    RETRY_JITTER_RATIO: float = 0.1
+    RETRY_MAX_JITTER_SECONDS: float = 1800.0
+    RETRY_CAPACITY_PER_MINUTE: int = 6000
+    RETRY_CAPACITY_MAX_SHIFT_MINUTES: int = 120
+
+    # In-process cache of merchant retry configs (invalidated on update)
+    RETRY_CONFIG_CACHE_TTL_SECONDS: float = 60.0
+    RETRY_CONFIG_CACHE_MAX_ENTRIES: int = 10_000
+    # Postgres NOTIFY channel carrying config updates to every process
+    RETRY_CONFIG_NOTIFY_CHANNEL: str = "retry_config_changed"
+    RETRY_CONFIG_LISTEN_KEEPALIVE_SECONDS: float = 30.0
+    RETRY_CONFIG_LISTEN_RECONNECT_SECONDS: float = 5.0
+
+    # Audit logs: "buffered" writes the events not listed in AUDIT_SYNC_EVENT_TYPES
+    # in background bulk inserts; "sync" writes every event in the request's
+    # transaction
+    AUDIT_WRITE_MODE: Literal["buffered", "sync"] = "buffered"
+    AUDIT_SYNC_EVENT_TYPES: list[str] = [
+        "payment_failed",
+        "retry_scheduled",
+        "retry_success",
+        "retry_failed",
+        "exhausted",
+    ]
+    AUDIT_FLUSH_ROWS: int = 500
+    AUDIT_FLUSH_SECONDS: float = 1.0
+    AUDIT_MAX_PENDING: int = 100_000
+    # Monthly partitions of retry_audit_logs: created this many months ahead;
+    # months past retention are archived to gzipped CSV segments and dropped
+    AUDIT_PARTITION_MONTHS_AHEAD: int = 3
+    AUDIT_RETENTION_MONTHS: int = 24
+    AUDIT_ARCHIVE_DIR: str = "archive/audit_logs"
+    AUDIT_PARTITION_CHECK_SECONDS: float = 3600.0
+
+    # Bulk failed-payment ingestion (POST /payments/ingest and the CLI)
+    INGEST_MAX_RECORDS: int = 100_000
+    INGEST_MAX_BODY_BYTES: int = 64 * 1024 * 1024  # after decompression
+    INGEST_BATCH_SIZE: int = 10_000
+
+    # Rows fetched per round trip by the server-side cursor of exports
+    EXPORT_CHUNK_ROWS: int = 5_000
+
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
@@ -28,5 +147,10 @@ class Settings(BaseSettings):
         extra="ignore",
     )
 
+    @property
+    def native_scheduling(self) -> bool:
+        """Whether retries run from retry_jobs instead of the n8n workflow."""
+        return self.RETRY_NATIVE_SCHEDULING or self.RETRY_SCHEDULER_ENABLED
+
 
 settings = Settings()  # type: ignore
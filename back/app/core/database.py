@@ -2,24 +2,141 @@
 Database configuration and session management.
 """
 
+import time
 from typing import Annotated, AsyncGenerator
 
 from fastapi import Depends
-from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlmodel import SQLModel
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.core.config import settings
+from app.services.metrics import REGISTRY, Counter, Gauge, Histogram
+from app.services.replica_health import ReplicaHealth
 
-# Convert postgres:// to postgresql+asyncpg://
-database_url = settings.DATABASE_URL
-if database_url.startswith("postgresql://"):
-    database_url = database_url.replace("postgresql://", "postgresql+asyncpg://", 1)
 
-# Create async engine
-engine = create_async_engine(
-    database_url, echo=settings.ENVIRONMENT == "development", future=True
+def _async_url(url: str) -> str:
+    # Convert postgres:// to postgresql+asyncpg://
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    return url
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waits."""
+
+    checkout_seconds: Histogram
+    checkout_timeouts: Counter
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self.checkout_timeouts.inc()
+            raise
+        finally:
+            self.checkout_seconds.observe(time.perf_counter() - start)
+
+
+def _create_engine(url: str, role: str) -> AsyncEngine:
+    """Engine with the configured pool, exporting its metrics labelled by `role`."""
+    labels = {"engine": role}
+    # The pool class carries the metrics so pools recreated on dispose() keep them
+    pool_class = type(
+        f"InstrumentedQueuePool_{role}",
+        (InstrumentedQueuePool,),
+        {
+            "checkout_seconds": REGISTRY.register(
+                Histogram(
+                    "db_pool_checkout_seconds",
+                    "Time spent waiting for a pooled connection (includes opening new ones)",
+                    labels=labels,
+                )
+            ),
+            "checkout_timeouts": REGISTRY.register(
+                Counter(
+                    "db_pool_checkout_timeouts_total",
+                    "Checkouts that gave up after DB_POOL_TIMEOUT_SECONDS",
+                    labels=labels,
+                )
+            ),
+        },
+    )
+    new_engine = create_async_engine(
+        _async_url(url),
+        echo=settings.DB_ECHO,
+        poolclass=pool_class,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+        pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args={
+            "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE
+        },
+    )
+
+    REGISTRY.register(
+        Gauge(
+            "db_pool_size",
+            "Connections kept open by the pool",
+            lambda: new_engine.pool.size(),  # type: ignore[attr-defined]
+            labels=labels,
+        )
+    )
+    REGISTRY.register(
+        Gauge(
+            "db_pool_checked_out",
+            "Connections currently in use",
+            lambda: new_engine.pool.checkedout(),  # type: ignore[attr-defined]
+            labels=labels,
+        )
+    )
+    REGISTRY.register(
+        Gauge(
+            "db_pool_overflow",
+            "Connections open beyond pool_size (negative while the pool fills)",
+            lambda: new_engine.pool.overflow(),  # type: ignore[attr-defined]
+            labels=labels,
+        )
+    )
+    return new_engine
+
+
+# Primary: every write, and reads that must see them
+engine = _create_engine(settings.DATABASE_URL, "primary")
+
+# Optional replica for read-only endpoints, gated by its replication lag
+# (measured by app.services.replica_monitor)
+replica_engine = (
+    _create_engine(settings.DATABASE_REPLICA_URL, "replica")
+    if settings.DATABASE_REPLICA_URL
+    else None
+)
+replica_health = ReplicaHealth(
+    max_lag_seconds=settings.REPLICA_MAX_LAG_SECONDS,
+    # Three missed checks in a row and the last measurement is not trusted
+    max_age_seconds=3 * settings.REPLICA_LAG_CHECK_SECONDS,
 )
+replica_fallbacks = REGISTRY.register(
+    Counter(
+        "db_replica_fallbacks_total",
+        "Read sessions sent to the primary because the replica was stale or down",
+    )
+)
+
+
+def read_engine() -> AsyncEngine:
+    """The replica while it is within the staleness bound, else the primary."""
+    if replica_engine is None:
+        return engine
+    if replica_health.usable(time.monotonic()):
+        return replica_engine
+    replica_fallbacks.inc()
+    return engine
 
 
 async def init_db():
@@ -33,4 +150,11 @@ async def get_session() -> AsyncGenerator[AsyncSession, None]:
         yield session
 
 
+async def get_read_session() -> AsyncGenerator[AsyncSession, None]:
+    """Session for read-only endpoints; may be up to REPLICA_MAX_LAG_SECONDS stale."""
+    async with AsyncSession(read_engine(), expire_on_commit=False) as session:
+        yield session
+
+
 SessionDep = Annotated[AsyncSession, Depends(get_session)]
+ReadSessionDep = Annotated[AsyncSession, Depends(get_read_session)]
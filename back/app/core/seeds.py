@@ -15,6 +15,7 @@ from app.core.database import engine
 from app.models.merchant import Merchant
 from app.models.payment import FailureType, Payment, PaymentStatus
 from app.models.retry_config import MerchantRetryConfig
+from app.services.payment_stats import PaymentStatsDelta, apply_payment_stats_delta
 
 DEMO_MERCHANT_ID = UUID("466fd34b-96a1-4635-9b2c-dedd2645291f")
 
@@ -107,12 +108,15 @@ async def seed_database():
 
         # Create sample failed payments (only in development)
         if settings.ENVIRONMENT != "production":
+            stats_delta = PaymentStatsDelta()
             for payment_data in SAMPLE_PAYMENTS:
                 payment = Payment(
                     merchant_id=DEMO_MERCHANT_ID,
                     **payment_data,
                 )
                 session.add(payment)
+                stats_delta.add(DEMO_MERCHANT_ID, payment.status, payment.amount_cents)
+            await apply_payment_stats_delta(session, stats_delta)
             print(f"   Added {len(SAMPLE_PAYMENTS)} sample payments")
 
         await session.commit()
@@ -6,10 +6,18 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
 from app.api.v1 import router as api_router
 from app.core.config import settings
 from app.core.database import init_db
+from app.services.audit_logs import audit_writer
+from app.services.audit_partitions import audit_partition_maintenance
+from app.services.card_windows import card_window_sync
+from app.services.config_listener import config_listener
+from app.services.metrics import REGISTRY
+from app.services.replica_monitor import replica_monitor
+from app.services.retry_scheduler import create_retry_scheduler
 
 
 @asynccontextmanager
@@ -17,9 +25,25 @@ async def lifespan(app: FastAPI):
     """Application lifecycle manager."""
     # Startup
     await init_db()
+    await audit_partition_maintenance.start()
+    await audit_writer.start()
+    await card_window_sync.start()
+    await config_listener.start()
+    await replica_monitor.start()
+    # Built here, not at import, so only processes that run it allocate a wheel
+    retry_scheduler = None
+    if settings.RETRY_SCHEDULER_ENABLED:
+        retry_scheduler = create_retry_scheduler()
+        await retry_scheduler.start()
     yield
     # Shutdown
-    pass
+    if retry_scheduler:
+        await retry_scheduler.stop()
+    await replica_monitor.stop()
+    await config_listener.stop()
+    await card_window_sync.stop()
+    await audit_writer.stop()
+    await audit_partition_maintenance.stop()
 
 
 app = FastAPI(
@@ -39,6 +63,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Include API router
@@ -51,6 +76,12 @@ async def health_check():
     return {"status": "healthy", "service": "payment-retry-backend", "version": "1.0.0"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    """Prometheus metrics of this process."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/")
 async def root():
     """Root endpoint with API info."""
@@ -1,7 +1,9 @@
 """Models module exports."""
 
 from app.models.audit_log import RetryAuditLog
+from app.models.card_retry_window import CardRetryWindow
 from app.models.merchant import Merchant, MerchantCreate, MerchantRead
+from app.models.merchant_payment_stats import MerchantPaymentStats
 from app.models.payment import FailureType, Payment, PaymentRead, PaymentStatus
 from app.models.retry_config import (
     MerchantRetryConfig,
@@ -24,4 +26,6 @@ __all__ = [
     "RetryJob",
     "RetryJobStatus",
     "RetryAuditLog",
+    "CardRetryWindow",
+    "MerchantPaymentStats",
 ]
@@ -17,12 +17,15 @@ class RetryAuditLog(SQLModel, table=True):
     """Retry audit log database model for compliance."""
 
     __tablename__: ClassVar[str] = "retry_audit_logs"
+    # Monthly partitions, created and archived by app.services.audit_partitions
+    __table_args__: ClassVar[dict] = {"postgresql_partition_by": "RANGE (created_at)"}
 
     id: UUID = Field(default_factory=uuid4, primary_key=True)
 
     event_type: str = Field(max_length=50)
     # Values: 'payment_failed', 'classified', 'retry_scheduled', 'retry_executed',
-    #         'retry_success', 'retry_failed', 'exhausted', 'rate_limited'
+    #         'retry_success', 'retry_failed', 'exhausted', 'rate_limited',
+    #         'card_limited', 'circuit_open'
 
     payment_id: UUID | None = Field(default=None, foreign_key="payments.id")
     merchant_id: UUID | None = Field(default=None, foreign_key="merchants.id")
@@ -51,4 +54,5 @@ class RetryAuditLog(SQLModel, table=True):
     # Additional context
     metadata_json: Dict[str, Any] | None = Field(default=None, sa_column=Column(JSON))
 
-    created_at: datetime = Field(default_factory=datetime.now)
+    # Part of the key: unique constraints on a partitioned table must include it
+    created_at: datetime = Field(default_factory=datetime.now, primary_key=True)
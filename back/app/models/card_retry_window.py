@@ -0,0 +1,27 @@
+"""
+Card Retry Window model - persisted per-card retry counters.
+"""
+
+from datetime import datetime
+from typing import ClassVar
+
+from sqlalchemy import JSON
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlmodel import Column, Field, SQLModel
+
+
+class CardRetryWindow(SQLModel, table=True):
+    """Recent retry timestamps of one card, flushed from the in-memory limiter."""
+
+    __tablename__: ClassVar[str] = "card_retry_windows"
+
+    card_fingerprint: str = Field(primary_key=True, max_length=100)
+
+    # Epoch seconds of the card's most recent retries, oldest first. JSONB
+    # like the schema: the flush upsert merges windows with jsonb operators
+    attempts: list[int] = Field(
+        default_factory=list,
+        sa_column=Column(JSONB().with_variant(JSON(), "sqlite"), nullable=False),
+    )
+
+    updated_at: datetime = Field(default_factory=datetime.now)
@@ -0,0 +1,39 @@
+"""
+Merchant Payment Stats model - per-merchant rollup of payments by status.
+"""
+
+from datetime import datetime
+from typing import ClassVar
+from uuid import UUID
+
+from sqlalchemy import BigInteger
+from sqlalchemy.dialects.postgresql import ENUM as PG_ENUM
+from sqlmodel import Column, Field, SQLModel
+
+from app.models.payment import PaymentStatus
+
+
+class MerchantPaymentStats(SQLModel, table=True):
+    """Payment count and amount of one merchant in one status."""
+
+    __tablename__: ClassVar[str] = "merchant_payment_stats"
+
+    merchant_id: UUID = Field(foreign_key="merchants.id", primary_key=True)
+    status: PaymentStatus = Field(
+        sa_column=Column(
+            PG_ENUM(
+                PaymentStatus,
+                name="payment_status",  # Debe coincidir con el nombre en la DB
+                create_type=False,  # No crear, ya existe
+                schema="public",  # Schema donde está el tipo
+                values_callable=lambda enum: [e.value for e in enum],
+            ),
+            primary_key=True,
+        ),
+    )
+
+    # Kept in step with payment transitions; see app/services/payment_stats.py
+    payment_count: int = Field(default=0, sa_column=Column(BigInteger, nullable=False))
+    amount_cents: int = Field(default=0, sa_column=Column(BigInteger, nullable=False))
+
+    updated_at: datetime = Field(default_factory=datetime.now)
@@ -1,19 +1,83 @@
+import logging
 from uuid import UUID
 
+from sqlalchemy import Row
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.core.database import SessionDep
+from app.core.config import settings
+from app.core.database import SessionDep, engine
 from app.models.audit_log import RetryAuditLog
+from app.services.audit_writer import AuditLogWriter
+from app.services.metrics import REGISTRY, Gauge
+from app.services.statements import INSERT_AUDIT_LOGS
 
+logger = logging.getLogger(__name__)
 
-async def get_log_audits_by_payment_id(session: SessionDep, payment_id: UUID):
-    """Retrieve audit logs for a specific payment ID."""
 
+# Columns of the retry history, in model order
+AUDIT_LOG_COLUMNS = tuple(RetryAuditLog.model_fields)
+
+
+async def get_log_audits_by_payment_id(
+    session: SessionDep, payment_id: UUID
+) -> list[Row]:
+    """Audit logs of a payment, oldest first, as plain tuples of AUDIT_LOG_COLUMNS."""
+    audit_logs = RetryAuditLog.__table__
     logs_result = await session.exec(
-        select(RetryAuditLog)
-        .where(RetryAuditLog.payment_id == payment_id)
-        .order_by(RetryAuditLog.created_at)  # type: ignore
+        select(*(audit_logs.c[name] for name in AUDIT_LOG_COLUMNS))
+        .where(audit_logs.c.payment_id == payment_id)
+        .order_by(audit_logs.c.created_at)
     )
-    logs = logs_result.all()
+    return list(logs_result.all())
+
+
+async def bulk_insert_audit_logs(session: SessionDep, logs: list[RetryAuditLog]):
+    """
+    Insert many audit logs in one statement.
+
+    Rows are sent as a single multi-row INSERT instead of one INSERT per
+    ORM object. The caller owns the transaction.
+    """
+    if not logs:
+        return
+
+    await session.execute(INSERT_AUDIT_LOGS, [log.model_dump() for log in logs])
 
-    return logs
+
+async def _write_audit_logs(logs: list[RetryAuditLog]) -> None:
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        try:
+            await bulk_insert_audit_logs(session, logs)
+            await session.commit()
+            return
+        except IntegrityError:
+            await session.rollback()
+
+        # One bad row (e.g. an unknown payment_id) must not block the rest
+        for log in logs:
+            try:
+                async with session.begin_nested():
+                    await bulk_insert_audit_logs(session, [log])
+            except IntegrityError:
+                logger.warning("Dropping audit log %s: %s", log.id, log.event_type)
+        await session.commit()
+
+
+audit_writer = AuditLogWriter(
+    _write_audit_logs,
+    settings.AUDIT_SYNC_EVENT_TYPES,
+    buffered=settings.AUDIT_WRITE_MODE == "buffered",
+    flush_rows=settings.AUDIT_FLUSH_ROWS,
+    flush_seconds=settings.AUDIT_FLUSH_SECONDS,
+    max_pending=settings.AUDIT_MAX_PENDING,
+)
+
+REGISTRY.register(
+    Gauge(
+        "audit_log_buffer_pending",
+        "Buffered audit logs waiting for the next flush",
+        lambda: len(audit_writer),
+    )
+)
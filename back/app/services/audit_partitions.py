@@ -0,0 +1,381 @@
+"""
+Monthly partitions of retry_audit_logs and their archival.
+
+retry_audit_logs is range-partitioned by created_at, one partition per
+month, plus a DEFAULT partition for rows no month covers yet (see
+db/schema.sql). Maintenance runs in the API process in the background
+every AUDIT_PARTITION_CHECK_SECONDS (startup only waits for the current
+and next month's partitions), and on demand from the command line:
+
+- creates the current month and the next AUDIT_PARTITION_MONTHS_AHEAD ones;
+- moves rows left in DEFAULT for past months (e.g. backfills older than
+  the first partition) into their own month's table;
+- moves months older than AUDIT_RETENTION_MONTHS out of the database: each
+  partition is detached, copied to a gzipped CSV segment in
+  AUDIT_ARCHIVE_DIR and dropped.
+
+Archived segments stay queryable:
+
+    python -m app.services.audit_partitions maintain
+    python -m app.services.audit_partitions query --from 2024-01-01 --payment-id UUID
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import logging
+import os
+import sys
+from datetime import date, datetime
+from pathlib import Path
+from uuid import UUID
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.core.config import settings
+from app.core.database import engine
+from app.services.audit_segments import iter_segment_rows, segment_path
+from app.services.partitions import (
+    add_months,
+    archive_cutoff,
+    month_start,
+    months_to_create,
+    partition_month,
+    partition_name,
+)
+
+logger = logging.getLogger(__name__)
+
+AUDIT_TABLE = "retry_audit_logs"
+DEFAULT_PARTITION = f"{AUDIT_TABLE}_default"
+# Advisory lock key: one maintenance run at a time across all processes
+MAINTENANCE_LOCK_ID = 21_000_001
+
+
+async def is_partitioned(connection: AsyncConnection) -> bool:
+    result = await connection.execute(
+        text(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table"
+            " WHERE partrelid = to_regclass(:table))"
+        ),
+        {"table": AUDIT_TABLE},
+    )
+    return bool(result.scalar())
+
+
+async def monthly_partitions(connection: AsyncConnection) -> dict[str, bool]:
+    """Monthly partition tables by name, and whether each is still attached."""
+    result = await connection.execute(
+        text(
+            "SELECT c.relname, c.relispartition FROM pg_class c"
+            " JOIN pg_namespace n ON n.oid = c.relnamespace"
+            " WHERE n.nspname = current_schema() AND c.relkind = 'r'"
+            " AND c.relname LIKE :prefix"
+        ),
+        {"prefix": f"{AUDIT_TABLE}_p%"},
+    )
+    return {
+        name: attached
+        for name, attached in result.all()
+        if partition_month(AUDIT_TABLE, name)
+    }
+
+
+async def ensure_audit_partitions(
+    connection: AsyncConnection, now: datetime, months_ahead: int
+) -> list[str]:
+    """Create missing partitions up to `months_ahead` months ahead."""
+    await connection.execute(
+        text(
+            f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION}"
+            f" PARTITION OF {AUDIT_TABLE} DEFAULT"
+        )
+    )
+    await connection.commit()
+
+    existing = await monthly_partitions(connection)
+    created = []
+    for month in months_to_create(now, months_ahead):
+        name = partition_name(AUDIT_TABLE, month)
+        if name in existing:
+            continue
+        in_default = await connection.execute(
+            text(
+                f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION}"
+                " WHERE created_at >= :start AND created_at < :end)"
+            ),
+            {"start": month, "end": add_months(month, 1)},
+        )
+        if not in_default.scalar():
+            await connection.execute(
+                text(
+                    f"CREATE TABLE {name} PARTITION OF {AUDIT_TABLE}"
+                    f" FOR VALUES {_bounds(month)}"
+                )
+            )
+        else:
+            # Rows for this month landed in DEFAULT: move them, then attach
+            await _move_default_rows(connection, name, month, attach=True)
+        await connection.commit()
+        created.append(name)
+    return created
+
+
+def _bounds(month: date) -> str:
+    return f"FROM ('{month}') TO ('{add_months(month, 1)}')"
+
+
+async def _move_default_rows(
+    connection: AsyncConnection, name: str, month: date, attach: bool
+) -> None:
+    """Move DEFAULT's rows for `month` into table `name`, created if missing."""
+    await connection.execute(
+        text(
+            f"CREATE TABLE IF NOT EXISTS {name}"
+            f" (LIKE {AUDIT_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        )
+    )
+    await connection.execute(
+        text(
+            f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION}"
+            " WHERE created_at >= :start AND created_at < :end RETURNING *)"
+            f" INSERT INTO {name} SELECT * FROM moved"
+        ),
+        {"start": month, "end": add_months(month, 1)},
+    )
+    if attach:
+        await connection.execute(
+            text(
+                f"ALTER TABLE {AUDIT_TABLE} ATTACH PARTITION {name}"
+                f" FOR VALUES {_bounds(month)}"
+            )
+        )
+
+
+async def rehome_default_rows(
+    connection: AsyncConnection, now: datetime, retention_months: int
+) -> list[str]:
+    """
+    Move rows stranded in DEFAULT for past months to their month's table.
+
+    Such rows come from months that had no partition when they were
+    written, and nothing else would ever move or archive them. Months
+    still within retention get an attached partition; older ones a
+    detached table, which archive_audit_partitions then archives and
+    drops like any other.
+    """
+    result = await connection.execute(
+        text(
+            "SELECT DISTINCT CAST(date_trunc('month', created_at) AS date)"
+            f" FROM {DEFAULT_PARTITION} WHERE created_at < :current"
+        ),
+        {"current": month_start(now)},
+    )
+    cutoff = archive_cutoff(now, retention_months)
+    rehomed = []
+    for (month,) in sorted(result.all()):
+        name = partition_name(AUDIT_TABLE, month)
+        await _move_default_rows(connection, name, month, attach=month >= cutoff)
+        await connection.commit()
+        logger.info("Moved %s rows out of %s", name, DEFAULT_PARTITION)
+        rehomed.append(name)
+    return rehomed
+
+
+async def _copy_to_segment(connection: AsyncConnection, table: str, path: Path) -> None:
+    """COPY a table into a gzipped CSV segment, replacing it atomically."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(path.name + ".partial")
+    raw = await connection.get_raw_connection()
+    with gzip.open(partial, "wb") as segment:
+        await raw.driver_connection.copy_from_table(  # type: ignore[union-attr]
+            table, output=segment, format="csv", header=True
+        )
+    os.replace(partial, path)
+
+
+async def archive_audit_partitions(
+    connection: AsyncConnection,
+    now: datetime,
+    retention_months: int,
+    archive_dir: Path,
+) -> list[Path]:
+    """
+    Detach, archive and drop partitions older than `retention_months`.
+
+    Each step commits on its own, so a run interrupted after the detach
+    picks the table up again next time.
+    """
+    cutoff = archive_cutoff(now, retention_months)
+    archived = []
+    for name, attached in sorted((await monthly_partitions(connection)).items()):
+        if partition_month(AUDIT_TABLE, name) >= cutoff:  # type: ignore[operator]
+            continue
+        if attached:
+            # Detaching locks the parent; give up rather than queue inserts
+            await connection.execute(text("SET LOCAL lock_timeout = '5s'"))
+            await connection.execute(
+                text(f"ALTER TABLE {AUDIT_TABLE} DETACH PARTITION {name}")
+            )
+            await connection.commit()
+
+        path = segment_path(archive_dir, name)
+        await _copy_to_segment(connection, name, path)
+        await connection.execute(text(f"DROP TABLE {name}"))
+        await connection.commit()
+        logger.info("Archived %s to %s", name, path)
+        archived.append(path)
+    return archived
+
+
+async def maintain_audit_partitions(
+    now: datetime | None = None, partitions_only: bool = False
+) -> dict:
+    """
+    One maintenance run; skipped while another process holds the lock.
+
+    With `partitions_only`, only the current and next month's partitions
+    are ensured: nothing is rehomed or archived.
+    """
+    now = now or datetime.now()
+    async with engine.connect() as connection:
+        if not await is_partitioned(connection):
+            logger.warning("%s is not partitioned, skipping maintenance", AUDIT_TABLE)
+            return {"skipped": "not partitioned"}
+        locked = await connection.execute(
+            text("SELECT pg_try_advisory_lock(:id)"), {"id": MAINTENANCE_LOCK_ID}
+        )
+        if not locked.scalar():
+            return {"skipped": "locked"}
+        await connection.commit()
+        try:
+            created = await ensure_audit_partitions(
+                connection,
+                now,
+                min(1, settings.AUDIT_PARTITION_MONTHS_AHEAD)
+                if partitions_only
+                else settings.AUDIT_PARTITION_MONTHS_AHEAD,
+            )
+            rehomed, archived = [], []
+            if not partitions_only:
+                rehomed = await rehome_default_rows(
+                    connection, now, settings.AUDIT_RETENTION_MONTHS
+                )
+                archived = await archive_audit_partitions(
+                    connection,
+                    now,
+                    settings.AUDIT_RETENTION_MONTHS,
+                    Path(settings.AUDIT_ARCHIVE_DIR),
+                )
+        finally:
+            await connection.rollback()
+            await connection.execute(
+                text("SELECT pg_advisory_unlock(:id)"), {"id": MAINTENANCE_LOCK_ID}
+            )
+            await connection.commit()
+    return {
+        "created": created,
+        "rehomed": rehomed,
+        "archived": [str(path) for path in archived],
+    }
+
+
+class AuditPartitionMaintenance:
+    """
+    Ensures this month's partitions on start, then runs the full
+    maintain_audit_partitions in the background every `interval` seconds.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.last_run: datetime | None = None
+        self.last_result: dict | None = None
+        self._task: asyncio.Task | None = None
+        self._stopping = asyncio.Event()
+
+    async def start(self) -> None:
+        if self._task:
+            return
+        # Inserts need the current month's partition, so create it before
+        # serving; rehoming and archival can take long and wait for the loop
+        await self.run(partitions_only=True)
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._run(), name="audit-partitions")
+
+    async def stop(self) -> None:
+        if not self._task:
+            return
+        self._stopping.set()
+        await self._task
+        self._task = None
+
+    async def run(self, partitions_only: bool = False) -> None:
+        try:
+            self.last_result = await maintain_audit_partitions(
+                partitions_only=partitions_only
+            )
+            self.last_run = datetime.now()
+        except Exception:
+            logger.exception("Audit partition maintenance failed")
+
+    async def _run(self) -> None:
+        while not self._stopping.is_set():
+            await self.run()
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.interval)
+            except TimeoutError:
+                pass
+
+    def snapshot(self) -> dict:
+        return {
+            "last_run": self.last_run.isoformat() if self.last_run else None,
+            "last_result": self.last_result,
+        }
+
+
+audit_partition_maintenance = AuditPartitionMaintenance(
+    settings.AUDIT_PARTITION_CHECK_SECONDS
+)
+
+
+async def _maintain() -> None:
+    result = await maintain_audit_partitions()
+    await engine.dispose()
+    print(json.dumps(result))
+
+
+def _query(args: argparse.Namespace) -> None:
+    for row in iter_segment_rows(
+        Path(settings.AUDIT_ARCHIVE_DIR),
+        AUDIT_TABLE,
+        created_from=args.created_from,
+        created_to=args.created_to,
+        merchant_id=args.merchant_id,
+        payment_id=args.payment_id,
+        event_type=args.event_type,
+    ):
+        sys.stdout.write(json.dumps(row) + "\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="retry_audit_logs partitions")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("maintain", help="Create and archive partitions now")
+    query = commands.add_parser("query", help="Print archived rows as NDJSON")
+    query.add_argument("--from", dest="created_from", type=datetime.fromisoformat)
+    query.add_argument("--to", dest="created_to", type=datetime.fromisoformat)
+    query.add_argument("--merchant-id", type=UUID)
+    query.add_argument("--payment-id", type=UUID)
+    query.add_argument("--event-type")
+    args = parser.parse_args()
+
+    if args.command == "maintain":
+        asyncio.run(_maintain())
+    else:
+        _query(args)
+
+
+if __name__ == "__main__":
+    main()
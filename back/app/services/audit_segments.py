@@ -0,0 +1,75 @@
+"""
+Archived audit log segments.
+
+Each archived month of retry_audit_logs is one gzipped CSV file with a
+header line, named after its partition (`retry_audit_logs_p2024_01.csv.gz`).
+Segments are read back row by row, so a query scans only the months it
+asks for and never loads a whole file.
+"""
+
+import csv
+import gzip
+from datetime import date, datetime
+from pathlib import Path
+from typing import Iterator
+from uuid import UUID
+
+from app.services.partitions import add_months, month_start, partition_month
+
+SEGMENT_SUFFIX = ".csv.gz"
+
+
+def segment_path(archive_dir: Path, partition: str) -> Path:
+    return archive_dir / f"{partition}{SEGMENT_SUFFIX}"
+
+
+def list_segments(
+    archive_dir: Path,
+    table: str,
+    created_from: datetime | None = None,
+    created_to: datetime | None = None,
+) -> list[tuple[date, Path]]:
+    """Segments of `table` overlapping [created_from, created_to), oldest first."""
+    segments = []
+    for path in archive_dir.glob(f"{table}_p*{SEGMENT_SUFFIX}"):
+        month = partition_month(table, path.name.removesuffix(SEGMENT_SUFFIX))
+        if month is None:
+            continue
+        if created_from and add_months(month, 1) <= month_start(created_from):
+            continue
+        if created_to and datetime(month.year, month.month, 1) >= created_to:
+            continue
+        segments.append((month, path))
+    return sorted(segments)
+
+
+def iter_segment_rows(
+    archive_dir: Path,
+    table: str,
+    created_from: datetime | None = None,
+    created_to: datetime | None = None,
+    merchant_id: UUID | None = None,
+    payment_id: UUID | None = None,
+    event_type: str | None = None,
+) -> Iterator[dict[str, str]]:
+    """
+    Archived rows matching the filters, as the CSV strings COPY wrote.
+
+    Empty strings are NULLs.
+    """
+    for _, path in list_segments(archive_dir, table, created_from, created_to):
+        with gzip.open(path, "rt", newline="") as segment:
+            for row in csv.DictReader(segment):
+                if merchant_id and row["merchant_id"] != str(merchant_id):
+                    continue
+                if payment_id and row["payment_id"] != str(payment_id):
+                    continue
+                if event_type and row["event_type"] != event_type:
+                    continue
+                if created_from or created_to:
+                    created_at = datetime.fromisoformat(row["created_at"])
+                    if created_from and created_at < created_from:
+                        continue
+                    if created_to and created_at >= created_to:
+                        continue
+                yield row
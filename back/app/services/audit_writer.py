@@ -0,0 +1,151 @@
+"""
+Buffered audit log writer.
+
+Compliance-critical events are written synchronously: they join the
+caller's session and commit (or roll back) with the change they
+describe. Every other event is queued in memory and inserted in bulk by a
+background task once `flush_rows` are pending or every `flush_seconds`,
+so it costs the request neither an INSERT nor a commit.
+
+Buffered events are lost if the process dies before a flush; on a clean
+shutdown `stop()` writes whatever is still queued.
+"""
+
+import asyncio
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Iterable
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models.audit_log import RetryAuditLog
+
+logger = logging.getLogger(__name__)
+
+FlushFn = Callable[[list[RetryAuditLog]], Awaitable[None]]
+
+
+class AuditLogWriter:
+    """
+    Routes audit logs to the caller's transaction or to the buffer.
+
+    With `buffered=False` every event is synchronous. The buffer holds at
+    most `max_pending` events; past that the oldest are dropped and
+    counted, so a database outage cannot exhaust memory.
+    """
+
+    def __init__(
+        self,
+        flush: FlushFn,
+        sync_event_types: Iterable[str],
+        buffered: bool = True,
+        flush_rows: int = 500,
+        flush_seconds: float = 1.0,
+        max_pending: int = 100_000,
+    ):
+        self._flush = flush
+        self.sync_event_types = frozenset(sync_event_types)
+        self.buffered = buffered
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+        self.written = 0
+        self.dropped = 0
+        self.failed_flushes = 0
+        self._pending: deque[RetryAuditLog] = deque()
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._stopping = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def is_sync(self, event_type: str) -> bool:
+        return not self.buffered or event_type in self.sync_event_types
+
+    def record(self, session: AsyncSession, *logs: RetryAuditLog) -> bool:
+        """
+        Write `logs` according to their event type.
+
+        Returns True when any of them was added to `session`, in which case
+        the caller has to commit for it to be written.
+        """
+        needs_commit = False
+        for log in logs:
+            if self.is_sync(log.event_type):
+                session.add(log)
+                needs_commit = True
+            else:
+                self.enqueue(log)
+        return needs_commit
+
+    def enqueue(self, log: RetryAuditLog) -> None:
+        if len(self._pending) >= self.max_pending:
+            self._pending.popleft()
+            self.dropped += 1
+        self._pending.append(log)
+        if len(self._pending) >= self.flush_rows:
+            self._wakeup.set()
+
+    async def flush(self) -> int:
+        """Write every pending event in batches of `flush_rows`."""
+        written = 0
+        async with self._flush_lock:
+            while self._pending:
+                batch = [
+                    self._pending.popleft()
+                    for _ in range(min(self.flush_rows, len(self._pending)))
+                ]
+                try:
+                    await self._flush(batch)
+                except BaseException:
+                    # Back to the front, in order, for the next attempt
+                    self._pending.extendleft(reversed(batch))
+                    while len(self._pending) > self.max_pending:
+                        self._pending.popleft()
+                        self.dropped += 1
+                    self.failed_flushes += 1
+                    raise
+                written += len(batch)
+                self.written += len(batch)
+        return written
+
+    async def start(self) -> None:
+        if self._task:
+            return
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._run(), name="audit-log-writer")
+
+    async def stop(self) -> None:
+        """Stop the loop and write what is still pending."""
+        if not self._task:
+            return
+        self._stopping.set()
+        self._wakeup.set()
+        await self._task
+        self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_seconds)
+            except TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._stopping.is_set():
+                break
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Audit log flush failed")
+
+    def snapshot(self) -> dict:
+        return {
+            "buffered": self.buffered,
+            "pending": len(self._pending),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed_flushes": self.failed_flushes,
+        }
@@ -0,0 +1,110 @@
+"""
+Per-card sliding-window retry limiter.
+
+Enforces "at most N retries per card per window" in memory. Each card
+keeps only the timestamps of its last N retries (epoch seconds packed in
+an array), so a check is O(N) with N small and constant, and memory is
+bounded by `max_cards` through LRU eviction.
+"""
+
+from array import array
+from collections import OrderedDict
+
+
+class CardRetryLimiter:
+    """
+    Sliding-window counter of retries per card fingerprint.
+
+    Retries recorded here are kept apart until drained, so they can be
+    persisted periodically (each one exactly once) and loaded back on
+    startup.
+    """
+
+    def __init__(self, limit: int, window_seconds: int, max_cards: int):
+        if limit < 1 or window_seconds < 1 or max_cards < 1:
+            raise ValueError("limit, window_seconds and max_cards must be >= 1")
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self.max_cards = max_cards
+        # card -> retry timestamps inside the window, oldest first
+        self._windows: OrderedDict[str, array] = OrderedDict()
+        # card -> retries recorded by this process and not yet drained
+        self._pending: dict[str, list[int]] = {}
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._windows)
+
+    def _window(self, card: str, now: float) -> array | None:
+        window = self._windows.get(card)
+        if window is None:
+            return None
+        cutoff = now - self.window_seconds
+        expired = 0
+        while expired < len(window) and window[expired] <= cutoff:
+            expired += 1
+        if expired:
+            del window[:expired]
+        return window
+
+    def retry_after(self, card: str, now: float) -> float:
+        """
+        Seconds until `card` may be retried again; 0 if it may be retried now.
+        """
+        window = self._window(card, now)
+        if window is None or len(window) < self.limit:
+            return 0.0
+        return window[len(window) - self.limit] + self.window_seconds - now
+
+    def record(self, card: str, now: float) -> None:
+        """Count one retry of `card` at `now`."""
+        window = self._window(card, now)
+        if window is None:
+            window = array("q")
+            self._windows[card] = window
+            if len(self._windows) > self.max_cards:
+                evicted, _ = self._windows.popitem(last=False)
+                self._pending.pop(evicted, None)
+                self.evictions += 1
+        else:
+            self._windows.move_to_end(card)
+        window.append(int(now))
+        if len(window) > self.limit:
+            del window[0]
+        pending = self._pending.setdefault(card, [])
+        pending.append(int(now))
+        if len(pending) > self.limit:
+            del pending[0]
+
+    def load(self, card: str, timestamps: list[int], now: float) -> None:
+        """
+        Replace the card's window with a persisted one plus undrained retries.
+
+        The persisted window already holds every retry drained by any
+        process, this one included, so it is taken as is; only retries
+        recorded here since the last drain are added on top. Two retries in
+        the same second are two retries, wherever they were recorded.
+        """
+        cutoff = now - self.window_seconds
+        existing = self._window(card, now)
+        if existing is None and len(self) >= self.max_cards:
+            return
+        recent = sorted(
+            t for t in timestamps + self._pending.get(card, []) if t > cutoff
+        )[-self.limit :]
+        if not recent:
+            return
+        self._windows[card] = array("q", recent)
+        self._windows.move_to_end(card)
+
+    def requeue_changes(self, changes: dict[str, list[int]]) -> None:
+        """Put drained retries back for the next drain, e.g. after a failed flush."""
+        for card, timestamps in changes.items():
+            if card in self._windows:
+                pending = self._pending.get(card, [])
+                self._pending[card] = (timestamps + pending)[-self.limit :]
+
+    def drain_changes(self) -> dict[str, list[int]]:
+        """Return and forget the retries recorded since the last call, per card."""
+        changes, self._pending = self._pending, {}
+        return changes
@@ -0,0 +1,175 @@
+"""
+Persistence for the per-card retry limiter.
+
+The limiter lives in memory; the retries each process records are
+appended to card_retry_windows periodically and loaded back on startup
+so a restart does not reset every card's budget. Each sync also loads
+the windows other processes flushed, so the API and every worker shard
+converge on the same per-card budget within CARD_LIMITER_FLUSH_SECONDS.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.core.database import SessionDep, engine
+from app.models.card_retry_window import CardRetryWindow
+from app.services.card_limiter import CardRetryLimiter
+from app.services.retry_execution import card_limiter
+
+logger = logging.getLogger(__name__)
+
+
+# Cards per upsert: each costs three bind parameters, asyncpg accepts 32767
+FLUSH_CHUNK_CARDS = 1_000
+
+
+async def load_card_windows(
+    session: SessionDep,
+    limiter: CardRetryLimiter,
+    since: datetime | None = None,
+) -> int:
+    """
+    Load persisted windows into the limiter, most recent first.
+
+    Loads the windows touched within the limiter's window, or only those
+    updated after `since` (windows flushed by other processes).
+    """
+    if since is None:
+        since = datetime.now() - timedelta(seconds=limiter.window_seconds)
+    result = await session.exec(
+        select(CardRetryWindow)
+        .where(CardRetryWindow.updated_at >= since)
+        .order_by(col(CardRetryWindow.updated_at).desc())
+        .limit(limiter.max_cards)
+    )
+    now = time.time()
+    rows = result.all()
+    for row in reversed(rows):  # Most recent ends up last in the LRU order
+        limiter.load(row.card_fingerprint, row.attempts, now)
+    return len(rows)
+
+
+def _upsert_windows(changes: dict[str, list[int]], limiter: CardRetryLimiter):
+    now = datetime.now()
+    statement = insert(CardRetryWindow).values(
+        [
+            {"card_fingerprint": card, "attempts": attempts, "updated_at": now}
+            for card, attempts in changes.items()
+        ]
+    )
+    # Append the new retries to the stored window, trimmed to the last
+    # `limit` retries in the window. Each process only sends the retries it
+    # recorded since its last flush, so nothing is sent twice and retries in
+    # the same second (from one process or several) all count.
+    merged_attempts = text(
+        """
+        (SELECT COALESCE(jsonb_agg(t ORDER BY t), '[]'::jsonb)
+         FROM (
+             SELECT value::bigint AS t
+             FROM jsonb_array_elements(
+                 card_retry_windows.attempts || excluded.attempts
+             )
+             WHERE value::bigint > :cutoff
+             ORDER BY t DESC
+             LIMIT :limit
+         ) recent)
+        """
+    ).bindparams(cutoff=int(time.time()) - limiter.window_seconds, limit=limiter.limit)
+    return statement.on_conflict_do_update(
+        index_elements=[CardRetryWindow.card_fingerprint],
+        set_={
+            "attempts": merged_attempts,
+            "updated_at": statement.excluded.updated_at,
+        },
+    )
+
+
+async def flush_card_windows(session: SessionDep, limiter: CardRetryLimiter) -> int:
+    """
+    Append the retries recorded since the last flush to card_retry_windows.
+
+    Written and committed in chunks of FLUSH_CHUNK_CARDS. If a chunk fails,
+    its retries and the remaining ones are requeued, so the next flush
+    retries them.
+    """
+    changes = limiter.drain_changes()
+    cards = list(changes)
+    for start in range(0, len(cards), FLUSH_CHUNK_CARDS):
+        chunk = cards[start : start + FLUSH_CHUNK_CARDS]
+        try:
+            await session.execute(
+                _upsert_windows({card: changes[card] for card in chunk}, limiter)
+            )
+            await session.commit()
+        except BaseException:
+            await session.rollback()
+            limiter.requeue_changes({card: changes[card] for card in cards[start:]})
+            raise
+    return len(cards)
+
+
+class CardWindowSync:
+    """Loads the card limiter on start and flushes it every `interval` seconds."""
+
+    def __init__(self, limiter: CardRetryLimiter, interval: float):
+        self.limiter = limiter
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+        self._stopping = asyncio.Event()
+        self._synced_at: datetime | None = None
+
+    async def start(self) -> None:
+        if self._task:
+            return
+        self._synced_at = datetime.now()
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            loaded = await load_card_windows(session, self.limiter)
+        logger.info("Loaded %d card retry windows", loaded)
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._run(), name="card-window-sync")
+
+    async def stop(self) -> None:
+        """Stop the loop and write the last changes."""
+        if not self._task:
+            return
+        self._stopping.set()
+        await self._task
+        self._task = None
+        await self.flush()
+
+    async def flush(self) -> None:
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            await flush_card_windows(session, self.limiter)
+
+    async def sync(self) -> None:
+        """Flush this process's changes, then merge in other processes' windows."""
+        started = datetime.now()
+        await self.flush()
+        # Overlap the previous sync by one interval: rows committed late with
+        # an earlier updated_at are not missed, and loading twice is harmless
+        since = (self._synced_at or started) - timedelta(seconds=self.interval)
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            await load_card_windows(session, self.limiter, since=since)
+        self._synced_at = started
+
+    async def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.interval)
+            except TimeoutError:
+                pass
+            try:
+                await self.sync()
+            except Exception:
+                logger.exception("Card retry window sync failed")
+
+
+card_window_sync = CardWindowSync(card_limiter, settings.CARD_LIMITER_FLUSH_SECONDS)
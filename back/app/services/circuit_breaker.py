@@ -0,0 +1,169 @@
+"""
+Per-processor circuit breakers.
+
+A breaker watches the last `window_size` calls to a processor. When the
+share of processor-side failures crosses `failure_ratio` it opens and
+rejects calls for `open_seconds`; then it lets a few probe calls through
+(half-open) and closes again only if they succeed.
+"""
+
+import time
+from collections import deque
+from enum import StrEnum
+
+
+class BreakerState(StrEnum):
+    """Circuit breaker state."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Failure-ratio circuit breaker over a rolling window of calls."""
+
+    def __init__(
+        self,
+        failure_ratio: float,
+        window_size: int,
+        min_calls: int,
+        open_seconds: float,
+        half_open_probes: int,
+    ):
+        if not 0 < failure_ratio <= 1 or min_calls < 1 or half_open_probes < 1:
+            raise ValueError(
+                "failure_ratio in (0, 1], min_calls >= 1 and half_open_probes >= 1"
+            )
+        self.failure_ratio = failure_ratio
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+
+        self._state = BreakerState.CLOSED
+        self._calls: deque[bool] = deque(maxlen=window_size)
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self.times_opened = 0
+
+    def state(self, now: float) -> BreakerState:
+        if (
+            self._state == BreakerState.OPEN
+            and now >= self._opened_at + self.open_seconds
+        ):
+            self._state = BreakerState.HALF_OPEN
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+        return self._state
+
+    def reopens_at(self) -> float:
+        """When an open breaker starts letting probes through."""
+        return self._opened_at + self.open_seconds
+
+    def retry_after(self, now: float) -> float:
+        """Seconds until an open breaker lets probes through; 0 otherwise."""
+        if self.state(now) != BreakerState.OPEN:
+            return 0.0
+        return max(0.0, self.reopens_at() - now)
+
+    def allow(self, now: float) -> bool:
+        """
+        Whether a call may go through now.
+
+        In half-open state this takes one of the probe slots; pair it with
+        record() or release().
+        """
+        state = self.state(now)
+        if state == BreakerState.CLOSED:
+            return True
+        if state == BreakerState.OPEN:
+            return False
+        if self._probes_in_flight + self._probe_successes >= self.half_open_probes:
+            return False
+        self._probes_in_flight += 1
+        return True
+
+    def release(self) -> None:
+        """Give back a probe slot taken by allow() for a call never made."""
+        if self._state == BreakerState.HALF_OPEN and self._probes_in_flight:
+            self._probes_in_flight -= 1
+
+    def record(self, ok: bool, now: float) -> bool:
+        """
+        Record the outcome of a call. Returns True if this call opened the breaker.
+        """
+        state = self.state(now)
+
+        if state == BreakerState.HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+            if not ok:
+                self._open(now)
+                return True
+            self._probe_successes += 1
+            if self._probe_successes >= self.half_open_probes:
+                self._state = BreakerState.CLOSED
+                self._calls.clear()
+                self._failures = 0
+            return False
+
+        if state == BreakerState.OPEN:
+            # Late result of a call admitted before the breaker opened
+            return False
+
+        if len(self._calls) == self._calls.maxlen and not self._calls[0]:
+            self._failures -= 1
+        self._calls.append(ok)
+        if not ok:
+            self._failures += 1
+
+        if len(
+            self._calls
+        ) >= self.min_calls and self._failures >= self.failure_ratio * len(self._calls):
+            self._open(now)
+            return True
+        return False
+
+    def _open(self, now: float) -> None:
+        self._state = BreakerState.OPEN
+        self._opened_at = now
+        self._calls.clear()
+        self._failures = 0
+        self.times_opened += 1
+
+    def snapshot(self, now: float) -> dict:
+        state = self.state(now)
+        return {
+            "state": state.value,
+            "recent_calls": len(self._calls),
+            "recent_failures": self._failures,
+            "times_opened": self.times_opened,
+            "reopens_in_seconds": (
+                round(max(0.0, self.reopens_at() - now), 1)
+                if state == BreakerState.OPEN
+                else None
+            ),
+        }
+
+
+class ProcessorBreakers:
+    """One circuit breaker per processor, created on first use."""
+
+    def __init__(self, **breaker_options):
+        self._options = breaker_options
+        self._breakers: dict[str, CircuitBreaker] = {}
+
+    def get(self, processor: str) -> CircuitBreaker:
+        breaker = self._breakers.get(processor)
+        if breaker is None:
+            breaker = CircuitBreaker(**self._options)
+            self._breakers[processor] = breaker
+        return breaker
+
+    def snapshot(self) -> dict[str, dict]:
+        now = time.monotonic()
+        return {
+            processor: breaker.snapshot(now)
+            for processor, breaker in sorted(self._breakers.items())
+        }
@@ -0,0 +1,130 @@
+"""
+Cross-process invalidation of the retry config cache.
+
+Config updates publish the merchant id on a Postgres NOTIFY channel (see
+update_retry_config_by_merchant_id). Every API and worker process keeps
+one dedicated asyncpg connection LISTENing on it and evicts the merchant
+from its own cache.
+"""
+
+import asyncio
+import logging
+from uuid import UUID
+
+import asyncpg
+
+from app.core.config import settings
+from app.core.database import engine
+from app.services.retry_config import config_cache
+from app.services.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class ConfigCacheListener:
+    """
+    Evicts cache entries named by NOTIFY payloads.
+
+    The connection is checked every `keepalive_seconds` and reopened after
+    `reconnect_seconds` if it drops. Notifications sent while disconnected
+    are lost, so the whole cache is cleared on every (re)connect.
+    """
+
+    def __init__(
+        self,
+        cache: TTLCache,
+        dsn: str,
+        channel: str,
+        keepalive_seconds: float,
+        reconnect_seconds: float,
+    ):
+        self.cache = cache
+        self.dsn = dsn
+        self.channel = channel
+        self.keepalive_seconds = keepalive_seconds
+        self.reconnect_seconds = reconnect_seconds
+        self.connected = False
+        self.notifications = 0
+        self.reconnects = 0
+        self._task: asyncio.Task | None = None
+        self._stopping = asyncio.Event()
+
+    async def start(self) -> None:
+        if self._task:
+            return
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._run(), name="config-cache-listener")
+
+    async def stop(self) -> None:
+        if not self._task:
+            return
+        self._stopping.set()
+        await self._task
+        self._task = None
+
+    def _on_notify(self, _connection, _pid: int, _channel: str, payload: str) -> None:
+        self.notifications += 1
+        try:
+            merchant_id = UUID(payload)
+        except ValueError:
+            logger.warning("Unexpected config notification %r, clearing cache", payload)
+            self.cache.clear()
+            return
+        self.cache.invalidate(merchant_id)
+
+    async def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                await self._listen()
+            except Exception:
+                logger.exception("Config cache listener disconnected")
+            finally:
+                self.connected = False
+            if self._stopping.is_set():
+                break
+            self.reconnects += 1
+            try:
+                await asyncio.wait_for(
+                    self._stopping.wait(), timeout=self.reconnect_seconds
+                )
+            except TimeoutError:
+                pass
+
+    async def _listen(self) -> None:
+        connection = await asyncpg.connect(self.dsn)
+        try:
+            await connection.add_listener(self.channel, self._on_notify)
+            self.cache.clear()
+            self.connected = True
+            logger.info("Listening for config changes on %s", self.channel)
+            while not self._stopping.is_set():
+                try:
+                    await asyncio.wait_for(
+                        self._stopping.wait(), timeout=self.keepalive_seconds
+                    )
+                except TimeoutError:
+                    # An idle connection can die silently; this surfaces it
+                    await connection.fetchval("SELECT 1")
+        finally:
+            try:
+                await connection.close(timeout=5)
+            except Exception:
+                connection.terminate()
+
+    def snapshot(self) -> dict:
+        return {
+            "channel": self.channel,
+            "connected": self.connected,
+            "notifications": self.notifications,
+            "reconnects": self.reconnects,
+        }
+
+
+config_listener = ConfigCacheListener(
+    config_cache,
+    # asyncpg takes a plain postgresql:// DSN, without the SQLAlchemy driver
+    engine.url.set(drivername="postgresql").render_as_string(hide_password=False),
+    settings.RETRY_CONFIG_NOTIFY_CHANNEL,
+    settings.RETRY_CONFIG_LISTEN_KEEPALIVE_SECONDS,
+    settings.RETRY_CONFIG_LISTEN_RECONNECT_SECONDS,
+)
@@ -0,0 +1,31 @@
+"""
+Opaque keyset pagination cursors.
+
+A cursor is the (created_at, id) of the last row of a page, encoded as
+URL-safe base64 so clients pass it back untouched. The next page is
+everything strictly after it in `ORDER BY created_at DESC, id DESC`,
+which an index on those columns serves at the same cost for any page.
+"""
+
+import base64
+import binascii
+from datetime import datetime
+from uuid import UUID
+
+
+class InvalidCursor(ValueError):
+    """The cursor was not produced by encode_cursor."""
+
+
+def encode_cursor(created_at: datetime, row_id: UUID) -> str:
+    raw = f"{created_at.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, row_id = raw.split("|")
+        return datetime.fromisoformat(created_at), UUID(row_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor!r}") from e
@@ -0,0 +1,85 @@
+"""
+Encoders for streamed exports.
+
+Rows arrive as plain tuples in chunks from a server-side cursor and leave
+as bytes, so an export never holds more than one chunk in memory.
+"""
+
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime
+from enum import Enum
+from typing import AsyncIterator, Iterable, Sequence
+from uuid import UUID
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=_json_default)
+    if isinstance(value, UUID):
+        return str(value)
+    return value
+
+
+def encode_ndjson(columns: Sequence[str], rows: Iterable[Sequence]) -> bytes:
+    """One JSON object per row, newline-terminated."""
+    return "".join(
+        json.dumps(dict(zip(columns, row)), default=_json_default) + "\n"
+        for row in rows
+    ).encode()
+
+
+def encode_csv(columns: Sequence[str], rows: Iterable[Sequence]) -> bytes:
+    """CSV lines for `rows`, without a header."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows([_csv_value(value) for value in row] for row in rows)
+    return buffer.getvalue().encode()
+
+
+def csv_header(columns: Sequence[str]) -> bytes:
+    return encode_csv(columns, [columns])
+
+
+async def encode_chunks(
+    export_format: str,
+    columns: Sequence[str],
+    chunks: AsyncIterator[Sequence[Sequence]],
+) -> AsyncIterator[bytes]:
+    """Encode row chunks as they arrive; CSV starts with a header line."""
+    if export_format == "csv":
+        yield csv_header(columns)
+        encode = encode_csv
+    else:
+        encode = encode_ndjson
+    async for rows in chunks:
+        yield encode(columns, rows)
+
+
+async def gzip_chunks(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Compress a byte stream into a single gzip member, chunk by chunk."""
+    compressor = zlib.compressobj(wbits=31)  # 31: gzip header and trailer
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
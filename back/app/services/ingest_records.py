@@ -0,0 +1,140 @@
+"""
+Parsing of bulk failed-payment files.
+
+Files are NDJSON (one object per line) or CSV with a header line, with
+the fields of FailedPaymentRecord. Lines are validated one by one so a bad
+line is reported with its number instead of failing the whole file.
+"""
+
+import csv
+import json
+import zlib
+from datetime import datetime
+from typing import Iterable, Iterator
+from uuid import UUID
+
+from pydantic import BaseModel, Field, ValidationError, field_validator
+
+from app.models.payment import FailureType
+
+INGEST_FORMATS = ("ndjson", "csv")
+
+
+class BodyTooLarge(ValueError):
+    """The (decompressed) body is over the allowed size."""
+
+
+def decode_body(body: bytes, gzipped: bool, max_bytes: int) -> str:
+    """
+    Text of an upload body, gunzipped when `gzipped`. Decompression stops
+    as soon as the output passes `max_bytes` (BodyTooLarge), so a small
+    gzip bomb can't exhaust memory. Corrupt gzip or non UTF-8 content
+    raises ValueError.
+    """
+    if len(body) > max_bytes:
+        raise BodyTooLarge(f"Body is larger than {max_bytes} bytes")
+    if gzipped:
+        chunks = []
+        size = 0
+        data = body
+        # Concatenated gzip members are one stream, as for gzip.decompress
+        while data:
+            decompressor = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+            try:
+                chunk = decompressor.decompress(data, max_bytes - size + 1)
+            except zlib.error as e:
+                raise ValueError(f"Invalid gzip body: {e}") from e
+            size += len(chunk)
+            if size > max_bytes:
+                raise BodyTooLarge(
+                    f"Decompressed body is larger than {max_bytes} bytes"
+                )
+            if not decompressor.eof:
+                raise ValueError("Invalid gzip body: truncated stream")
+            chunks.append(chunk)
+            data = decompressor.unused_data
+        body = b"".join(chunks)
+    try:
+        return body.decode()
+    except UnicodeDecodeError as e:
+        raise ValueError(
+            f"Body is not valid UTF-8: {e.reason} at byte {e.start}"
+        ) from e
+
+
+class FailedPaymentRecord(BaseModel):
+    """One failed payment to ingest."""
+
+    merchant_id: UUID
+    amount_cents: int = Field(gt=0)
+    currency: str = Field(default="USD", min_length=3, max_length=3)
+    failure_type: FailureType
+    failure_code: str | None = Field(default=None, max_length=100)
+    failure_message: str | None = None
+    card_last4: str | None = Field(default=None, max_length=4)
+    card_brand: str | None = Field(default=None, max_length=20)
+    card_fingerprint: str | None = Field(default=None, max_length=100)
+    processor: str = Field(default="stripe", max_length=50)
+    processor_payment_id: str | None = Field(default=None, max_length=255)
+    # When the payment failed; defaults to the ingestion time
+    failed_at: datetime | None = None
+
+    @field_validator("failed_at")
+    @classmethod
+    def _naive_local_time(cls, value: datetime | None) -> datetime | None:
+        # Timestamps are stored naive, in the server's local time
+        if value is not None and value.tzinfo is not None:
+            return value.astimezone().replace(tzinfo=None)
+        return value
+
+
+class RejectedLine(BaseModel):
+    line: int
+    error: str
+
+
+class IngestResult(BaseModel):
+    payments: int = 0
+    retry_jobs: int = 0
+    rejected: list[RejectedLine] = []
+
+
+def _validation_error(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}"
+        for item in error.errors()
+    )
+
+
+def _parse_ndjson(lines: Iterable[str]) -> Iterator[tuple[int, dict | str]]:
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield number, f"invalid JSON: {e.msg}"
+            continue
+        yield number, data if isinstance(data, dict) else "expected a JSON object"
+
+
+def _parse_csv(lines: Iterable[str]) -> Iterator[tuple[int, dict | str]]:
+    reader = csv.DictReader(lines)
+    for row in reader:
+        # Empty cells are missing values, so model defaults apply
+        yield reader.line_num, {k: v for k, v in row.items() if k and v != ""}
+
+
+def parse_records(
+    lines: Iterable[str], ingest_format: str
+) -> Iterator[tuple[int, FailedPaymentRecord | str]]:
+    """(line number, record or error message) for every line, in file order."""
+    parse = _parse_csv if ingest_format == "csv" else _parse_ndjson
+    for number, data in parse(lines):
+        if isinstance(data, str):
+            yield number, data
+            continue
+        try:
+            yield number, FailedPaymentRecord.model_validate(data)
+        except ValidationError as e:
+            yield number, _validation_error(e)
@@ -0,0 +1,28 @@
+"""
+JSON encoding of plain rows for read-heavy list endpoints.
+
+List endpoints select only the columns they serve into Core rows and
+encode them here, instead of building a model instance per row and
+validating it again through a response_model. pydantic_core's encoder
+produces the same JSON FastAPI would (ISO datetimes, UUID strings, enum
+values) in a single native pass.
+"""
+
+from typing import Any, Iterable, Sequence
+
+from pydantic_core import to_json
+
+
+def row_dicts(columns: Sequence[str], rows: Iterable[Sequence]) -> list[dict]:
+    """One dict per row, keyed by `columns`."""
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def encode_rows(columns: Sequence[str], rows: Iterable[Sequence]) -> bytes:
+    """A JSON array with one object per row."""
+    return to_json(row_dicts(columns, rows))
+
+
+def encode_json(value: Any) -> bytes:
+    """JSON for a response body mixing plain values and row_dicts()."""
+    return to_json(value)
@@ -0,0 +1,157 @@
+"""
+Minimal Prometheus metrics, rendered in the text exposition format.
+
+Only what the app needs: counters, histograms and gauges read from a
+callback at scrape time. Metrics are per process, like the rest of the
+in-memory state.
+"""
+
+import bisect
+from typing import Callable
+
+# Seconds; dense at the low end where a healthy pool checkout lands
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+
+def _labels(labels: dict[str, str], **extra: str) -> str:
+    labels = {**labels, **extra}
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}"
+
+
+def _format(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class Counter:
+    """Monotonic counter."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: dict[str, str] | None = None):
+        self.name = name
+        self.help = help
+        self.labels = labels or {}
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def samples(self) -> list[str]:
+        return [f"{self.name}{_labels(self.labels)} {_format(self.value)}"]
+
+
+class Gauge:
+    """Gauge whose value is read from `read()` at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        read: Callable[[], float],
+        labels: dict[str, str] | None = None,
+    ):
+        self.name = name
+        self.help = help
+        self.read = read
+        self.labels = labels or {}
+
+    def samples(self) -> list[str]:
+        return [f"{self.name}{_labels(self.labels)} {_format(self.read())}"]
+
+
+class Histogram:
+    """Cumulative histogram with fixed upper bounds."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+        labels: dict[str, str] | None = None,
+    ):
+        if list(buckets) != sorted(buckets):
+            raise ValueError("Histogram buckets must be sorted")
+        self.name = name
+        self.help = help
+        self.labels = labels or {}
+        self.buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)  # last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self._counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def samples(self) -> list[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip((*self.buckets, float("inf")), self._counts):
+            cumulative += count
+            labels = _labels(self.labels, le=_format(bound))
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _labels(self.labels)
+        lines.append(f"{self.name}_sum{labels} {_format(self.sum)}")
+        lines.append(f"{self.name}_count{labels} {self.count}")
+        return lines
+
+
+class Registry:
+    """
+    Named metrics of one process.
+
+    Metrics may share a name when they have the same kind and different
+    labels; they are rendered as one family.
+    """
+
+    def __init__(self):
+        self._metrics: dict[str, list[Counter | Gauge | Histogram]] = {}
+
+    def register(self, metric):
+        """Add a metric and return it."""
+        family = self._metrics.setdefault(metric.name, [])
+        for other in family:
+            if other.kind != metric.kind:
+                raise ValueError(f"Metric {metric.name} is already a {other.kind}")
+            if other.labels == metric.labels:
+                raise ValueError(f"Metric {metric.name} is already registered")
+        family.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for name, family in self._metrics.items():
+            lines.append(f"# HELP {name} {family[0].help}")
+            lines.append(f"# TYPE {name} {family[0].kind}")
+            for metric in family:
+                lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
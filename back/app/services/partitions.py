@@ -0,0 +1,42 @@
+"""
+Calendar helpers for monthly range partitions.
+
+A table partitioned by month has one child per calendar month named
+`<table>_pYYYY_MM`, holding rows with `month <= created_at < next month`.
+"""
+
+import re
+from datetime import date, datetime
+
+
+def month_start(value: date | datetime) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y_%m}"
+
+
+def partition_month(table: str, name: str) -> date | None:
+    """The month a partition covers, or None if `name` is not one of `table`'s."""
+    match = re.fullmatch(rf"{re.escape(table)}_p(\d{{4}})_(\d{{2}})", name)
+    if not match:
+        return None
+    year, month = int(match[1]), int(match[2])
+    return date(year, month, 1) if 1 <= month <= 12 else None
+
+
+def months_to_create(now: datetime, months_ahead: int) -> list[date]:
+    """The current month and the next `months_ahead` ones."""
+    current = month_start(now)
+    return [add_months(current, offset) for offset in range(months_ahead + 1)]
+
+
+def archive_cutoff(now: datetime, retention_months: int) -> date:
+    """Partitions for months before this one are past retention."""
+    return add_months(month_start(now), -retention_months)
@@ -0,0 +1,273 @@
+"""
+Bulk ingestion of failed payments.
+
+A batch of records is loaded in one transaction. Payments, their first
+retry_jobs and the payment_failed / retry_scheduled audit rows are built
+in a single pass over the batch, with retry rules from the cached merchant
+policies, and written with one asyncpg COPY per table followed by one
+stats rollup upsert. Jobs are picked up by the native retry scheduler; n8n
+is not notified, so ingestion is refused unless RETRY_NATIVE_SCHEDULING
+is on.
+
+    python -m app.services.payment_ingest failures.ndjson[.gz] [--format csv]
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator
+from uuid import uuid4
+
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.core.database import SessionDep, engine
+from app.models.merchant import Merchant
+from app.models.payment import PaymentStatus
+from app.models.retry_job import RetryJobStatus
+from app.services.ingest_records import (
+    FailedPaymentRecord,
+    IngestResult,
+    RejectedLine,
+    parse_records,
+)
+from app.services.payment_stats import PaymentStatsDelta, apply_payment_stats_delta
+from app.services.retry_config import get_policies_by_merchant_ids
+from app.services.retry_execution import retry_planner
+
+PAYMENT_COLUMNS = (
+    "id",
+    "merchant_id",
+    "amount_cents",
+    "currency",
+    "card_last4",
+    "card_brand",
+    "card_fingerprint",
+    "processor",
+    "processor_payment_id",
+    "status",
+    "failure_type",
+    "failure_code",
+    "failure_message",
+    "retry_count",
+    "recovered_via_retry",
+    "created_at",
+    "updated_at",
+)
+RETRY_JOB_COLUMNS = (
+    "id",
+    "payment_id",
+    "merchant_id",
+    "attempt_number",
+    "failure_type",
+    "scheduled_at",
+    "status",
+    "created_at",
+    "updated_at",
+)
+AUDIT_LOG_COLUMNS = (
+    "id",
+    "event_type",
+    "payment_id",
+    "merchant_id",
+    "attempt_number",
+    "failure_type",
+    "card_last4",
+    "amount_cents",
+    "currency",
+    "metadata_json",
+    "created_at",
+)
+
+
+async def ingest_failed_payments(
+    session: SessionDep, records: list[tuple[int, FailedPaymentRecord]]
+) -> IngestResult:
+    """
+    Load (line number, record) pairs as failed payments.
+
+    Records of unknown merchants, or merchants without a retry
+    configuration, are rejected; the rest are written. The caller owns the
+    transaction.
+    """
+    result = IngestResult()
+    if not records:
+        return result
+
+    merchant_ids = {record.merchant_id for _, record in records}
+    # Also opens the transaction the COPYs below run in
+    known = set(
+        (
+            await session.execute(
+                select(Merchant.id).where(Merchant.id.in_(merchant_ids))  # type: ignore
+            )
+        )
+        .scalars()
+        .all()
+    )
+    policies = await get_policies_by_merchant_ids(session, merchant_ids & known)
+
+    now = datetime.now()
+    payments: list[tuple] = []
+    jobs: list[tuple] = []
+    audit_logs: list[tuple] = []
+    stats_delta = PaymentStatsDelta()
+
+    for line, record in records:
+        policy = policies.get(record.merchant_id)
+        if policy is None:
+            result.rejected.append(
+                RejectedLine(
+                    line=line,
+                    error="Unknown merchant or no retry configuration",
+                )
+            )
+            continue
+
+        payment_id = uuid4()
+        failed_at = record.failed_at or now
+        failure_type = record.failure_type.value
+        rule = policy.rule(record.failure_type)
+        status = PaymentStatus.RETRYING if rule.enabled else PaymentStatus.FAILED
+
+        payments.append(
+            (
+                payment_id,
+                record.merchant_id,
+                record.amount_cents,
+                record.currency,
+                record.card_last4,
+                record.card_brand,
+                record.card_fingerprint,
+                record.processor,
+                record.processor_payment_id,
+                status.value,
+                failure_type,
+                record.failure_code or failure_type,
+                record.failure_message,
+                0,
+                False,
+                failed_at,
+                now,
+            )
+        )
+        stats_delta.add(record.merchant_id, status, record.amount_cents)
+        audit_logs.append(
+            (
+                uuid4(),
+                "payment_failed",
+                payment_id,
+                record.merchant_id,
+                None,
+                failure_type,
+                record.card_last4,
+                record.amount_cents,
+                record.currency,
+                None,
+                failed_at,
+            )
+        )
+
+        if not rule.enabled:
+            continue
+        scheduled_at = retry_planner.plan(now, rule.delay_minutes * 60)
+        jobs.append(
+            (
+                uuid4(),
+                payment_id,
+                record.merchant_id,
+                1,
+                failure_type,
+                scheduled_at,
+                RetryJobStatus.PENDING.value,
+                now,
+                now,
+            )
+        )
+        audit_logs.append(
+            (
+                uuid4(),
+                "retry_scheduled",
+                payment_id,
+                record.merchant_id,
+                1,
+                failure_type,
+                None,
+                None,
+                None,
+                json.dumps(
+                    {
+                        "scheduled_at": scheduled_at.isoformat(),
+                        "delay_minutes": rule.delay_minutes,
+                    }
+                ),
+                now,
+            )
+        )
+
+    if payments:
+        connection = await session.connection()
+        raw = await connection.get_raw_connection()
+        copy = raw.driver_connection.copy_records_to_table  # type: ignore[union-attr]
+        await copy("payments", records=payments, columns=PAYMENT_COLUMNS)
+        if jobs:
+            await copy("retry_jobs", records=jobs, columns=RETRY_JOB_COLUMNS)
+        await copy("retry_audit_logs", records=audit_logs, columns=AUDIT_LOG_COLUMNS)
+        await apply_payment_stats_delta(session, stats_delta)
+
+    result.payments = len(payments)
+    result.retry_jobs = len(jobs)
+    return result
+
+
+def split_records(
+    parsed: Iterable[tuple[int, FailedPaymentRecord | str]],
+    rejected: list[RejectedLine],
+) -> Iterator[tuple[int, FailedPaymentRecord]]:
+    """Valid records; parse errors are appended to `rejected`."""
+    for line, record in parsed:
+        if isinstance(record, str):
+            rejected.append(RejectedLine(line=line, error=record))
+        else:
+            yield line, record
+
+
+async def _ingest_file(path: Path, ingest_format: str, batch_size: int) -> None:
+    opener = gzip.open if path.suffix == ".gz" else open
+    total = IngestResult()
+    with opener(path, "rt", newline="", encoding="utf-8") as lines:  # type: ignore[operator]
+        records = split_records(parse_records(lines, ingest_format), total.rejected)
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            while batch := list(islice(records, batch_size)):
+                result = await ingest_failed_payments(session, batch)
+                await session.commit()
+                total.payments += result.payments
+                total.retry_jobs += result.retry_jobs
+                total.rejected.extend(result.rejected)
+                print(f"{total.payments} payments loaded", flush=True)
+    await engine.dispose()
+    print(total.model_dump_json(indent=2))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bulk-load failed payments")
+    parser.add_argument("path", type=Path, help="NDJSON or CSV file, optionally .gz")
+    parser.add_argument("--format", choices=("ndjson", "csv"))
+    parser.add_argument("--batch-size", type=int, default=settings.INGEST_BATCH_SIZE)
+    args = parser.parse_args()
+    if not settings.native_scheduling:
+        # Nothing else would ever run the jobs
+        parser.error("ingested retries need RETRY_NATIVE_SCHEDULING=true")
+
+    suffixes = args.path.suffixes
+    ingest_format = args.format or ("csv" if ".csv" in suffixes else "ndjson")
+    asyncio.run(_ingest_file(args.path, ingest_format, args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Per-merchant payment stats rollup.
+
+merchant_payment_stats holds one (count, amount) row per merchant and
+status. Every code path that inserts payments or changes their status
+adds its deltas in the same transaction, so reading a merchant's stats
+touches a handful of rows instead of its whole payment history.
+
+If the rollup ever drifts, rebuild it from payments:
+
+    python -m app.services.payment_stats [--merchant-id UUID]
+"""
+
+import argparse
+import asyncio
+from collections import defaultdict
+from uuid import UUID
+
+from sqlalchemy import Select, delete, func, insert, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.database import SessionDep, engine
+from app.models.merchant_payment_stats import MerchantPaymentStats
+from app.models.payment import Payment, PaymentStatus
+
+
+class PaymentStatsDelta:
+    """Count and amount changes per (merchant, status), applied in one upsert."""
+
+    def __init__(self):
+        self._rows: defaultdict[tuple[UUID, PaymentStatus], list[int]] = defaultdict(
+            lambda: [0, 0]
+        )
+
+    def add(self, merchant_id: UUID, status: PaymentStatus, amount_cents: int) -> None:
+        """A new payment in `status`."""
+        row = self._rows[merchant_id, status]
+        row[0] += 1
+        row[1] += amount_cents
+
+    def move(
+        self,
+        merchant_id: UUID,
+        amount_cents: int,
+        old_status: PaymentStatus,
+        new_status: PaymentStatus,
+    ) -> None:
+        """A payment going from `old_status` to `new_status`."""
+        if old_status == new_status:
+            return
+        self.add(merchant_id, new_status, amount_cents)
+        row = self._rows[merchant_id, old_status]
+        row[0] -= 1
+        row[1] -= amount_cents
+
+    def rows(self) -> list[dict]:
+        # Sorted so concurrent transactions lock rollup rows in the same order
+        return [
+            {
+                "merchant_id": merchant_id,
+                "status": status,
+                "payment_count": count,
+                "amount_cents": amount,
+            }
+            for (merchant_id, status), (count, amount) in sorted(
+                self._rows.items(), key=lambda item: (str(item[0][0]), item[0][1])
+            )
+            if count or amount
+        ]
+
+
+def upsert_stats_deltas(rows: list[dict] | Select):
+    """
+    INSERT ... ON CONFLICT that adds delta rows to the rollup.
+
+    `rows` is either a list of row dicts or a SELECT of (merchant_id,
+    status, payment_count, amount_cents), e.g. from a CTE.
+    """
+    statement = pg_insert(MerchantPaymentStats)
+    statement = (
+        statement.values(rows)
+        if isinstance(rows, list)
+        else statement.from_select(
+            ["merchant_id", "status", "payment_count", "amount_cents"],
+            rows,
+            include_defaults=False,  # updated_at falls back to the column's NOW()
+        )
+    )
+    table = MerchantPaymentStats.__table__
+    return statement.on_conflict_do_update(
+        index_elements=[table.c.merchant_id, table.c.status],
+        set_={
+            "payment_count": table.c.payment_count + statement.excluded.payment_count,
+            "amount_cents": table.c.amount_cents + statement.excluded.amount_cents,
+            "updated_at": func.now(),
+        },
+    )
+
+
+async def apply_payment_stats_delta(
+    session: SessionDep, delta: PaymentStatsDelta
+) -> None:
+    """Add a delta to the rollup. The caller owns the transaction."""
+    rows = delta.rows()
+    if rows:
+        await session.execute(upsert_stats_deltas(rows))
+
+
+async def get_payment_stats_by_merchant_id(
+    session: SessionDep, merchant_id: UUID
+) -> dict[PaymentStatus, tuple[int, int]]:
+    """Payment count and amount_cents total per status, from the rollup."""
+    result = await session.exec(
+        select(MerchantPaymentStats).where(
+            MerchantPaymentStats.merchant_id == merchant_id
+        )
+    )
+    stats = {status: (0, 0) for status in PaymentStatus}
+    for row in result.all():
+        stats[row.status] = (row.payment_count, row.amount_cents)
+    return stats
+
+
+async def rebuild_payment_stats(
+    session: SessionDep, merchant_id: UUID | None = None
+) -> int:
+    """
+    Recompute the rollup from payments, for one merchant or all of them.
+
+    The rollup table is locked against concurrent deltas while it is
+    rebuilt; transitions wait and apply on top of the new rows. Returns
+    the number of rows written.
+    """
+    await session.execute(
+        text("LOCK TABLE merchant_payment_stats IN SHARE ROW EXCLUSIVE MODE")
+    )
+
+    clear = delete(MerchantPaymentStats)
+    totals = select(
+        Payment.merchant_id,
+        Payment.status,
+        func.count(),
+        func.coalesce(func.sum(Payment.amount_cents), 0),
+        func.now(),
+    ).group_by(Payment.merchant_id, Payment.status)
+    if merchant_id:
+        clear = clear.where(MerchantPaymentStats.merchant_id == merchant_id)
+        totals = totals.where(Payment.merchant_id == merchant_id)
+
+    await session.execute(clear)
+    result = await session.execute(
+        insert(MerchantPaymentStats).from_select(
+            ["merchant_id", "status", "payment_count", "amount_cents", "updated_at"],
+            totals,
+        )
+    )
+    await session.commit()
+    return result.rowcount
+
+
+async def _rebuild(merchant_id: UUID | None) -> None:
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        rows = await rebuild_payment_stats(session, merchant_id)
+    await engine.dispose()
+    scope = f"merchant {merchant_id}" if merchant_id else "all merchants"
+    print(f"Rebuilt merchant_payment_stats for {scope}: {rows} rows")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rebuild merchant_payment_stats")
+    parser.add_argument("--merchant-id", type=UUID, help="Only this merchant")
+    args = parser.parse_args()
+    asyncio.run(_rebuild(args.merchant_id))
+
+
+if __name__ == "__main__":
+    main()
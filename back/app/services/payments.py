@@ -1,9 +1,19 @@
-from uuid import UUID
+from datetime import datetime
+from typing import Iterable
+from uuid import UUID, uuid4
 
+from fastapi import HTTPException, status
+from sqlalchemy import Row, tuple_
 from sqlmodel import select
 
 from app.core.database import SessionDep
-from app.models.payment import Payment
+from app.models.payment import Payment, PaymentRead
+from app.services.cursors import InvalidCursor, decode_cursor, encode_cursor
+from app.services.statements import PAYMENT_BY_ID, TRANSITION_PAYMENT
+
+
+# Columns served by the list endpoint, in PaymentRead order
+PAYMENT_READ_COLUMNS = tuple(PaymentRead.model_fields)
 
 
 async def filter_payments(
@@ -11,22 +21,122 @@ async def filter_payments(
     merchant_id: UUID | None = None,
     status: str | None = None,
     limit: int = 50,
-):
-    query = select(Payment)
+    cursor: str | None = None,
+) -> tuple[list[Row], str | None]:
+    """
+    One page of payments, newest first, and the cursor of the next page.
+
+    Pages are keyset-based on (created_at, id), so any page costs the same
+    as the first. The next cursor is None on the last page. Raises 400 for
+    a cursor this API did not issue. Rows are plain tuples of
+    PAYMENT_READ_COLUMNS, not ORM instances.
+    """
+    payments_table = Payment.__table__
+    query = select(*(payments_table.c[name] for name in PAYMENT_READ_COLUMNS))
 
     if merchant_id:
         query = query.where(Payment.merchant_id == merchant_id)
     if status:
         query = query.where(Payment.status == status)
+    if cursor:
+        try:
+            created_at, payment_id = decode_cursor(cursor)
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e)) from e
+        query = query.where(
+            tuple_(Payment.created_at, Payment.id) < tuple_(created_at, payment_id)
+        )
 
-    query = query.order_by(Payment.created_at.desc()).limit(limit)  # type: ignore
+    # One extra row tells whether there is a next page
+    query = query.order_by(
+        Payment.created_at.desc(),  # type: ignore
+        Payment.id.desc(),  # type: ignore
+    ).limit(limit + 1)
 
     result = await session.exec(query)
-    payments = result.all()
-    return payments
+    payments = list(result.all())
+    if len(payments) <= limit:
+        return payments, None
+    payments = payments[:limit]
+    last = payments[-1]
+    return payments, encode_cursor(last.created_at, last.id)
 
 
 async def get_payment_by_id(session: SessionDep, payment_id: UUID) -> Payment | None:
     """Retrieve a payment by its ID."""
 
-    return await session.get(Payment, payment_id)
+    result = await session.exec(PAYMENT_BY_ID, params={"payment_id": payment_id})
+    return result.one_or_none()
+
+
+async def get_payments_by_ids(
+    session: SessionDep, payment_ids: Iterable[UUID], for_update: bool = False
+) -> dict[UUID, Payment]:
+    """
+    Retrieve many payments in one query, keyed by ID.
+
+    With `for_update`, the rows are locked (in id order, so concurrent
+    batches cannot deadlock) and reloaded even if already in the session.
+    """
+    payment_ids = set(payment_ids)
+    if not payment_ids:
+        return {}
+
+    query = select(Payment).where(Payment.id.in_(payment_ids))  # type: ignore
+    if for_update:
+        query = (
+            query.order_by(Payment.id)
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        )
+    result = await session.exec(query)
+    return {payment.id: payment for payment in result.all()}
+
+
+async def transition_payment_after_attempt(
+    session: SessionDep,
+    payment_id: UUID,
+    attempt_number: int,
+    success: bool,
+    result_code: str | None = None,
+    result_message: str | None = None,
+    retry_count: int | None = None,
+) -> Payment:
+    """
+    Apply the result of a retry attempt to a payment in one statement.
+
+    A CTE locks the payment only while it is still retryable, increments
+    retry_count in the database (or sets it to `retry_count` when given),
+    decides EXHAUSTED against the merchant's max_attempts, inserts the
+    matching audit log and moves the payment between statuses in
+    merchant_payment_stats. The new row is returned. Raises 404 for unknown
+    payments and 409 for payments that no longer accept attempts. The
+    caller owns the transaction.
+    """
+    result = await session.execute(
+        TRANSITION_PAYMENT[success],
+        {
+            "payment_id": payment_id,
+            "now": datetime.now(),
+            "attempt_number": attempt_number,
+            "retry_count": retry_count,
+            "audit_id": uuid4(),
+            "metadata_json": {
+                "result_code": result_code,
+                "result_message": result_message,
+            },
+        },
+    )
+    payment = result.scalar_one_or_none()
+    if payment is not None:
+        return payment
+
+    # Nothing matched: tell a missing payment from one in a final state
+    if await session.get(Payment, payment_id) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Payment not found"
+        )
+    raise HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="Payment no longer accepts retry attempts",
+    )
@@ -0,0 +1,145 @@
+"""
+Per-processor rate limiting for retry execution.
+
+Each processor gets a token bucket (calls per second, with a short burst
+allowance) and a cap on concurrent in-flight calls. Limits are enforced
+per process.
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at `rate` tokens per second."""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated_at")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        if rate <= 0 or capacity < 1:
+            raise ValueError("rate must be > 0 and capacity >= 1")
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = now
+
+    def _refill(self, now: float) -> None:
+        elapsed = max(0.0, now - self.updated_at)
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated_at = now
+
+    def try_acquire(self, now: float, tokens: float = 1) -> bool:
+        """Take `tokens` if available. Never blocks."""
+        self._refill(now)
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+    def retry_after(self, now: float, tokens: float = 1) -> float:
+        """Seconds until `tokens` will be available."""
+        self._refill(now)
+        return max(0.0, (tokens - self.tokens) / self.rate)
+
+
+@dataclass(frozen=True, slots=True)
+class ProcessorLimit:
+    """Rate and concurrency limits for one processor."""
+
+    rate_per_second: float
+    max_concurrency: int
+    burst_seconds: float = 1.0
+
+
+class ProcessorLimiter:
+    """Token bucket plus concurrency cap for every payment processor."""
+
+    def __init__(self, limits: dict[str, ProcessorLimit], default: ProcessorLimit):
+        self._limits = limits
+        self._default = default
+        self._buckets: dict[str, TokenBucket] = {}
+        self._in_flight: dict[str, int] = {}
+
+    def _bucket(self, processor: str, now: float) -> TokenBucket:
+        bucket = self._buckets.get(processor)
+        if bucket is None:
+            limit = self.limit_for(processor)
+            bucket = TokenBucket(
+                limit.rate_per_second,
+                max(1.0, limit.rate_per_second * limit.burst_seconds),
+                now,
+            )
+            self._buckets[processor] = bucket
+        return bucket
+
+    def limit_for(self, processor: str) -> ProcessorLimit:
+        return self._limits.get(processor, self._default)
+
+    def try_acquire(self, processor: str, now: float | None = None) -> bool:
+        """
+        Reserve one call to `processor` without waiting.
+
+        Returns False when the processor is at its concurrency cap or out
+        of tokens. Every successful acquire must be paired with release().
+        """
+        now = time.monotonic() if now is None else now
+        in_flight = self._in_flight.get(processor, 0)
+        if in_flight >= self.limit_for(processor).max_concurrency:
+            return False
+        if not self._bucket(processor, now).try_acquire(now):
+            return False
+        self._in_flight[processor] = in_flight + 1
+        return True
+
+    def try_take_token(self, processor: str, now: float | None = None) -> bool:
+        """
+        Spend one of `processor`'s tokens without taking a concurrency slot.
+
+        For callers that make their processor calls one at a time and never
+        await in between, where a slot would be released before anyone else
+        could see it.
+        """
+        now = time.monotonic() if now is None else now
+        return self._bucket(processor, now).try_acquire(now)
+
+    def release(self, processor: str) -> None:
+        """Free the concurrency slot taken by try_acquire()."""
+        self._in_flight[processor] = max(0, self._in_flight.get(processor, 0) - 1)
+
+    def retry_after(
+        self, processor: str, queued: int = 0, now: float | None = None
+    ) -> float:
+        """
+        Seconds until `processor` is expected to accept another call.
+
+        `queued` counts callers already waiting ahead of this one, so
+        deferred work is spread out instead of retried all at once.
+        """
+        now = time.monotonic() if now is None else now
+        return self._bucket(processor, now).retry_after(now, tokens=1 + queued)
+
+    async def acquire(self, processor: str, timeout: float) -> bool:
+        """Wait up to `timeout` seconds for a call slot."""
+        deadline = time.monotonic() + timeout
+        while not self.try_acquire(processor):
+            # Wait for a token, or poll briefly when blocked on concurrency
+            wait = max(self.retry_after(processor), 0.01)
+            if time.monotonic() + wait > deadline:
+                return False
+            await asyncio.sleep(wait)
+        return True
+
+    def snapshot(self) -> dict[str, dict]:
+        """Current limits and usage per processor, for health endpoints."""
+        now = time.monotonic()
+        processors = set(self._limits) | set(self._buckets)
+        return {
+            processor: {
+                "rate_per_second": self.limit_for(processor).rate_per_second,
+                "max_concurrency": self.limit_for(processor).max_concurrency,
+                "in_flight": self._in_flight.get(processor, 0),
+                "tokens": round(self._bucket(processor, now).tokens, 2),
+            }
+            for processor in sorted(processors)
+        }
@@ -0,0 +1,49 @@
+"""
+Bounded-staleness gate for the read replica.
+
+A monitor measures the replica's replication lag periodically and records
+it here. Reads go to the replica only while the last measurement is both
+recent and within the allowed lag; otherwise, including when the replica
+cannot be reached, they fall back to the primary.
+"""
+
+
+class ReplicaHealth:
+    """
+    Last known replica lag and whether reads may use the replica.
+
+    A measurement older than `max_age_seconds` counts as unknown, so a
+    stuck monitor sends reads to the primary instead of trusting old data.
+    """
+
+    def __init__(self, max_lag_seconds: float, max_age_seconds: float):
+        self.max_lag_seconds = max_lag_seconds
+        self.max_age_seconds = max_age_seconds
+        self.lag_seconds: float | None = None
+        self.error: str | None = None
+        self._measured_at: float | None = None
+
+    def record(self, lag_seconds: float, now: float) -> None:
+        self.lag_seconds = lag_seconds
+        self.error = None
+        self._measured_at = now
+
+    def record_error(self, error: str) -> None:
+        self.lag_seconds = None
+        self.error = error
+        self._measured_at = None
+
+    def usable(self, now: float) -> bool:
+        if self.lag_seconds is None or self._measured_at is None:
+            return False
+        if now - self._measured_at > self.max_age_seconds:
+            return False
+        return self.lag_seconds <= self.max_lag_seconds
+
+    def snapshot(self, now: float) -> dict:
+        return {
+            "usable": self.usable(now),
+            "lag_seconds": self.lag_seconds,
+            "max_lag_seconds": self.max_lag_seconds,
+            "error": self.error,
+        }
@@ -0,0 +1,95 @@
+"""
+Replication lag monitor for the read replica.
+
+Every REPLICA_LAG_CHECK_SECONDS the replica reports how far its replay is
+behind, and the result feeds replica_health, which read sessions consult
+to pick an engine. A no-op when no DATABASE_REPLICA_URL is configured.
+"""
+
+import asyncio
+import logging
+import time
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.config import settings
+from app.core.database import replica_engine, replica_health
+from app.services.replica_health import ReplicaHealth
+
+logger = logging.getLogger(__name__)
+
+# Seconds of replay lag. Zero when fully replayed and still streaming (an
+# idle primary leaves the last replay timestamp old), or when the URL
+# points at a server that is not a standby.
+LAG_QUERY = text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn()
+            AND EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming')
+            THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+    """
+)
+
+
+class ReplicaMonitor:
+    """Measures replica lag every `interval` seconds into `health`."""
+
+    def __init__(
+        self, engine: AsyncEngine | None, health: ReplicaHealth, interval: float
+    ):
+        self.engine = engine
+        self.health = health
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+        self._stopping = asyncio.Event()
+
+    async def start(self) -> None:
+        if self._task or self.engine is None:
+            return
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._run(), name="replica-monitor")
+
+    async def stop(self) -> None:
+        if not self._task:
+            return
+        self._stopping.set()
+        await self._task
+        self._task = None
+
+    async def check(self) -> None:
+        try:
+            async with self.engine.connect() as connection:  # type: ignore[union-attr]
+                lag = await asyncio.wait_for(
+                    connection.scalar(LAG_QUERY), timeout=self.interval
+                )
+        except Exception as e:
+            if self.health.error is None:
+                logger.warning("Replica lag check failed: %s", e)
+            self.health.record_error(str(e) or type(e).__name__)
+            return
+        if lag is None:
+            self.health.record_error("Replica has not replayed any transaction")
+        else:
+            self.health.record(float(lag), time.monotonic())
+
+    async def _run(self) -> None:
+        while not self._stopping.is_set():
+            await self.check()
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.interval)
+            except TimeoutError:
+                pass
+
+    def snapshot(self) -> dict | None:
+        if self.engine is None:
+            return None
+        return self.health.snapshot(time.monotonic())
+
+
+replica_monitor = ReplicaMonitor(
+    replica_engine, replica_health, settings.REPLICA_LAG_CHECK_SECONDS
+)
@@ -1,25 +1,111 @@
+from typing import Iterable
 from uuid import UUID
 
 from fastapi import HTTPException, status
+from sqlalchemy import func
 from sqlmodel import select
 
+from app.core.config import settings
 from app.core.database import SessionDep
 from app.models.retry_config import MerchantRetryConfig, RetryConfigUpdate
+from app.services.retry_policy import RetryPolicy
+from app.services.statements import CONFIG_BY_MERCHANT
+from app.services.ttl_cache import MISSING, TTLCache
 
+# Configs change rarely and are read on every failure and retry, so the
+# cache holds their compiled RetryPolicy (None for merchants without a
+# config). The rows kept in policy.config are expunged from their session
+# and must be treated as read-only.
+config_cache = TTLCache(
+    max_entries=settings.RETRY_CONFIG_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.RETRY_CONFIG_CACHE_TTL_SECONDS,
+)
 
-async def get_config_by_merchant_id(
+
+def _cache_policy(
+    session: SessionDep,
+    merchant_id: UUID,
+    config: MerchantRetryConfig | None,
+    generation: tuple[int, int],
+) -> RetryPolicy | None:
+    policy = None
+    if config is not None:
+        session.expunge(config)
+        policy = RetryPolicy.from_config(config)
+    # Not cached if an update invalidated the merchant during the load
+    config_cache.set(merchant_id, policy, generation=generation)
+    return policy
+
+
+async def _load_config(
     session: SessionDep,
     merchant_id: UUID,
 ) -> MerchantRetryConfig | None:
-    """Retrieve retry configuration for a specific merchant."""
+    result = await session.exec(CONFIG_BY_MERCHANT, params={"merchant_id": merchant_id})
+    return result.one_or_none()
+
+
+async def get_policy_by_merchant_id(
+    session: SessionDep,
+    merchant_id: UUID,
+) -> RetryPolicy | None:
+    """Compiled retry policy of a merchant (cached)."""
+    policy = config_cache.get(merchant_id)
+    if policy is not MISSING:
+        return policy
+
+    generation = config_cache.generation(merchant_id)
+    config = await _load_config(session, merchant_id)
+    return _cache_policy(session, merchant_id, config, generation)
+
+
+async def get_policies_by_merchant_ids(
+    session: SessionDep,
+    merchant_ids: Iterable[UUID],
+) -> dict[UUID, RetryPolicy]:
+    """
+    Compiled retry policies of many merchants (cached).
+
+    Cache misses are loaded in one query; merchants without a config are
+    left out of the result.
+    """
+    policies: dict[UUID, RetryPolicy] = {}
+    missing: set[UUID] = set()
+    for merchant_id in set(merchant_ids):
+        policy = config_cache.get(merchant_id)
+        if policy is MISSING:
+            missing.add(merchant_id)
+        elif policy is not None:
+            policies[merchant_id] = policy
+
+    if not missing:
+        return policies
+
+    generations = {
+        merchant_id: config_cache.generation(merchant_id) for merchant_id in missing
+    }
     result = await session.exec(
         select(MerchantRetryConfig).where(
-            MerchantRetryConfig.merchant_id == merchant_id
+            MerchantRetryConfig.merchant_id.in_(missing)  # type: ignore
         )
     )
-    config = result.one_or_none()
+    loaded = {config.merchant_id: config for config in result.all()}
+    for merchant_id in missing:
+        policy = _cache_policy(
+            session, merchant_id, loaded.get(merchant_id), generations[merchant_id]
+        )
+        if policy is not None:
+            policies[merchant_id] = policy
+    return policies
 
-    return config
+
+async def get_config_by_merchant_id(
+    session: SessionDep,
+    merchant_id: UUID,
+) -> MerchantRetryConfig | None:
+    """Retrieve retry configuration for a specific merchant (read-only, cached)."""
+    policy = await get_policy_by_merchant_id(session, merchant_id)
+    return policy.config if policy else None
 
 
 async def update_retry_config_by_merchant_id(
@@ -27,8 +113,16 @@ async def update_retry_config_by_merchant_id(
     session: SessionDep,
     config_update: RetryConfigUpdate,
 ) -> MerchantRetryConfig:
-    """Update retry configuration in the database."""
-    config = await get_config_by_merchant_id(session, merchant_id)
+    """
+    Update retry configuration in the database.
+
+    Drops this process's cache entry and publishes a NOTIFY so every
+    other process drops theirs once the update commits. Dropping the entry
+    also bumps its generation, so a load of the old row still in flight
+    does not cache it again.
+    """
+    # Always load from the database: cached instances are detached
+    config = await _load_config(session, merchant_id)
 
     if not config:
         raise HTTPException(
@@ -40,6 +134,11 @@ async def update_retry_config_by_merchant_id(
         setattr(config, field, value)
 
     session.add(config)
+    # Other processes drop their entry when this commits (see config_listener)
+    await session.execute(
+        select(func.pg_notify(settings.RETRY_CONFIG_NOTIFY_CHANNEL, str(merchant_id)))
+    )
     await session.commit()
+    config_cache.invalidate(merchant_id)
     await session.refresh(config)
     return config
@@ -0,0 +1,516 @@
+"""
+Set-based execution of retry attempts.
+
+Runs many attempts in one transaction: payments (locked) and merchant
+retry policies are loaded with one IN query each (policies only on cache
+miss), payment and job transitions are applied with a handful of grouped
+UPDATEs, and audit logs are bulk inserted.
+
+Every processor call goes through the per-card retry budget, the
+processor's circuit breaker and the processor's call rate; attempts
+turned away by any of them are deferred, not failed. A batch makes its
+processor calls one after another without awaiting, so it never has
+more than one call in flight and takes no concurrency slot.
+"""
+
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from uuid import UUID
+
+from sqlalchemy import case, update
+
+from app.core.config import settings
+from app.core.database import SessionDep
+from app.models.audit_log import RetryAuditLog
+from app.models.payment import FailureType, Payment, PaymentStatus
+from app.models.retry_job import RetryJob, RetryJobStatus
+from app.services.audit_logs import audit_writer, bulk_insert_audit_logs
+from app.services.card_limiter import CardRetryLimiter
+from app.services.circuit_breaker import ProcessorBreakers
+from app.services.payment_stats import PaymentStatsDelta, apply_payment_stats_delta
+from app.services.payments import get_payments_by_ids
+from app.services.rate_limiter import ProcessorLimit, ProcessorLimiter
+from app.services.retry_config import get_policies_by_merchant_ids
+from app.services.retry_jobs import (
+    defer_pending_jobs_for_processor,
+    lock_claimed_jobs,
+)
+from app.services.retry_planner import RetryPlanner
+from app.services.retry_logic import (
+    PROCESSOR_FAULT_TYPES,
+    RETRYABLE_PAYMENT_STATUSES,
+    build_result_message,
+    retry_priority,
+    simulate_processor_retry,
+)
+from app.services.retry_policy import DEFAULT_RETRY_POLICY
+
+logger = logging.getLogger(__name__)
+
+# Deferral for jobs turned away by a half-open breaker, which has no ETA
+BREAKER_RETRY_DELAY_SECONDS = 1.0
+
+processor_limiter = ProcessorLimiter(
+    limits={
+        processor: ProcessorLimit(
+            rate_per_second=rate,
+            max_concurrency=settings.PROCESSOR_MAX_CONCURRENCY.get(
+                processor, settings.PROCESSOR_DEFAULT_MAX_CONCURRENCY
+            ),
+            burst_seconds=settings.PROCESSOR_BURST_SECONDS,
+        )
+        for processor, rate in settings.PROCESSOR_RATE_LIMITS.items()
+    },
+    default=ProcessorLimit(
+        rate_per_second=settings.PROCESSOR_DEFAULT_RATE_LIMIT,
+        max_concurrency=settings.PROCESSOR_DEFAULT_MAX_CONCURRENCY,
+        burst_seconds=settings.PROCESSOR_BURST_SECONDS,
+    ),
+)
+
+card_limiter = CardRetryLimiter(
+    limit=settings.CARD_RETRY_LIMIT,
+    window_seconds=settings.CARD_RETRY_WINDOW_HOURS * 3600,
+    max_cards=settings.CARD_LIMITER_MAX_CARDS,
+)
+
+processor_breakers = ProcessorBreakers(
+    failure_ratio=settings.BREAKER_FAILURE_RATIO,
+    window_size=settings.BREAKER_WINDOW_SIZE,
+    min_calls=settings.BREAKER_MIN_CALLS,
+    open_seconds=settings.BREAKER_OPEN_SECONDS,
+    half_open_probes=settings.BREAKER_HALF_OPEN_PROBES,
+)
+
+retry_planner = RetryPlanner(
+    jitter_ratio=settings.RETRY_JITTER_RATIO,
+    max_jitter_seconds=settings.RETRY_MAX_JITTER_SECONDS,
+    capacity_per_minute=settings.RETRY_CAPACITY_PER_MINUTE,
+    max_shift_minutes=settings.RETRY_CAPACITY_MAX_SHIFT_MINUTES,
+)
+
+
+@dataclass(slots=True)
+class RetryAttempt:
+    """One retry attempt to execute, optionally backed by a retry_jobs row."""
+
+    payment_id: UUID
+    merchant_id: UUID
+    attempt_number: int
+    failure_type: FailureType
+    job_id: UUID | None = None
+
+    @classmethod
+    def from_job(cls, job: RetryJob) -> "RetryAttempt":
+        return cls(
+            payment_id=job.payment_id,
+            merchant_id=job.merchant_id,
+            attempt_number=job.attempt_number,
+            failure_type=job.failure_type,
+            job_id=job.id,
+        )
+
+
+@dataclass(slots=True)
+class RetryOutcome:
+    """Result of one executed (or skipped) retry attempt."""
+
+    attempt: RetryAttempt
+    success: bool
+    result_code: str
+    result_message: str
+    success_probability: float = 0.0
+    random_value: float = 0.0
+    should_continue: bool = False
+    next_attempt: int | None = None
+    new_status: PaymentStatus | None = None
+    event_type: str | None = None
+    next_job: RetryJob | None = None
+    next_priority: float = 0.0
+
+
+async def execute_retry_batch(
+    session: SessionDep,
+    attempts: list[RetryAttempt],
+    schedule_next: bool = False,
+    claim_horizon_seconds: float = 0,
+) -> list[RetryOutcome]:
+    """
+    Execute retry attempts and apply their outcomes in one transaction.
+
+    Attempts backed by a job run only while that job is still PROCESSING
+    (it is locked for the batch); the others are skipped untouched with
+    result "job_not_claimed", since their lease expired and the job may
+    belong to another scheduler by now.
+    Payments are locked for the transaction. Attempts whose payment is
+    missing or no longer retryable, and any attempt after the first for
+    the same payment ("duplicate_attempt"), are skipped (and their job
+    cancelled). Attempts whose card used up its retry
+    budget ("card_limited"), whose processor's breaker is open
+    ("circuit_open") or whose processor is over its limits
+    ("rate_limited") are deferred: their job is moved back to PENDING at
+    the time the attempt can be admitted and an audit event with the
+    same name is written. When a breaker opens, every pending job of its
+    processor is pushed back until the breaker half-opens.
+
+    With `schedule_next`, a follow-up RetryJob is created for every attempt
+    that should continue; follow-ups due within `claim_horizon_seconds`
+    are created already claimed.
+    Outcomes are returned in the same order as `attempts`.
+    """
+    now = datetime.now()
+    now_ts = now.timestamp()
+
+    claimed_jobs = await lock_claimed_jobs(
+        session, [a.job_id for a in attempts if a.job_id]
+    )
+    # Locked until commit, so a concurrent /update-status or webhook cannot
+    # change a status between the checks below and the UPDATEs
+    payments = await get_payments_by_ids(
+        session, [a.payment_id for a in attempts], for_update=True
+    )
+    policies = await get_policies_by_merchant_ids(
+        session, [payment.merchant_id for payment in payments.values()]
+    )
+
+    outcomes: list[RetryOutcome] = []
+    audit_logs: list[RetryAuditLog] = []
+    recovered_ids: list[UUID] = []
+    retry_counts: dict[PaymentStatus, dict[UUID, int]] = {
+        PaymentStatus.RETRYING: {},
+        PaymentStatus.EXHAUSTED: {},
+    }
+    job_results: dict[RetryJobStatus, dict[UUID, tuple[str, str]]] = {
+        RetryJobStatus.COMPLETED: {},
+        RetryJobStatus.FAILED: {},
+        RetryJobStatus.CANCELLED: {},
+    }
+    next_jobs: list[RetryJob] = []
+    rescheduled: dict[UUID, tuple[datetime, str]] = {}
+    # Attempts deferred so far per processor, to spread them over time
+    deferred: dict[str, int] = {}
+    # Processors whose breaker opened in this batch -> when it reopens
+    opened: dict[str, datetime] = {}
+    stats_delta = PaymentStatsDelta()
+    executed: set[UUID] = set()
+
+    for attempt in attempts:
+        if attempt.job_id and attempt.job_id not in claimed_jobs:
+            outcomes.append(
+                RetryOutcome(
+                    attempt,
+                    False,
+                    "job_not_claimed",
+                    "Job is no longer claimed by this scheduler",
+                )
+            )
+            continue
+
+        if attempt.payment_id in executed:
+            # One attempt per payment and batch: the first one schedules the
+            # follow-up, so a second job for the payment is a duplicate
+            result_code = "duplicate_attempt"
+            result_message = "Payment already has an attempt in this batch"
+            if attempt.job_id:
+                job_results[RetryJobStatus.CANCELLED][attempt.job_id] = (
+                    result_code,
+                    result_message,
+                )
+            outcomes.append(RetryOutcome(attempt, False, result_code, result_message))
+            continue
+        executed.add(attempt.payment_id)
+
+        payment = payments.get(attempt.payment_id)
+        if not payment or payment.status not in RETRYABLE_PAYMENT_STATUSES:
+            result_code = "payment_not_found" if not payment else "not_retryable"
+            result_message = "Payment is no longer eligible for retry"
+            if attempt.job_id:
+                job_results[RetryJobStatus.CANCELLED][attempt.job_id] = (
+                    result_code,
+                    result_message,
+                )
+            outcomes.append(RetryOutcome(attempt, False, result_code, result_message))
+            continue
+
+        policy = policies.get(payment.merchant_id, DEFAULT_RETRY_POLICY)
+        max_attempts = policy.max_attempts
+
+        # Admission: per-card budget, processor breaker, processor call rate
+        processor = payment.processor
+        card = payment.card_fingerprint
+        breaker = processor_breakers.get(processor)
+        limited = None
+        card_wait = card_limiter.retry_after(card, now_ts) if card else 0.0
+        if card_wait:
+            limited = (
+                "card_limited",
+                f"Card reached {card_limiter.limit} retries in the current window",
+                card_wait,
+            )
+        elif not breaker.allow(time.monotonic()):
+            limited = (
+                "circuit_open",
+                f"Processor {processor} circuit is open",
+                breaker.retry_after(time.monotonic()) or BREAKER_RETRY_DELAY_SECONDS,
+            )
+        elif not processor_limiter.try_take_token(processor):
+            breaker.release()
+            queued = deferred.get(processor, 0)
+            deferred[processor] = queued + 1
+            limited = (
+                "rate_limited",
+                f"Processor {processor} is at its rate limit",
+                processor_limiter.retry_after(processor, queued),
+            )
+
+        if limited:
+            result_code, reason, retry_after = limited
+            if result_code == "rate_limited":
+                # Already spread by the processor's token rate
+                retry_at = now + timedelta(seconds=retry_after)
+            else:
+                retry_at = retry_planner.plan(now, retry_after)
+            if attempt.job_id:
+                rescheduled[attempt.job_id] = (retry_at, result_code)
+            audit_logs.append(
+                RetryAuditLog(
+                    event_type=result_code,
+                    payment_id=payment.id,
+                    merchant_id=payment.merchant_id,
+                    attempt_number=attempt.attempt_number,
+                    failure_type=attempt.failure_type,
+                    metadata_json={
+                        "processor": processor,
+                        "retry_after_seconds": round(retry_after, 3),
+                        "rescheduled_at": retry_at.isoformat(),
+                    },
+                )
+            )
+            outcomes.append(
+                RetryOutcome(
+                    attempt=attempt,
+                    success=False,
+                    result_code=result_code,
+                    result_message=f"{reason}, retry after {retry_after:.1f}s",
+                    should_continue=True,
+                    next_attempt=attempt.attempt_number,
+                    event_type=result_code,
+                )
+            )
+            continue
+
+        if card:
+            card_limiter.record(card, now_ts)
+        success, success_probability, random_value = simulate_processor_retry(
+            attempt.failure_type
+        )
+
+        processor_ok = success or attempt.failure_type not in PROCESSOR_FAULT_TYPES
+        if breaker.record(processor_ok, time.monotonic()):
+            opened[processor] = now + timedelta(seconds=breaker.open_seconds)
+            logger.warning("Circuit breaker opened for processor %s", processor)
+        should_continue = not success and attempt.attempt_number < max_attempts
+        result_code, result_message = build_result_message(
+            attempt.failure_type, attempt.attempt_number, success, should_continue
+        )
+
+        if success:
+            new_status = PaymentStatus.RECOVERED
+            event_type = "retry_success"
+            recovered_ids.append(payment.id)
+        else:
+            new_status = (
+                PaymentStatus.RETRYING if should_continue else PaymentStatus.EXHAUSTED
+            )
+            event_type = "retry_failed" if should_continue else "exhausted"
+            retry_counts[new_status][payment.id] = attempt.attempt_number
+        stats_delta.move(
+            payment.merchant_id, payment.amount_cents, payment.status, new_status
+        )
+
+        if attempt.job_id:
+            job_status = RetryJobStatus.COMPLETED if success else RetryJobStatus.FAILED
+            job_results[job_status][attempt.job_id] = (result_code, result_message)
+
+        audit_logs.append(
+            RetryAuditLog(
+                event_type="retry_executed",
+                payment_id=payment.id,
+                merchant_id=payment.merchant_id,
+                attempt_number=attempt.attempt_number,
+                failure_type=attempt.failure_type,
+                result="success" if success else "failure",
+                metadata_json={
+                    "success_probability": success_probability,
+                    "random_value": random_value,
+                    "should_continue": should_continue,
+                },
+            )
+        )
+        audit_logs.append(
+            RetryAuditLog(
+                event_type=event_type,
+                payment_id=payment.id,
+                merchant_id=payment.merchant_id,
+                attempt_number=attempt.attempt_number,
+                failure_type=payment.failure_type,
+                result="success" if success else "failure",
+                card_last4=payment.card_last4,
+                amount_cents=payment.amount_cents,
+                currency=payment.currency,
+                metadata_json={
+                    "result_code": result_code,
+                    "result_message": result_message,
+                },
+            )
+        )
+
+        next_job = None
+        if schedule_next and should_continue:
+            delay_minutes = policy.delay_minutes(attempt.failure_type)
+            scheduled_at = retry_planner.plan(now, delay_minutes * 60)
+            claimed = scheduled_at <= now + timedelta(seconds=claim_horizon_seconds)
+            next_job = RetryJob(
+                payment_id=payment.id,
+                merchant_id=payment.merchant_id,
+                attempt_number=attempt.attempt_number + 1,
+                failure_type=attempt.failure_type,
+                scheduled_at=scheduled_at,
+                status=RetryJobStatus.PROCESSING if claimed else RetryJobStatus.PENDING,
+            )
+            next_jobs.append(next_job)
+            audit_logs.append(
+                RetryAuditLog(
+                    event_type="retry_scheduled",
+                    payment_id=payment.id,
+                    merchant_id=payment.merchant_id,
+                    attempt_number=next_job.attempt_number,
+                    failure_type=attempt.failure_type,
+                    metadata_json={
+                        "scheduled_at": scheduled_at.isoformat(),
+                        "delay_minutes": delay_minutes,
+                    },
+                )
+            )
+
+        outcomes.append(
+            RetryOutcome(
+                attempt=attempt,
+                success=success,
+                result_code=result_code,
+                result_message=result_message,
+                success_probability=success_probability,
+                random_value=random_value,
+                should_continue=should_continue,
+                next_attempt=attempt.attempt_number + 1 if should_continue else None,
+                new_status=new_status,
+                event_type=event_type,
+                next_job=next_job,
+                next_priority=retry_priority(
+                    payment.amount_cents,
+                    attempt.failure_type,
+                    attempt.attempt_number + 1,
+                    settings.RETRY_PRIORITY_ATTEMPT_DECAY,
+                )
+                if next_job
+                else 0.0,
+            )
+        )
+
+    # Payment transitions: at most one UPDATE per target status. The rows
+    # are locked; the status guard keeps the UPDATEs safe on their own.
+    retryable = Payment.status.in_(RETRYABLE_PAYMENT_STATUSES)  # type: ignore
+    if recovered_ids:
+        await session.execute(
+            update(Payment)
+            .where(Payment.id.in_(recovered_ids), retryable)  # type: ignore
+            .values(
+                status=PaymentStatus.RECOVERED,
+                recovered_via_retry=True,
+                updated_at=now,
+            ),
+            execution_options={"synchronize_session": False},
+        )
+    for new_status, counts in retry_counts.items():
+        if counts:
+            await session.execute(
+                update(Payment)
+                .where(Payment.id.in_(counts), retryable)  # type: ignore
+                .values(
+                    status=new_status,
+                    retry_count=case(counts, value=Payment.id),
+                    last_retry_at=now,
+                    updated_at=now,
+                ),
+                execution_options={"synchronize_session": False},
+            )
+
+    await apply_payment_stats_delta(session, stats_delta)
+
+    # Job transitions: one UPDATE per final job status
+    for job_status, results in job_results.items():
+        if results:
+            await session.execute(
+                update(RetryJob)
+                .where(RetryJob.id.in_(results))  # type: ignore
+                .values(
+                    status=job_status,
+                    executed_at=now,
+                    result_code=case(
+                        {job_id: code for job_id, (code, _) in results.items()},
+                        value=RetryJob.id,
+                    ),
+                    result_message=case(
+                        {job_id: message for job_id, (_, message) in results.items()},
+                        value=RetryJob.id,
+                    ),
+                    updated_at=now,
+                ),
+                execution_options={"synchronize_session": False},
+            )
+
+    # Deferred jobs go back to the queue at their new time
+    if rescheduled:
+        await session.execute(
+            update(RetryJob)
+            .where(RetryJob.id.in_(rescheduled))  # type: ignore
+            .values(
+                status=RetryJobStatus.PENDING,
+                scheduled_at=case(
+                    {job_id: at for job_id, (at, _) in rescheduled.items()},
+                    value=RetryJob.id,
+                ),
+                result_code=case(
+                    {job_id: code for job_id, (_, code) in rescheduled.items()},
+                    value=RetryJob.id,
+                ),
+                updated_at=now,
+            ),
+            execution_options={"synchronize_session": False},
+        )
+
+    session.add_all(next_jobs)
+    # Non-critical events go to the audit writer once this batch commits
+    buffered_logs = [
+        log for log in audit_logs if not audit_writer.is_sync(log.event_type)
+    ]
+    await bulk_insert_audit_logs(
+        session, [log for log in audit_logs if audit_writer.is_sync(log.event_type)]
+    )
+
+    # Open breakers push their processor's whole queue back in one UPDATE
+    for processor, until in opened.items():
+        await defer_pending_jobs_for_processor(
+            session,
+            processor,
+            until,
+            spread_seconds=processor_breakers.get(processor).open_seconds,
+        )
+
+    await session.commit()
+    for log in buffered_logs:
+        audit_writer.enqueue(log)
+
+    return outcomes
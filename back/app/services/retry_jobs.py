@@ -1,19 +1,80 @@
+from datetime import datetime, timedelta
 from uuid import UUID
 
+from sqlalchemy import Row, func, literal, update
 from sqlmodel import select
 
 from app.core.database import SessionDep
-from app.models.retry_job import RetryJob
+from app.models.payment import Payment
+from app.models.retry_job import RetryJob, RetryJobStatus
 
 
-async def get_retry_job_by_payment_id(session: SessionDep, payment_id: UUID):
-    """Retrieve a RetryJob by payment ID and attempt number."""
+# Columns of the retry history, in model order
+RETRY_JOB_COLUMNS = tuple(RetryJob.model_fields)
 
+
+async def get_retry_job_by_payment_id(
+    session: SessionDep, payment_id: UUID
+) -> list[Row]:
+    """Retry jobs of a payment by attempt, as plain tuples of RETRY_JOB_COLUMNS."""
+    retry_jobs = RetryJob.__table__
     jobs_result = await session.exec(
-        select(RetryJob)
-        .where(RetryJob.payment_id == payment_id)
-        .order_by(RetryJob.attempt_number)  # type: ignore
+        select(*(retry_jobs.c[name] for name in RETRY_JOB_COLUMNS))
+        .where(retry_jobs.c.payment_id == payment_id)
+        .order_by(retry_jobs.c.attempt_number)
+    )
+    return list(jobs_result.all())
+
+
+async def lock_claimed_jobs(session: SessionDep, job_ids: list[UUID]) -> set[UUID]:
+    """
+    Lock the given jobs that are still PROCESSING and return their ids.
+
+    A job missing from the result had its lease expire and went back to
+    PENDING (possibly claimed by another replica), so its claimer must not
+    execute it. The caller owns the transaction.
+    """
+    if not job_ids:
+        return set()
+    result = await session.exec(
+        select(RetryJob.id)
+        .where(RetryJob.id.in_(job_ids))  # type: ignore
+        .where(RetryJob.status == RetryJobStatus.PROCESSING)
+        .with_for_update()
     )
-    jobs = jobs_result.all()
+    return set(result.all())
 
-    return jobs
+
+async def defer_pending_jobs_for_processor(
+    session: SessionDep,
+    processor: str,
+    until: datetime,
+    spread_seconds: float = 0,
+) -> int:
+    """
+    Push every pending job of `processor` due before `until` back past `until`.
+
+    Jobs are spread at random over `spread_seconds` after `until` so the
+    queue does not all come due at once. One UPDATE for the whole queue;
+    the caller commits.
+
+    payments.processor has no index, so jobs are found from the pending
+    side (idx_retry_jobs_scheduled) and joined to their payment by primary
+    key (UPDATE ... FROM payments); the cost follows the due queue, not
+    the processor's whole payment history.
+    """
+    result = await session.execute(
+        update(RetryJob)
+        .where(RetryJob.status == RetryJobStatus.PENDING)
+        .where(RetryJob.scheduled_at < until)  # type: ignore
+        .where(RetryJob.payment_id == Payment.id)
+        .where(Payment.processor == processor)
+        .values(
+            scheduled_at=literal(until)
+            + func.random() * timedelta(seconds=spread_seconds),
+            result_code="circuit_open",
+            updated_at=datetime.now(),
+        ),
+        execution_options={"synchronize_session": False},
+    )
+    return result.rowcount  # type: ignore
@@ -0,0 +1,92 @@
+"""
+Retry decision logic shared by the n8n-facing endpoints and the native scheduler.
+"""
+
+import random
+
+from app.models.payment import FailureType, PaymentStatus
+
+# ============================================
+# Success rates by failure type (from PRD)
+# ============================================
+
+SUCCESS_RATES = {
+    FailureType.INSUFFICIENT_FUNDS: 0.20,  # 20% success
+    FailureType.CARD_DECLINED: 0.15,  # 15% success
+    FailureType.NETWORK_TIMEOUT: 0.60,  # 60% success
+    FailureType.PROCESSOR_DOWNTIME: 0.80,  # 80% success
+    FailureType.UNKNOWN: 0.10,  # 10% success
+    FailureType.FRAUD: 0.0,  # Never succeeds (non-retriable)
+    FailureType.EXPIRED: 0.0,  # Never succeeds (non-retriable)
+}
+
+# Non-retriable failure types
+NON_RETRIABLE_TYPES = {FailureType.FRAUD, FailureType.EXPIRED}
+
+# Failures caused by the processor itself rather than the card; these feed
+# the per-processor circuit breakers
+PROCESSOR_FAULT_TYPES = {FailureType.PROCESSOR_DOWNTIME, FailureType.NETWORK_TIMEOUT}
+
+# Payment statuses that still accept retry attempts
+RETRYABLE_PAYMENT_STATUSES = {PaymentStatus.FAILED, PaymentStatus.RETRYING}
+
+# Audit event written for each status a retry attempt can leave a payment in
+TRANSITION_EVENT_TYPES = {
+    PaymentStatus.RECOVERED: "retry_success",
+    PaymentStatus.EXHAUSTED: "exhausted",
+    PaymentStatus.RETRYING: "retry_failed",
+}
+
+
+def parse_failure_type(value: str) -> FailureType:
+    """Parse a failure type, falling back to UNKNOWN for unrecognized values."""
+    try:
+        return FailureType(value)
+    except ValueError:
+        return FailureType.UNKNOWN
+
+
+def simulate_processor_retry(failure_type: FailureType) -> tuple[bool, float, float]:
+    """
+    Simulate calling the payment processor to retry a payment.
+
+    Returns (success, success_probability, random_value).
+    In production, this would call Stripe/PSE/Nequi APIs.
+    """
+    success_probability = SUCCESS_RATES.get(failure_type, 0.10)
+    random_value = random.random()
+    return random_value < success_probability, success_probability, random_value
+
+
+def retry_priority(
+    amount_cents: int,
+    failure_type: FailureType,
+    attempt_number: int,
+    attempt_decay: float,
+) -> float:
+    """
+    Expected recovered amount of a retry, used to order due work.
+
+    Later attempts are discounted by `attempt_decay` per previous attempt.
+    """
+    success_rate = SUCCESS_RATES.get(failure_type, 0.10)
+    return amount_cents * success_rate * attempt_decay ** (attempt_number - 1)
+
+
+def build_result_message(
+    failure_type: FailureType,
+    attempt_number: int,
+    success: bool,
+    should_continue: bool,
+) -> tuple[str, str]:
+    """Build the (result_code, result_message) pair for a retry attempt."""
+    if success:
+        return (
+            "succeeded",
+            f"Payment recovered successfully on attempt {attempt_number}",
+        )
+
+    result_message = f"Retry attempt {attempt_number} failed: {failure_type.value}"
+    if not should_continue:
+        result_message += " (all attempts exhausted)"
+    return failure_type.value, result_message
@@ -0,0 +1,82 @@
+"""
+Retry time planning: bounded jitter plus a per-minute capacity target.
+
+Without it, a burst of failures with the same delay comes due in the same
+second. The planner spreads each retry over a window proportional to its
+delay and then moves it to the first minute that still has capacity.
+"""
+
+import random
+from datetime import datetime, timedelta
+
+
+class RetryPlanner:
+    """
+    Assigns scheduled_at for retries.
+
+    Jitter is added after the configured delay (never before it), capped
+    at `max_jitter_seconds`. Minutes that already hold
+    `capacity_per_minute` retries push new ones to the next free minute,
+    up to `max_shift_minutes` later; past that the retry keeps its
+    jittered time. Capacity is tracked in memory, per process.
+    """
+
+    def __init__(
+        self,
+        jitter_ratio: float,
+        max_jitter_seconds: float,
+        capacity_per_minute: int,
+        max_shift_minutes: int,
+        rng: random.Random | None = None,
+    ):
+        if jitter_ratio < 0 or max_jitter_seconds < 0 or capacity_per_minute < 0:
+            raise ValueError("Jitter and capacity settings must not be negative")
+        self.jitter_ratio = jitter_ratio
+        self.max_jitter_seconds = max_jitter_seconds
+        self.capacity_per_minute = capacity_per_minute
+        self.max_shift_minutes = max_shift_minutes
+        self._rng = rng or random.Random()
+        # epoch minute -> retries planned in it
+        self._planned: dict[int, int] = {}
+        self._pruned_minute = 0
+
+    def jitter_seconds(self, delay_seconds: float) -> float:
+        """Random extra delay, bounded by the delay's jitter window."""
+        window = min(delay_seconds * self.jitter_ratio, self.max_jitter_seconds)
+        return self._rng.uniform(0, window) if window > 0 else 0.0
+
+    def plan(self, now: datetime, delay_seconds: float) -> datetime:
+        """Pick the retry time for a retry due `delay_seconds` after `now`."""
+        desired = now + timedelta(
+            seconds=delay_seconds + self.jitter_seconds(delay_seconds)
+        )
+        return self.reserve(desired, now)
+
+    def reserve(self, desired: datetime, now: datetime) -> datetime:
+        """Book a slot at or after `desired` in a minute with spare capacity."""
+        if not self.capacity_per_minute:
+            return desired
+
+        self._prune(now)
+        desired_ts = desired.timestamp()
+        first_minute = int(desired_ts // 60)
+        for minute in range(first_minute, first_minute + self.max_shift_minutes + 1):
+            if self._planned.get(minute, 0) < self.capacity_per_minute:
+                self._planned[minute] = self._planned.get(minute, 0) + 1
+                if minute == first_minute:
+                    return desired
+                # Spread shifted retries over their new minute too
+                return datetime.fromtimestamp(minute * 60 + self._rng.uniform(0, 60))
+
+        # Every minute in reach is full: keep the desired time
+        self._planned[first_minute] += 1
+        return desired
+
+    def planned_in_minute(self, at: datetime) -> int:
+        return self._planned.get(int(at.timestamp() // 60), 0)
+
+    def _prune(self, now: datetime) -> None:
+        current = int(now.timestamp() // 60)
+        if current > self._pruned_minute:
+            self._planned = {m: n for m, n in self._planned.items() if m >= current}
+            self._pruned_minute = current
@@ -0,0 +1,127 @@
+"""
+Compiled per-merchant retry policies.
+
+MerchantRetryConfig stores an enabled/delay column pair per failure type.
+A RetryPolicy flattens it once into a tuple indexed by failure type, so
+retry decisions are a single index lookup instead of attribute access on
+the ORM row.
+"""
+
+from typing import NamedTuple
+from uuid import UUID
+
+from app.models.payment import FailureType
+from app.models.retry_config import MerchantRetryConfig
+
+# Fallbacks used when a merchant has no retry configuration, and the delay
+# of failure types without their own columns
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_DELAY_MINUTES = 60
+
+# Failure type -> position in RetryPolicy.rules
+FAILURE_TYPE_INDEX: dict[FailureType, int] = {
+    failure_type: index for index, failure_type in enumerate(FailureType)
+}
+
+
+class RetryRule(NamedTuple):
+    """Retry decision for one failure type."""
+
+    enabled: bool
+    delay_minutes: int
+    max_attempts: int
+
+
+class RetryPolicy:
+    """
+    Immutable retry policy of one merchant.
+
+    `rules[FAILURE_TYPE_INDEX[failure_type]]` holds the decision for a
+    failure type; `enabled` already includes the merchant-wide switch.
+    `config` keeps the row the policy was built from, for read-only use.
+    """
+
+    __slots__ = ("merchant_id", "retry_enabled", "max_attempts", "rules", "config")
+
+    def __init__(
+        self,
+        merchant_id: UUID | None,
+        retry_enabled: bool,
+        max_attempts: int,
+        rules: tuple[RetryRule, ...],
+        config: MerchantRetryConfig | None = None,
+    ):
+        if len(rules) != len(FAILURE_TYPE_INDEX):
+            raise ValueError("A retry policy needs one rule per failure type")
+        object.__setattr__(self, "merchant_id", merchant_id)
+        object.__setattr__(self, "retry_enabled", retry_enabled)
+        object.__setattr__(self, "max_attempts", max_attempts)
+        object.__setattr__(self, "rules", rules)
+        object.__setattr__(self, "config", config)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("RetryPolicy is immutable")
+
+    @classmethod
+    def from_config(cls, config: MerchantRetryConfig) -> "RetryPolicy":
+        """Compile a merchant's retry configuration."""
+        columns = {
+            FailureType.INSUFFICIENT_FUNDS: (
+                config.insufficient_funds_enabled,
+                config.insufficient_funds_delay,
+            ),
+            FailureType.CARD_DECLINED: (
+                config.card_declined_enabled,
+                config.card_declined_delay,
+            ),
+            FailureType.NETWORK_TIMEOUT: (
+                config.network_timeout_enabled,
+                config.network_timeout_delay,
+            ),
+            FailureType.PROCESSOR_DOWNTIME: (
+                config.processor_downtime_enabled,
+                config.processor_downtime_delay,
+            ),
+        }
+        rules = tuple(
+            RetryRule(
+                enabled=config.retry_enabled and enabled,
+                delay_minutes=delay,
+                max_attempts=config.max_attempts,
+            )
+            for enabled, delay in (
+                columns.get(failure_type, (False, DEFAULT_DELAY_MINUTES))
+                for failure_type in FAILURE_TYPE_INDEX
+            )
+        )
+        return cls(
+            config.merchant_id,
+            config.retry_enabled,
+            config.max_attempts,
+            rules,
+            config,
+        )
+
+    def rule(self, failure_type: FailureType) -> RetryRule:
+        return self.rules[FAILURE_TYPE_INDEX[failure_type]]
+
+    def allows(self, failure_type: FailureType) -> bool:
+        """Whether failures of this type are retried."""
+        return self.rules[FAILURE_TYPE_INDEX[failure_type]].enabled
+
+    def delay_minutes(self, failure_type: FailureType) -> int:
+        """Delay before the next attempt for a failure type, in minutes."""
+        return self.rules[FAILURE_TYPE_INDEX[failure_type]].delay_minutes
+
+
+# Used where a merchant has no configuration: nothing is retried on its
+# behalf, but attempts already scheduled run with the fallback limits
+DEFAULT_RETRY_POLICY = RetryPolicy(
+    merchant_id=None,
+    retry_enabled=False,
+    max_attempts=DEFAULT_MAX_ATTEMPTS,
+    rules=tuple(
+        RetryRule(False, DEFAULT_DELAY_MINUTES, DEFAULT_MAX_ATTEMPTS)
+        for _ in FAILURE_TYPE_INDEX
+    ),
+)
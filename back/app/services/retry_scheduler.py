@@ -0,0 +1,450 @@
+"""
+Native retry scheduler.
+
+Claims due retry_jobs in batches with FOR UPDATE SKIP LOCKED so several
+backend replicas can drain the queue in parallel without double-processing.
+Jobs due within a short horizon are held in an in-memory timing wheel and
+fired on time; anything further out stays in Postgres until it gets closer.
+When there is more due work than capacity, jobs with the highest expected
+recovered amount run first, with a per-merchant fairness cap.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from datetime import datetime, timedelta
+from uuid import UUID
+
+from sqlalchemy import Text, case, cast, func, update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.core.database import SessionDep, engine
+from app.models.payment import Payment
+from app.models.retry_job import RetryJob, RetryJobStatus
+from app.services.retry_execution import RetryAttempt, execute_retry_batch
+from app.services.retry_logic import SUCCESS_RATES
+from app.services.timing_wheel import TimingWheel
+
+logger = logging.getLogger(__name__)
+
+
+def merchant_shard(merchant_id_column, shard_count: int):
+    """SQL expression mapping a merchant_id column to a shard in [0, shard_count)."""
+    merchant_hash = func.hashtext(cast(merchant_id_column, Text)).op("&")(0x7FFFFFFF)
+    return merchant_hash % shard_count
+
+
+def retry_priority_expression(amount_cents, failure_type, attempt_number, decay):
+    """SQL version of retry_priority() over the given columns."""
+    success_rate = case(
+        {ft: rate for ft, rate in SUCCESS_RATES.items()},
+        value=failure_type,
+        else_=0.10,
+    )
+    return amount_cents * success_rate * func.power(decay, attempt_number - 1)
+
+
+def build_claim_statement(
+    batch_size: int,
+    horizon_seconds: float = 0,
+    shard_index: int = 0,
+    shard_count: int = 1,
+    merchant_cap: int | None = None,
+    lookahead: int = 1,
+    attempt_decay: float = 1.0,
+):
+    """
+    The UPDATE ... RETURNING (job, priority) behind claim_due_jobs, as of
+    now; see there for the arguments.
+    """
+    now = datetime.now()
+    candidates = (
+        select(
+            RetryJob.id,
+            RetryJob.payment_id,
+            RetryJob.merchant_id,
+            RetryJob.failure_type,
+            RetryJob.attempt_number,
+        )
+        .where(RetryJob.status == RetryJobStatus.PENDING)
+        .where(RetryJob.scheduled_at <= now + timedelta(seconds=horizon_seconds))
+        .order_by(RetryJob.scheduled_at)  # type: ignore
+        .limit(batch_size * lookahead)
+    )
+    if shard_count > 1:
+        candidates = candidates.where(
+            merchant_shard(RetryJob.merchant_id, shard_count) == shard_index
+        )
+    candidates = candidates.cte("candidates")
+
+    priority = retry_priority_expression(
+        Payment.amount_cents,
+        candidates.c.failure_type,
+        candidates.c.attempt_number,
+        attempt_decay,
+    )
+    ranked = (
+        select(
+            candidates.c.id,
+            priority.label("priority"),
+            func.row_number()
+            .over(partition_by=candidates.c.merchant_id, order_by=priority.desc())
+            .label("merchant_rank"),
+        )
+        .join(Payment, Payment.id == candidates.c.payment_id)  # type: ignore
+        .cte("ranked")
+    )
+
+    fairness_tier = (ranked.c.merchant_rank - 1) // (merchant_cap or batch_size)
+    chosen = (
+        select(RetryJob.id, ranked.c.priority)
+        .join(ranked, ranked.c.id == RetryJob.id)
+        # Re-checked on the locked row version, in case another replica won
+        .where(RetryJob.status == RetryJobStatus.PENDING)
+        .order_by(fairness_tier, ranked.c.priority.desc())
+        .limit(batch_size)
+        .with_for_update(of=RetryJob, skip_locked=True)  # type: ignore
+        .cte("chosen")
+    )
+    return (
+        update(RetryJob)
+        .where(RetryJob.id == chosen.c.id)
+        .values(status=RetryJobStatus.PROCESSING, updated_at=now)
+        .returning(RetryJob, chosen.c.priority)
+    )
+
+
+async def claim_due_jobs(
+    session: SessionDep,
+    batch_size: int,
+    horizon_seconds: float = 0,
+    shard_index: int = 0,
+    shard_count: int = 1,
+    merchant_cap: int | None = None,
+    lookahead: int = 1,
+    attempt_decay: float = 1.0,
+) -> list[tuple[RetryJob, float]]:
+    """
+    Atomically move up to `batch_size` jobs due within `horizon_seconds`
+    from PENDING to PROCESSING, highest priority first.
+
+    The `batch_size * lookahead` earliest due jobs are ranked by expected
+    recovered amount (see retry_priority). With `merchant_cap`, each
+    merchant's jobs are split into tiers of `merchant_cap` and lower tiers
+    go first, so one merchant cannot fill the batch while others wait.
+
+    Rows locked by another replica are skipped instead of waited on, so
+    concurrent schedulers always claim disjoint batches. With more than
+    one shard, only jobs whose merchant hashes to `shard_index` are claimed.
+    Returns (job, priority) pairs.
+    """
+    result = await session.execute(
+        build_claim_statement(
+            batch_size,
+            horizon_seconds,
+            shard_index,
+            shard_count,
+            merchant_cap=merchant_cap,
+            lookahead=lookahead,
+            attempt_decay=attempt_decay,
+        )
+    )
+    claimed = [(job, float(priority)) for job, priority in result.all()]
+    await session.commit()
+    return claimed
+
+
+async def release_stale_jobs(session: SessionDep, lease_seconds: int) -> int:
+    """Return jobs stuck in PROCESSING (e.g. after a crash) to PENDING."""
+    now = datetime.now()
+    result = await session.execute(
+        update(RetryJob)
+        .where(RetryJob.status == RetryJobStatus.PROCESSING)
+        .where(RetryJob.updated_at < now - timedelta(seconds=lease_seconds))  # type: ignore
+        .values(status=RetryJobStatus.PENDING, updated_at=now)
+    )
+    await session.commit()
+    return result.rowcount  # type: ignore
+
+
+async def release_jobs(session: SessionDep, job_ids: list[UUID]) -> int:
+    """Hand claimed jobs back to PENDING so any replica can pick them up."""
+    if not job_ids:
+        return 0
+    result = await session.execute(
+        update(RetryJob)
+        .where(RetryJob.id.in_(job_ids))  # type: ignore
+        .where(RetryJob.status == RetryJobStatus.PROCESSING)
+        .values(status=RetryJobStatus.PENDING, updated_at=datetime.now())
+    )
+    await session.commit()
+    return result.rowcount  # type: ignore
+
+
+class RetryScheduler:
+    """
+    Background scheduler that drains due retry_jobs from Postgres.
+
+    A loader loop claims jobs due within `horizon_seconds` into a timing
+    wheel; a ticker loop moves them to a priority queue when they come
+    due, and `concurrency` executor loops run that queue in batches,
+    highest expected recovered amount first. The horizon must stay below
+    `lease_seconds` or other replicas would release jobs that are still
+    waiting in memory, and at most `max_held` claimed jobs wait here at
+    once. Execution re-checks that each job is still PROCESSING, so a job
+    whose lease expired anyway runs on one replica only.
+    """
+
+    def __init__(
+        self,
+        batch_size: int,
+        poll_interval: float,
+        concurrency: int,
+        lease_seconds: int,
+        horizon_seconds: float,
+        tick_seconds: float,
+        wheel_slots: int,
+        wheel_levels: int,
+        shard_index: int = 0,
+        shard_count: int = 1,
+        merchant_cap: int | None = None,
+        claim_lookahead: int = 1,
+        attempt_decay: float = 1.0,
+        max_held: int | None = None,
+    ):
+        if horizon_seconds >= lease_seconds:
+            raise ValueError("Scheduler horizon must be shorter than the job lease")
+
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.horizon_seconds = horizon_seconds
+        self.tick_seconds = tick_seconds
+        self.shard_index = shard_index
+        self.shard_count = shard_count
+        self.merchant_cap = merchant_cap or batch_size
+        self.claim_lookahead = claim_lookahead
+        self.attempt_decay = attempt_decay
+        # Claimed jobs waiting in memory; past this the loader stops claiming
+        # so nothing sits here long enough for its lease to expire
+        self.max_held = max_held or 2 * batch_size * concurrency
+        self.wheel = TimingWheel(tick_seconds, wheel_slots, wheel_levels, time.time())
+        if self.wheel.horizon_seconds <= horizon_seconds:
+            raise ValueError("Timing wheel is too small for the scheduler horizon")
+
+        # Due jobs as a max-heap on priority: (-priority, sequence, job)
+        self._ready: list[tuple[float, int, RetryJob]] = []
+        self._sequence = itertools.count()
+        self._ready_event = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+        self._stopping = asyncio.Event()
+
+    @property
+    def held(self) -> int:
+        """Claimed jobs in the wheel or waiting for an executor."""
+        return len(self.wheel) + len(self._ready)
+
+    def claim_size(self) -> int:
+        """Jobs the next claim may take without exceeding `max_held`."""
+        return max(0, min(self.batch_size, self.max_held - self.held))
+
+    @property
+    def running(self) -> bool:
+        return any(not task.done() for task in self._tasks)
+
+    async def start(self) -> None:
+        """
+        Start the loader, ticker and executor loops.
+
+        Nothing is rebuilt here: the wheel starts empty and the loader's
+        first claim fills it with the pending jobs due within the horizon.
+        """
+        if self.running:
+            return
+        self._stopping.clear()
+        self._tasks = [
+            asyncio.create_task(self._load_loop(), name="retry-scheduler-loader"),
+            asyncio.create_task(self._tick_loop(), name="retry-scheduler-ticker"),
+        ] + [
+            asyncio.create_task(self._work_loop(), name=f"retry-scheduler-worker-{i}")
+            for i in range(self.concurrency)
+        ]
+
+    async def stop(self) -> None:
+        """Stop the loops, finish running batches and release held jobs."""
+        if not self._tasks:
+            return
+        self._stopping.set()
+        self._ready_event.set()
+        await asyncio.gather(*self._tasks)
+        self._tasks = []
+
+        # Jobs still waiting in memory go back to Postgres for other replicas
+        held = [job for _, job in self.wheel.drain()]
+        held.extend(job for _, _, job in self._ready)
+        self._ready.clear()
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            await release_jobs(session, [job.id for job in held])
+
+    def schedule(self, job: RetryJob, priority: float) -> None:
+        """Hold a claimed job in the wheel until its scheduled time."""
+        if not self.wheel.add(job.id, job.scheduled_at.timestamp(), (priority, job)):
+            # Beyond the wheel's reach (should not happen for claimed jobs)
+            self._enqueue([(priority, job)])
+
+    async def load_due_jobs(self) -> int:
+        """Claim one batch of jobs due within the horizon into the wheel."""
+        batch_size = self.claim_size()
+        if not batch_size:
+            return 0
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            claimed = await claim_due_jobs(
+                session,
+                batch_size,
+                self.horizon_seconds,
+                self.shard_index,
+                self.shard_count,
+                merchant_cap=self.merchant_cap,
+                lookahead=self.claim_lookahead,
+                attempt_decay=self.attempt_decay,
+            )
+
+        for job, priority in claimed:
+            self.schedule(job, priority)
+        return len(claimed)
+
+    def _enqueue(self, items: list[tuple[float, RetryJob]]) -> None:
+        """Make due jobs available to the executor loops."""
+        for priority, job in items:
+            heapq.heappush(self._ready, (-priority, next(self._sequence), job))
+        self._ready_event.set()
+
+    def _next_batch(self) -> list[RetryJob]:
+        """
+        Pop up to `batch_size` due jobs, highest priority first.
+
+        A merchant gets at most `merchant_cap` jobs per batch while other
+        merchants' jobs are waiting; leftover room is then filled with its
+        remaining jobs so no capacity is wasted.
+        """
+        batch: list[RetryJob] = []
+        overflow: list[tuple[float, int, RetryJob]] = []
+        per_merchant: dict[UUID, int] = {}
+        scan_limit = self.batch_size * self.claim_lookahead
+
+        while self._ready and len(batch) < self.batch_size and scan_limit:
+            scan_limit -= 1
+            item = heapq.heappop(self._ready)
+            merchant_id = item[2].merchant_id
+            if per_merchant.get(merchant_id, 0) >= self.merchant_cap:
+                overflow.append(item)
+                continue
+            per_merchant[merchant_id] = per_merchant.get(merchant_id, 0) + 1
+            batch.append(item[2])
+
+        # Overflow was popped in priority order
+        room = self.batch_size - len(batch)
+        batch.extend(job for _, _, job in overflow[:room])
+        for item in overflow[room:]:
+            heapq.heappush(self._ready, item)
+        return batch
+
+    async def _execute(self, jobs: list[RetryJob]) -> None:
+        try:
+            async with AsyncSession(engine, expire_on_commit=False) as session:
+                outcomes = await execute_retry_batch(
+                    session,
+                    [RetryAttempt.from_job(job) for job in jobs],
+                    schedule_next=True,
+                    claim_horizon_seconds=self.horizon_seconds,
+                )
+        except Exception:
+            # The jobs stay PROCESSING and are released once their lease expires
+            logger.exception("Retry batch of %d jobs failed", len(jobs))
+            return
+
+        lost = sum(outcome.result_code == "job_not_claimed" for outcome in outcomes)
+        if lost:
+            logger.warning("Skipped %d retry jobs whose lease had expired", lost)
+
+        for outcome in outcomes:
+            next_job = outcome.next_job
+            if next_job and next_job.status == RetryJobStatus.PROCESSING:
+                self.schedule(next_job, outcome.next_priority)
+
+    async def _release_stale(self) -> None:
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            released = await release_stale_jobs(session, self.lease_seconds)
+        if released:
+            logger.warning("Released %d stale retry jobs", released)
+
+    async def _sleep(self, seconds: float) -> None:
+        try:
+            await asyncio.wait_for(self._stopping.wait(), timeout=seconds)
+        except TimeoutError:
+            pass
+
+    async def _load_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        next_release = 0.0
+
+        while not self._stopping.is_set():
+            try:
+                if loop.time() >= next_release:
+                    await self._release_stale()
+                    next_release = loop.time() + self.lease_seconds
+
+                claimed = await self.load_due_jobs()
+            except Exception:
+                logger.exception("Retry scheduler load failed")
+                claimed = 0
+
+            # A full batch means there is likely more due work: load again now,
+            # unless the executors are behind
+            if claimed < self.batch_size or not self.claim_size():
+                await self._sleep(self.poll_interval)
+
+    async def _tick_loop(self) -> None:
+        while not self._stopping.is_set():
+            expired = self.wheel.advance(time.time())
+            if expired:
+                self._enqueue(expired)
+            await self._sleep(self.tick_seconds)
+
+    async def _work_loop(self) -> None:
+        while not self._stopping.is_set():
+            batch = self._next_batch()
+            if batch:
+                await self._execute(batch)
+                continue
+            self._ready_event.clear()
+            await self._ready_event.wait()
+
+
+def create_retry_scheduler(shard_index: int = 0, shard_count: int = 1):
+    """Build a scheduler from settings, optionally restricted to one shard."""
+    return RetryScheduler(
+        batch_size=settings.RETRY_SCHEDULER_BATCH_SIZE,
+        poll_interval=settings.RETRY_SCHEDULER_POLL_INTERVAL_SECONDS,
+        concurrency=settings.RETRY_SCHEDULER_CONCURRENCY,
+        lease_seconds=settings.RETRY_SCHEDULER_LEASE_SECONDS,
+        horizon_seconds=settings.RETRY_SCHEDULER_HORIZON_SECONDS,
+        tick_seconds=settings.RETRY_WHEEL_TICK_MS / 1000,
+        wheel_slots=settings.RETRY_WHEEL_SLOTS,
+        wheel_levels=settings.RETRY_WHEEL_LEVELS,
+        shard_index=shard_index,
+        shard_count=shard_count,
+        merchant_cap=max(
+            1,
+            int(
+                settings.RETRY_SCHEDULER_BATCH_SIZE * settings.RETRY_MERCHANT_MAX_SHARE
+            ),
+        ),
+        claim_lookahead=settings.RETRY_CLAIM_LOOKAHEAD,
+        attempt_decay=settings.RETRY_PRIORITY_ATTEMPT_DECAY,
+    )
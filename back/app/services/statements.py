@@ -0,0 +1,225 @@
+"""
+Prebuilt statements for the hot retry-path queries.
+
+Building a statement with select()/update() and deriving its cache key
+costs more CPU than the compiled-cache lookup it leads to, and the hot
+queries paid that on every request (the payment transition, which could
+not be cached at all, was compiled from scratch each time). These are
+built once at import with bind parameters for everything that varies,
+so each execution reuses the memoized cache key and the compiled SQL,
+and the identical SQL text hits asyncpg's per-connection prepared
+statement cache (DB_STATEMENT_CACHE_SIZE).
+
+Statements are immutable and safe to share between requests; pass the
+values as execution parameters. `python -m app.services.statements_benchmark`
+compares them against rebuilding per request.
+"""
+
+from sqlalchemy import (
+    JSON,
+    DateTime,
+    Integer,
+    String,
+    Uuid,
+    bindparam,
+    case,
+    func,
+    insert,
+    literal,
+    text,
+    update,
+)
+from sqlmodel import select
+
+from app.models.audit_log import RetryAuditLog
+from app.models.payment import Payment, PaymentStatus
+from app.models.retry_config import MerchantRetryConfig
+from app.models.retry_job import RetryJob
+from app.services.retry_logic import (
+    RETRYABLE_PAYMENT_STATUSES,
+    TRANSITION_EVENT_TYPES,
+)
+from app.services.retry_policy import DEFAULT_MAX_ATTEMPTS
+
+
+def build_payment_by_id():
+    """Payment by id. Params: payment_id."""
+    return select(Payment).where(Payment.id == bindparam("payment_id"))
+
+
+def build_config_by_merchant():
+    """Retry config of a merchant. Params: merchant_id."""
+    return select(MerchantRetryConfig).where(
+        MerchantRetryConfig.merchant_id == bindparam("merchant_id")
+    )
+
+
+def build_close_retry_job():
+    """
+    Close the job of one attempt. Params: job_payment_id,
+    job_attempt_number, status, executed_at, result_code, result_message.
+    """
+    return (
+        update(RetryJob)
+        .where(
+            # Column names are reserved for the SET clause
+            RetryJob.payment_id == bindparam("job_payment_id"),  # type: ignore
+            RetryJob.attempt_number == bindparam("job_attempt_number"),  # type: ignore
+        )
+        .values(
+            status=bindparam("status"),
+            executed_at=bindparam("executed_at"),
+            result_code=bindparam("result_code"),
+            result_message=bindparam("result_message"),
+        )
+    )
+
+
+def build_insert_audit_logs():
+    """Multi-row audit log insert. Params: one dict per row."""
+    return insert(RetryAuditLog)
+
+
+def build_transition_payment(success: bool):
+    """
+    Single-statement transition of a payment after a retry attempt; see
+    transition_payment_after_attempt. Params: payment_id, now,
+    attempt_number, audit_id, metadata_json and, for failures,
+    retry_count (None increments the stored count).
+    """
+    payments = Payment.__table__
+    now = bindparam("now", type_=DateTime)
+
+    if success:
+        values = {
+            "status": PaymentStatus.RECOVERED,
+            "recovered_via_retry": True,
+            "updated_at": now,
+        }
+    else:
+        new_count = func.coalesce(
+            bindparam("retry_count", type_=Integer), payments.c.retry_count + 1
+        )
+        max_attempts = func.coalesce(
+            select(MerchantRetryConfig.max_attempts)
+            .where(MerchantRetryConfig.merchant_id == payments.c.merchant_id)
+            .scalar_subquery(),
+            DEFAULT_MAX_ATTEMPTS,
+        )
+        values = {
+            "retry_count": new_count,
+            "last_retry_at": now,
+            # Typed literals: Postgres won't cast untyped CASE results to the enum
+            "status": case(
+                (
+                    new_count >= max_attempts,
+                    literal(PaymentStatus.EXHAUSTED, payments.c.status.type),
+                ),
+                else_=literal(PaymentStatus.RETRYING, payments.c.status.type),
+            ),
+            "updated_at": now,
+        }
+
+    previous = (
+        select(payments.c.id, payments.c.status)
+        .where(
+            payments.c.id == bindparam("payment_id", type_=Uuid),
+            payments.c.status.in_(RETRYABLE_PAYMENT_STATUSES),
+        )
+        .with_for_update()
+        .cte("previous")
+    )
+    updated = (
+        update(payments)
+        .where(payments.c.id == previous.c.id)
+        .values(values)
+        .returning(*payments.c, previous.c.status.label("previous_status"))
+        .cte("updated")
+    )
+
+    event_type = case(
+        *(
+            (updated.c.status == payment_status, event)
+            for payment_status, event in TRANSITION_EVENT_TYPES.items()
+        )
+    )
+    audit_logs = RetryAuditLog.__table__
+    audit = (
+        insert(audit_logs)
+        .from_select(
+            [
+                audit_logs.c.id,
+                audit_logs.c.event_type,
+                audit_logs.c.payment_id,
+                audit_logs.c.merchant_id,
+                audit_logs.c.attempt_number,
+                audit_logs.c.failure_type,
+                audit_logs.c.result,
+                audit_logs.c.card_last4,
+                audit_logs.c.amount_cents,
+                audit_logs.c.currency,
+                audit_logs.c.metadata_json,
+                audit_logs.c.created_at,
+            ],
+            select(
+                bindparam("audit_id", type_=Uuid),
+                event_type,
+                updated.c.id,
+                updated.c.merchant_id,
+                bindparam("attempt_number", type_=Integer),
+                updated.c.failure_type,
+                literal("success" if success else "failure", String),
+                updated.c.card_last4,
+                updated.c.amount_cents,
+                updated.c.currency,
+                bindparam("metadata_json", type_=JSON),
+                now,
+            ),
+        )
+        .cte("audit")
+    )
+
+    # The rollup upsert of upsert_stats_deltas, written as text: SQLAlchemy
+    # 2.0 never caches statements holding an ON CONFLICT clause, and this
+    # one would otherwise be recompiled on every call
+    stats = (
+        text(
+            """
+            INSERT INTO merchant_payment_stats
+                (merchant_id, status, payment_count, amount_cents)
+            SELECT merchant_id, status, 1, amount_cents
+            FROM updated WHERE status != previous_status
+            UNION ALL
+            SELECT merchant_id, previous_status, -1, -amount_cents
+            FROM updated WHERE status != previous_status
+            ON CONFLICT (merchant_id, status) DO UPDATE SET
+                payment_count = merchant_payment_stats.payment_count
+                    + excluded.payment_count,
+                amount_cents = merchant_payment_stats.amount_cents
+                    + excluded.amount_cents,
+                updated_at = now()
+            """
+        )
+        .columns()
+        .cte("stats")
+    )
+
+    return (
+        select(Payment)
+        .from_statement(
+            select(*(updated.c[column.name] for column in payments.c)).add_cte(
+                audit, stats
+            )
+        )
+        .execution_options(populate_existing=True)
+    )
+
+
+PAYMENT_BY_ID = build_payment_by_id()
+CONFIG_BY_MERCHANT = build_config_by_merchant()
+CLOSE_RETRY_JOB = build_close_retry_job()
+INSERT_AUDIT_LOGS = build_insert_audit_logs()
+TRANSITION_PAYMENT = {
+    True: build_transition_payment(success=True),
+    False: build_transition_payment(success=False),
+}
@@ -0,0 +1,136 @@
+"""
+Hierarchical timing wheel for near-term retry jobs.
+
+Insert and cancel are O(1); expiring a tick is O(1) plus the items it
+returns. Items further out than the wheel's horizon are rejected so the
+caller can leave them in Postgres until they get closer.
+"""
+
+from typing import Any, Hashable
+
+
+class TimingWheel:
+    """
+    Multi-level timing wheel (Varghese & Lauck, scheme 7).
+
+    Level 0 has `slots` buckets of one tick each; every level above covers
+    `slots` times the span of the level below. When a lower level wraps
+    around, the matching bucket of the level above is cascaded down.
+    """
+
+    def __init__(self, tick_seconds: float, slots: int, levels: int, now: float):
+        if tick_seconds <= 0 or slots < 2 or levels < 1:
+            raise ValueError("tick_seconds > 0, slots >= 2 and levels >= 1 required")
+
+        self.tick_seconds = tick_seconds
+        self.slots = slots
+        self.levels = levels
+        self._current_tick = self._to_tick(now)
+        self._wheels: list[list[dict[Hashable, tuple[int, Any]]]] = [
+            [{} for _ in range(slots)] for _ in range(levels)
+        ]
+        # key -> bucket holding it, for O(1) cancellation
+        self._index: dict[Hashable, dict[Hashable, tuple[int, Any]]] = {}
+        # Items that were already due when inserted
+        self._due: dict[Hashable, tuple[int, Any]] = {}
+
+    @property
+    def horizon_seconds(self) -> float:
+        """How far ahead of the current tick the wheel can hold items."""
+        return self.tick_seconds * self.slots**self.levels
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._index
+
+    def add(self, key: Hashable, expires_at: float, item: Any) -> bool:
+        """
+        Schedule `item` to expire at `expires_at` (epoch seconds).
+
+        Returns False when the expiry is beyond the horizon. Re-adding an
+        existing key reschedules it.
+        """
+        expire_tick = self._to_tick(expires_at)
+        if expire_tick - self._current_tick >= self.slots**self.levels:
+            return False
+
+        self.remove(key)
+        self._place(key, expire_tick, item)
+        return True
+
+    def remove(self, key: Hashable) -> bool:
+        """Cancel a scheduled item. Returns False if it was not in the wheel."""
+        bucket = self._index.pop(key, None)
+        if bucket is None:
+            return False
+        del bucket[key]
+        return True
+
+    def advance(self, now: float) -> list[Any]:
+        """Move the wheel forward to `now` and return every expired item."""
+        expired = [item for _, item in self._due.values()]
+        for key in self._due:
+            del self._index[key]
+        self._due.clear()
+
+        target_tick = self._to_tick(now)
+        if not self._index:
+            # Nothing to cascade: jump straight to the target tick
+            self._current_tick = max(self._current_tick, target_tick)
+            return expired
+
+        while self._current_tick < target_tick:
+            self._current_tick += 1
+            tick = self._current_tick
+
+            # Cascade higher levels first so their items can land in level 0
+            for level in range(self.levels - 1, 0, -1):
+                span = self.slots**level
+                if tick % span == 0:
+                    bucket = self._wheels[level][(tick // span) % self.slots]
+                    cascaded = list(bucket.items())
+                    bucket.clear()
+                    for key, (expire_tick, item) in cascaded:
+                        if expire_tick <= tick:
+                            del self._index[key]
+                            expired.append(item)
+                        else:
+                            self._place(key, expire_tick, item)
+
+            bucket = self._wheels[0][tick % self.slots]
+            for key, (_, item) in bucket.items():
+                del self._index[key]
+                expired.append(item)
+            bucket.clear()
+
+        return expired
+
+    def drain(self) -> list[Any]:
+        """Remove and return every item regardless of its expiry."""
+        items = [item for _, item in self._due.values()]
+        for wheel in self._wheels:
+            for bucket in wheel:
+                items.extend(item for _, item in bucket.values())
+                bucket.clear()
+        self._due.clear()
+        self._index.clear()
+        return items
+
+    def _to_tick(self, timestamp: float) -> int:
+        return int(timestamp // self.tick_seconds)
+
+    def _place(self, key: Hashable, expire_tick: int, item: Any) -> None:
+        delta = expire_tick - self._current_tick
+        if delta <= 0:
+            bucket = self._due
+        else:
+            level = 0
+            while delta >= self.slots ** (level + 1):
+                level += 1
+            slot = (expire_tick // self.slots**level) % self.slots
+            bucket = self._wheels[level][slot]
+
+        bucket[key] = (expire_tick, item)
+        self._index[key] = bucket
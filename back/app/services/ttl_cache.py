@@ -0,0 +1,99 @@
+"""
+Small in-process TTL + LRU cache.
+
+Entries expire `ttl_seconds` after being stored; past `max_entries`, the
+least recently used entry is evicted. A value loaded while its key was
+invalidated is not stored (see generation()). Not thread-safe: meant for
+one asyncio event loop.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+# Returned by get() on a miss, since None is a valid cached value
+MISSING: Any = object()
+
+
+class TTLCache:
+    """Bounded cache with per-entry expiry and hit/miss counters."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        if max_entries < 1 or ttl_seconds <= 0:
+            raise ValueError("max_entries must be >= 1 and ttl_seconds > 0")
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Bumped by invalidate() (per key) and clear() (all keys)
+        self._generations: dict[Hashable, int] = {}
+        self._epoch = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, now: float | None = None) -> Any:
+        """Return the cached value, or MISSING if absent or expired."""
+        now = time.monotonic() if now is None else now
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= now:
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return MISSING
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def generation(self, key: Hashable) -> tuple[int, int]:
+        """
+        Take before loading a value for `key`, and pass it to set().
+
+        If `key` is invalidated (or the cache cleared) while the value is
+        loaded, set() drops the value instead of caching a stale one.
+        """
+        return self._epoch, self._generations.get(key, 0)
+
+    def set(
+        self,
+        key: Hashable,
+        value: Any,
+        now: float | None = None,
+        generation: tuple[int, int] | None = None,
+    ) -> None:
+        if generation is not None and generation != self.generation(key):
+            return
+        now = time.monotonic() if now is None else now
+        self._entries[key] = (now + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> bool:
+        """Drop one entry. Returns False if it was not cached."""
+        self._generations[key] = self._generations.get(key, 0) + 1
+        if len(self._generations) > self.max_entries:
+            # Bound the counters: a new epoch outdates every generation taken
+            self._generations.clear()
+            self._epoch += 1
+        return self._entries.pop(key, None) is not None
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._generations.clear()
+        self._epoch += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,176 @@
+"""
+Retry worker entry point.
+
+Runs the retry pipeline outside the API process, in a pool of worker
+processes sharded by a hash of merchant_id:
+
+    python -m app.worker --processes 4
+
+Every process claims only its own merchants' jobs, so each keeps a warm
+config cache and its own connection pool. Workers only start with
+RETRY_NATIVE_SCHEDULING=true; set it in the API as well, so it stops
+handing new failures to n8n, and leave RETRY_SCHEDULER_ENABLED=false
+there so the API doesn't run a scheduler of its own.
+
+The parent supervises the shards: one that exits is restarted after
+RESTART_DELAY_SECONDS, so its merchants are never left unserved. A shard
+that keeps crashing (MAX_RESTARTS within RESTART_WINDOW_SECONDS) stops
+the whole pool and the parent exits non-zero, leaving the restart to the
+container runtime.
+"""
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import signal
+import sys
+import time
+from collections import deque
+from multiprocessing.connection import wait
+
+logger = logging.getLogger("app.worker")
+
+RESTART_DELAY_SECONDS = 5.0
+MAX_RESTARTS = 5
+RESTART_WINDOW_SECONDS = 300.0
+
+
+async def serve_shard(shard_index: int, shard_count: int) -> None:
+    """Run one scheduler shard until SIGINT/SIGTERM."""
+    # Imported here so every spawned process builds its own engine and caches
+    from app.services.audit_logs import audit_writer
+    from app.services.card_windows import card_window_sync
+    from app.services.config_listener import config_listener
+    from app.services.retry_scheduler import create_retry_scheduler
+
+    scheduler = create_retry_scheduler(shard_index, shard_count)
+    stop = asyncio.Event()
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await audit_writer.start()
+    await card_window_sync.start()
+    await config_listener.start()
+    await scheduler.start()
+    logger.info("Retry worker shard %d/%d started", shard_index + 1, shard_count)
+    await stop.wait()
+    await scheduler.stop()
+    await config_listener.stop()
+    await card_window_sync.stop()
+    await audit_writer.stop()
+    logger.info("Retry worker shard %d/%d stopped", shard_index + 1, shard_count)
+
+
+def run_shard(shard_index: int, shard_count: int) -> None:
+    """Process target: configure logging and run one shard."""
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s %(processName)s %(message)s"
+    )
+    asyncio.run(serve_shard(shard_index, shard_count))
+
+
+def _start_shard(context, shard_index: int, shard_count: int):
+    process = context.Process(
+        target=run_shard,
+        args=(shard_index, shard_count),
+        name=f"retry-worker-{shard_index}",
+    )
+    process.start()
+    return process
+
+
+def supervise(shard_count: int) -> int:
+    """
+    Run `shard_count` shard processes until SIGINT/SIGTERM, restarting any
+    that exits. Returns the parent's exit code: 0 after a requested stop,
+    1 when a shard crash-loops.
+    """
+    context = multiprocessing.get_context("spawn")
+    workers = {
+        index: _start_shard(context, index, shard_count) for index in range(shard_count)
+    }
+    restarts = {index: deque() for index in workers}
+    stopping = False
+
+    def stop_all(*_args):
+        nonlocal stopping
+        stopping = True
+        for worker in workers.values():
+            if worker.is_alive():
+                worker.terminate()  # SIGTERM: shards stop gracefully
+
+    signal.signal(signal.SIGINT, stop_all)
+    signal.signal(signal.SIGTERM, stop_all)
+
+    exit_code = 0
+    while not stopping:
+        wait([worker.sentinel for worker in workers.values()])
+        for index, worker in workers.items():
+            if stopping or worker.is_alive():
+                continue
+            now = time.monotonic()
+            history = restarts[index]
+            while history and now - history[0] > RESTART_WINDOW_SECONDS:
+                history.popleft()
+            if len(history) >= MAX_RESTARTS:
+                logger.error(
+                    "%s exited with code %s %d times in %.0fs; stopping workers",
+                    worker.name,
+                    worker.exitcode,
+                    len(history) + 1,
+                    RESTART_WINDOW_SECONDS,
+                )
+                exit_code = 1
+                stop_all()
+                break
+            logger.warning(
+                "%s exited with code %s; restarting in %.0fs",
+                worker.name,
+                worker.exitcode,
+                RESTART_DELAY_SECONDS,
+            )
+            time.sleep(RESTART_DELAY_SECONDS)
+            if stopping:
+                break
+            history.append(now)
+            workers[index] = _start_shard(context, index, shard_count)
+
+    for worker in workers.values():
+        worker.join()
+    return exit_code
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run retry worker processes")
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=multiprocessing.cpu_count(),
+        help="Number of worker processes (default: CPU count)",
+    )
+    args = parser.parse_args()
+
+    if args.processes < 1:
+        parser.error("--processes must be at least 1")
+
+    from app.core.config import settings
+
+    if not settings.native_scheduling:
+        # The API would also hand every failure to n8n: each retry twice
+        parser.error("workers need RETRY_NATIVE_SCHEDULING=true")
+
+    if args.processes == 1:
+        run_shard(0, 1)
+        return
+
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s %(processName)s %(message)s"
+    )
+    sys.exit(supervise(args.processes))
+
+
+if __name__ == "__main__":
+    main()
@@ -130,9 +130,11 @@ CREATE TABLE IF NOT EXISTS retry_jobs (
 
 -- ============================================
 -- Retry Audit Log (for compliance)
+-- Partitioned by month on created_at. The backend creates upcoming months and
+-- archives months past retention (app/services/audit_partitions.py).
 -- ============================================
 CREATE TABLE IF NOT EXISTS retry_audit_logs (
-    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
     
     event_type VARCHAR(50) NOT NULL,
     
@@ -151,17 +153,73 @@ CREATE TABLE IF NOT EXISTS retry_audit_logs (
     -- Additional context (JSON)
     metadata JSONB,
     
-    created_at TIMESTAMP DEFAULT NOW()
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+-- Catches rows outside every monthly partition until one is created for them
+CREATE TABLE IF NOT EXISTS retry_audit_logs_default PARTITION OF retry_audit_logs DEFAULT;
+
+-- Current month and the next three
+DO $$
+DECLARE
+    month DATE;
+BEGIN
+    FOR i IN 0..3 LOOP
+        month := date_trunc('month', NOW())::date + make_interval(months => i);
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF retry_audit_logs FOR VALUES FROM (%L) TO (%L)',
+            'retry_audit_logs_p' || to_char(month, 'YYYY_MM'),
+            month,
+            (month + INTERVAL '1 month')::date
+        );
+    END LOOP;
+END $$;
+
+-- ============================================
+-- Card Retry Windows (per-card retry limit)
+-- ============================================
+CREATE TABLE IF NOT EXISTS card_retry_windows (
+    card_fingerprint VARCHAR(100) PRIMARY KEY,
+
+    -- Epoch seconds of the card's most recent retries
+    attempts JSONB NOT NULL DEFAULT '[]',
+
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+-- ============================================
+-- Merchant Payment Stats (rollup per merchant and status, updated in the
+-- same transaction as every payment insert and status change)
+-- ============================================
+CREATE TABLE IF NOT EXISTS merchant_payment_stats (
+    merchant_id UUID NOT NULL REFERENCES merchants(id) ON DELETE CASCADE,
+    status payment_status NOT NULL,
+
+    payment_count BIGINT NOT NULL DEFAULT 0,
+    amount_cents BIGINT NOT NULL DEFAULT 0,
+
+    updated_at TIMESTAMP DEFAULT NOW(),
+
+    PRIMARY KEY (merchant_id, status)
 );
 
 -- ============================================
 -- Indexes for Performance
 -- ============================================
-CREATE INDEX IF NOT EXISTS idx_payments_merchant ON payments(merchant_id);
-CREATE INDEX IF NOT EXISTS idx_payments_status ON payments(status);
+-- Keyset pagination of GET /payments: each filter combination walks one of these in
+-- (created_at DESC, id DESC) order. The (merchant_id, status) one also serves the stats
+-- rollup rebuild aggregate as an index-only scan.
+CREATE INDEX IF NOT EXISTS idx_payments_created ON payments(created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_payments_merchant_created ON payments(merchant_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_payments_merchant_status ON payments(merchant_id, status, created_at DESC, id DESC) INCLUDE (amount_cents);
+CREATE INDEX IF NOT EXISTS idx_payments_status ON payments(status, created_at DESC, id DESC);
 CREATE INDEX IF NOT EXISTS idx_retry_jobs_scheduled ON retry_jobs(scheduled_at) WHERE status = 'pending';
 CREATE INDEX IF NOT EXISTS idx_retry_jobs_payment ON retry_jobs(payment_id);
+-- Audit log indexes propagate to every partition, including ones created later
 CREATE INDEX IF NOT EXISTS idx_audit_logs_payment ON retry_audit_logs(payment_id);
 CREATE INDEX IF NOT EXISTS idx_audit_logs_merchant ON retry_audit_logs(merchant_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_card_retry_windows_updated ON card_retry_windows(updated_at);
 
 SELECT 'Schema created successfully!' as status;
@@ -18,4 +18,16 @@ INSERT INTO payments (merchant_id, amount_cents, currency, card_last4, card_bran
     ('466fd34b-96a1-4635-9b2c-dedd2645291f', 25000, 'USD', '5555', 'mastercard', 'failed', 'card_declined', 'card_declined', 'Your card was declined.', 'stripe'),
     ('466fd34b-96a1-4635-9b2c-dedd2645291f', 8000, 'USD', '3782', 'amex', 'failed', 'network_timeout', 'processing_error', 'Network timeout during processing.', 'stripe');
 
+-- Stats rollup for the seeded payments (normally kept by the app; recomputed
+-- here so re-running the seeds stays consistent)
+INSERT INTO merchant_payment_stats (merchant_id, status, payment_count, amount_cents)
+SELECT merchant_id, status, COUNT(*), COALESCE(SUM(amount_cents), 0)
+FROM payments
+WHERE merchant_id = '466fd34b-96a1-4635-9b2c-dedd2645291f'
+GROUP BY merchant_id, status
+ON CONFLICT (merchant_id, status) DO UPDATE SET
+    payment_count = EXCLUDED.payment_count,
+    amount_cents = EXCLUDED.amount_cents,
+    updated_at = NOW();
+
 SELECT 'Development seeds loaded!' as status;
@@ -0,0 +1,39 @@
+"""
+Unit tests for the audit partition maintenance loop.
+"""
+
+import asyncio
+
+import pytest
+
+from app.services import audit_partitions
+from app.services.audit_partitions import AuditPartitionMaintenance
+
+
+@pytest.fixture
+def runs(monkeypatch) -> list:
+    """`partitions_only` of every maintain_audit_partitions call."""
+    calls = []
+
+    async def maintain(now=None, partitions_only=False):
+        calls.append(partitions_only)
+        return {"created": [], "rehomed": [], "archived": []}
+
+    monkeypatch.setattr(audit_partitions, "maintain_audit_partitions", maintain)
+    return calls
+
+
+# ============== TESTS ==============
+
+
+@pytest.mark.asyncio
+async def test_start_only_ensures_partitions(runs):
+    """Startup waits for partitions only; the full run happens in the loop."""
+    maintenance = AuditPartitionMaintenance(interval=3600)
+
+    await maintenance.start()
+    assert runs == [True]
+
+    await asyncio.sleep(0)
+    await maintenance.stop()
+    assert runs == [True, False]
@@ -0,0 +1,90 @@
+"""
+Unit tests for archived audit log segments.
+"""
+
+import csv
+import gzip
+from datetime import datetime
+from uuid import uuid4
+
+from app.services.audit_segments import iter_segment_rows, list_segments, segment_path
+
+TABLE = "retry_audit_logs"
+COLUMNS = ["id", "event_type", "payment_id", "merchant_id", "created_at"]
+
+
+def make_segment(archive_dir, partition: str, rows: list[dict]):
+    with gzip.open(segment_path(archive_dir, partition), "wt", newline="") as f:
+        writer = csv.DictWriter(f, COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def make_row(created_at: str, event_type: str = "classified", **kwargs) -> dict:
+    row = {
+        "id": str(uuid4()),
+        "event_type": event_type,
+        "payment_id": "",
+        "merchant_id": "",
+    }
+    row.update(kwargs, created_at=created_at)
+    return row
+
+
+# ============== TESTS ==============
+
+
+def test_list_segments_by_range(tmp_path):
+    """Only segments overlapping the range are listed, oldest first."""
+    for partition in ["p2024_03", "p2024_01", "p2024_02"]:
+        make_segment(tmp_path, f"{TABLE}_{partition}", [])
+    (tmp_path / "notes.csv.gz").touch()
+
+    months = [month.month for month, _ in list_segments(tmp_path, TABLE)]
+    assert months == [1, 2, 3]
+
+    months = [
+        month.month
+        for month, _ in list_segments(
+            tmp_path,
+            TABLE,
+            created_from=datetime(2024, 2, 15),
+            created_to=datetime(2024, 3, 1),
+        )
+    ]
+    assert months == [2]
+
+
+def test_upper_bound_inside_a_month(tmp_path):
+    """A range ending mid-month still reads that month's segment."""
+    make_segment(tmp_path, f"{TABLE}_p2024_02", [])
+    segments = list_segments(tmp_path, TABLE, created_to=datetime(2024, 2, 1, 10))
+    assert len(segments) == 1
+
+
+def test_rows_are_filtered(tmp_path):
+    """Rows are filtered by ids, event type and exact timestamps."""
+    merchant_id, payment_id = uuid4(), uuid4()
+    make_segment(
+        tmp_path,
+        f"{TABLE}_p2024_01",
+        [
+            make_row("2024-01-05 10:00:00", merchant_id=str(merchant_id)),
+            make_row("2024-01-20 10:00:00.5", merchant_id=str(merchant_id)),
+            make_row("2024-01-21 10:00:00", "exhausted", payment_id=str(payment_id)),
+        ],
+    )
+
+    rows = list(iter_segment_rows(tmp_path, TABLE, merchant_id=merchant_id))
+    assert len(rows) == 2
+
+    rows = list(
+        iter_segment_rows(
+            tmp_path, TABLE, created_from=datetime(2024, 1, 10), merchant_id=merchant_id
+        )
+    )
+    assert [row["created_at"] for row in rows] == ["2024-01-20 10:00:00.5"]
+
+    rows = list(iter_segment_rows(tmp_path, TABLE, payment_id=payment_id))
+    assert [row["event_type"] for row in rows] == ["exhausted"]
+    assert list(iter_segment_rows(tmp_path, TABLE, event_type="retry_success")) == []
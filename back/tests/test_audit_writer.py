@@ -0,0 +1,121 @@
+"""
+Unit tests for the buffered audit log writer.
+"""
+
+import pytest
+
+from app.models.audit_log import RetryAuditLog
+from app.services.audit_writer import AuditLogWriter
+
+
+class FakeSession:
+    def __init__(self):
+        self.added = []
+
+    def add(self, obj):
+        self.added.append(obj)
+
+
+class FakeStore:
+    def __init__(self, failures: int = 0):
+        self.batches: list[list[RetryAuditLog]] = []
+        self.failures = failures
+
+    async def __call__(self, logs):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("database unavailable")
+        self.batches.append(list(logs))
+
+
+def make_writer(store: FakeStore, **kwargs) -> AuditLogWriter:
+    kwargs.setdefault("flush_rows", 3)
+    kwargs.setdefault("max_pending", 10)
+    return AuditLogWriter(store, {"payment_failed"}, **kwargs)
+
+
+def make_log(event_type: str = "classified", n: int = 0) -> RetryAuditLog:
+    return RetryAuditLog(event_type=event_type, attempt_number=n)
+
+
+# ============== TESTS ==============
+
+
+def test_sync_events_join_the_session():
+    """Compliance events go to the caller's session; others are queued."""
+    writer = make_writer(FakeStore())
+    session = FakeSession()
+    critical, routine = make_log("payment_failed"), make_log("classified")
+
+    assert writer.record(session, routine) is False
+    assert writer.record(session, critical, routine) is True
+    assert session.added == [critical]
+    assert len(writer) == 2
+
+
+def test_sync_mode_writes_everything_inline():
+    """With buffering off every event is synchronous."""
+    writer = make_writer(FakeStore(), buffered=False)
+    session = FakeSession()
+    assert writer.record(session, make_log("classified")) is True
+    assert len(session.added) == 1
+    assert len(writer) == 0
+
+
+@pytest.mark.asyncio
+async def test_flush_in_batches_and_order():
+    """Pending events are written oldest first in batches of flush_rows."""
+    store = FakeStore()
+    writer = make_writer(store)
+    for n in range(7):
+        writer.enqueue(make_log(n=n))
+
+    assert await writer.flush() == 7
+    assert [len(batch) for batch in store.batches] == [3, 3, 1]
+    assert [log.attempt_number for batch in store.batches for log in batch] == list(
+        range(7)
+    )
+    assert len(writer) == 0
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_keeps_events():
+    """A failed batch goes back to the front of the queue."""
+    store = FakeStore(failures=1)
+    writer = make_writer(store)
+    for n in range(4):
+        writer.enqueue(make_log(n=n))
+
+    with pytest.raises(ConnectionError):
+        await writer.flush()
+    assert len(writer) == 4
+    assert writer.failed_flushes == 1
+
+    await writer.flush()
+    assert [log.attempt_number for batch in store.batches for log in batch] == [
+        0,
+        1,
+        2,
+        3,
+    ]
+
+
+def test_overflow_drops_oldest():
+    """Past max_pending the oldest events are dropped and counted."""
+    writer = make_writer(FakeStore(), max_pending=3, flush_rows=100)
+    for n in range(5):
+        writer.enqueue(make_log(n=n))
+    assert len(writer) == 3
+    assert writer.dropped == 2
+
+
+@pytest.mark.asyncio
+async def test_stop_flushes_pending():
+    """Stopping the writer writes what is still queued."""
+    store = FakeStore()
+    writer = make_writer(store, flush_seconds=60)
+    await writer.start()
+    writer.enqueue(make_log())
+    await writer.stop()
+    assert sum(len(batch) for batch in store.batches) == 1
+    assert len(writer) == 0
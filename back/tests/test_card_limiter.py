@@ -0,0 +1,123 @@
+"""
+Unit tests for the per-card sliding-window retry limiter.
+"""
+
+import pytest
+
+from app.services.card_limiter import CardRetryLimiter
+
+DAY = 24 * 3600
+
+
+# ============== TESTS ==============
+
+
+def test_allows_limit_retries_per_window():
+    """A card can be retried `limit` times, then waits for the window."""
+    limiter = CardRetryLimiter(limit=5, window_seconds=DAY, max_cards=100)
+    for hour in range(5):
+        assert limiter.retry_after("card-1", hour * 3600) == 0
+        limiter.record("card-1", hour * 3600)
+
+    # The oldest retry (t=0) leaves the window after 24h
+    assert limiter.retry_after("card-1", 5 * 3600) == DAY - 5 * 3600
+
+
+def test_window_slides():
+    """Retries older than the window stop counting."""
+    limiter = CardRetryLimiter(limit=2, window_seconds=DAY, max_cards=100)
+    limiter.record("card-1", 0)
+    limiter.record("card-1", 100)
+
+    assert limiter.retry_after("card-1", DAY - 1) == 1
+    assert limiter.retry_after("card-1", DAY) == 0
+    limiter.record("card-1", DAY)
+    assert limiter.retry_after("card-1", DAY) == 100
+
+
+def test_cards_are_independent():
+    """Each card has its own budget."""
+    limiter = CardRetryLimiter(limit=1, window_seconds=DAY, max_cards=100)
+    limiter.record("card-1", 0)
+
+    assert limiter.retry_after("card-1", 1) > 0
+    assert limiter.retry_after("card-2", 1) == 0
+
+
+def test_lru_eviction_bounds_memory():
+    """The least recently retried card is evicted past max_cards."""
+    limiter = CardRetryLimiter(limit=1, window_seconds=DAY, max_cards=2)
+    limiter.record("card-1", 0)
+    limiter.record("card-2", 1)
+    limiter.record("card-1", DAY + 2)  # card-1 becomes most recent
+    limiter.record("card-3", DAY + 3)
+
+    assert len(limiter) == 2
+    assert limiter.evictions == 1
+    assert limiter.retry_after("card-2", DAY + 3) == 0
+    assert limiter.retry_after("card-1", DAY + 3) > 0
+
+
+def test_changes_are_drained_once():
+    """Only windows changed since the last drain are returned."""
+    limiter = CardRetryLimiter(limit=5, window_seconds=DAY, max_cards=100)
+    limiter.record("card-1", 10)
+    limiter.record("card-2", 20)
+
+    assert limiter.drain_changes() == {"card-1": [10], "card-2": [20]}
+    assert limiter.drain_changes() == {}
+
+
+def test_load_restores_recent_window():
+    """Loaded windows keep only retries still inside the window."""
+    limiter = CardRetryLimiter(limit=2, window_seconds=DAY, max_cards=100)
+    limiter.load("card-1", [5, 0, DAY + 10, DAY + 20], now=DAY + 30)
+
+    assert limiter.retry_after("card-1", DAY + 30) == DAY - 20
+    assert limiter.drain_changes() == {}
+
+
+def test_load_adds_other_processes_retries_once():
+    """The persisted window replaces ours; undrained retries are kept on top."""
+    limiter = CardRetryLimiter(limit=5, window_seconds=DAY, max_cards=100)
+    limiter.record("card-1", 10)
+    limiter.record("card-1", 20)
+    limiter.drain_changes()
+    limiter.record("card-1", 25)
+
+    # Persisted: this process's drained retries (10, 20) and another's (15)
+    limiter.load("card-1", [10, 15, 20], now=30)
+
+    assert limiter.retry_after("card-1", 30) == 0
+    limiter.record("card-1", 30)
+    assert limiter.retry_after("card-1", 30) == 10 + DAY - 30
+    assert limiter.drain_changes() == {"card-1": [25, 30]}
+
+
+def test_retries_in_the_same_second_all_count():
+    """Separate retries with the same timestamp are not merged into one."""
+    limiter = CardRetryLimiter(limit=3, window_seconds=DAY, max_cards=100)
+    limiter.record("card-1", 20)
+
+    # Another process retried the same card twice in that second
+    limiter.load("card-1", [20, 20], now=20)
+
+    assert limiter.retry_after("card-1", 20) == DAY
+    assert limiter.drain_changes() == {"card-1": [20]}
+
+
+def test_failed_flush_requeues_changes():
+    """Drained retries can be put back when writing them fails."""
+    limiter = CardRetryLimiter(limit=5, window_seconds=DAY, max_cards=100)
+    limiter.record("card-1", 10)
+    changes = limiter.drain_changes()
+    limiter.record("card-1", 20)
+
+    limiter.requeue_changes(changes)
+    assert limiter.drain_changes() == {"card-1": [10, 20]}
+
+
+def test_invalid_configuration():
+    """Degenerate limits are rejected."""
+    with pytest.raises(ValueError):
+        CardRetryLimiter(limit=0, window_seconds=DAY, max_cards=100)
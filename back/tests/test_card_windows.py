@@ -0,0 +1,87 @@
+"""
+Unit tests for persisting the per-card retry limiter.
+"""
+
+import pytest
+from sqlalchemy.dialects.postgresql.asyncpg import dialect as asyncpg_dialect
+
+from app.services import card_windows
+from app.services.card_limiter import CardRetryLimiter
+from app.services.card_windows import _upsert_windows, flush_card_windows
+
+DAY = 24 * 3600
+
+
+class FailingSession:
+    """Accepts `ok` upserts, then fails every later one."""
+
+    def __init__(self, ok: int):
+        self.ok = ok
+        self.statements = []
+        self.rolled_back = False
+
+    async def execute(self, statement):
+        if len(self.statements) >= self.ok:
+            raise ConnectionError("connection lost")
+        self.statements.append(statement)
+
+    async def commit(self):
+        pass
+
+    async def rollback(self):
+        self.rolled_back = True
+
+
+def make_limiter() -> CardRetryLimiter:
+    return CardRetryLimiter(limit=5, window_seconds=DAY, max_cards=100)
+
+
+# ============== TESTS ==============
+
+
+def test_upsert_appends_every_retry():
+    """New retries are bound as jsonb and appended without deduplication."""
+    compiled = _upsert_windows({"card-1": [20, 20]}, make_limiter()).compile(
+        dialect=asyncpg_dialect()
+    )
+    sql = " ".join(str(compiled).split())
+
+    assert "$2::JSONB" in sql
+    assert "card_retry_windows.attempts || excluded.attempts" in sql
+    assert "DISTINCT" not in sql
+    assert compiled.params["attempts_m0"] == [20, 20]
+
+
+@pytest.mark.asyncio
+async def test_flush_sends_each_retry_once():
+    """A flush sends the retries recorded since the previous one."""
+    limiter = make_limiter()
+    limiter.record("card-1", 10)
+    session = FailingSession(ok=2)
+
+    assert await flush_card_windows(session, limiter) == 1
+    limiter.record("card-1", 20)
+    assert await flush_card_windows(session, limiter) == 1
+
+    flushed = [s.compile().params["attempts_m0"] for s in session.statements]
+    assert flushed == [[10], [20]]
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_requeues_the_rest(monkeypatch):
+    """Retries of the failed chunk and later ones are sent by the next flush."""
+    monkeypatch.setattr(card_windows, "FLUSH_CHUNK_CARDS", 1)
+    limiter = make_limiter()
+    for card in ("card-1", "card-2", "card-3"):
+        limiter.record(card, 10)
+    session = FailingSession(ok=1)
+
+    with pytest.raises(ConnectionError):
+        await flush_card_windows(session, limiter)
+
+    assert session.rolled_back
+    [written] = session.statements
+    written_card = written.compile().params["card_fingerprint_m0"]
+    assert set(limiter.drain_changes()) == {"card-1", "card-2", "card-3"} - {
+        written_card
+    }
@@ -0,0 +1,151 @@
+"""
+Unit tests for the per-processor circuit breakers.
+"""
+
+import pytest
+
+from app.services.circuit_breaker import BreakerState, CircuitBreaker, ProcessorBreakers
+
+
+def trip(breaker: CircuitBreaker, now: float = 0.0) -> None:
+    while breaker.state(now) == BreakerState.CLOSED:
+        breaker.record(False, now)
+
+
+# ============== TESTS ==============
+
+
+def test_stays_closed_below_min_calls():
+    """A few failures are not enough to judge the processor."""
+    breaker = CircuitBreaker(
+        failure_ratio=0.5,
+        window_size=10,
+        min_calls=4,
+        open_seconds=30.0,
+        half_open_probes=2,
+    )
+    for _ in range(3):
+        assert breaker.record(False, 0.0) is False
+
+    assert breaker.state(0.0) == BreakerState.CLOSED
+
+
+def test_opens_on_failure_ratio():
+    """Crossing the failure ratio opens the breaker and rejects calls."""
+    breaker = CircuitBreaker(
+        failure_ratio=0.5,
+        window_size=10,
+        min_calls=4,
+        open_seconds=30.0,
+        half_open_probes=2,
+    )
+    breaker.record(True, 0.0)
+    breaker.record(True, 0.0)
+    breaker.record(False, 0.0)
+
+    assert breaker.record(False, 0.0) is True
+    assert breaker.state(0.0) == BreakerState.OPEN
+    assert not breaker.allow(1.0)
+    assert breaker.retry_after(10.0) == 20.0
+
+
+def test_rolling_window_forgets_old_failures():
+    """Only the last `window_size` calls count."""
+    breaker = CircuitBreaker(
+        failure_ratio=0.75,
+        window_size=4,
+        min_calls=4,
+        open_seconds=30.0,
+        half_open_probes=2,
+    )
+    for ok in (False, False, True, True, True, True):
+        breaker.record(ok, 0.0)
+    breaker.record(False, 0.0)
+    breaker.record(False, 0.0)
+
+    assert breaker.state(0.0) == BreakerState.CLOSED
+
+
+def test_half_open_probes_close_breaker():
+    """After the open period, successful probes close the breaker."""
+    breaker = CircuitBreaker(
+        failure_ratio=0.5,
+        window_size=10,
+        min_calls=4,
+        open_seconds=30.0,
+        half_open_probes=2,
+    )
+    trip(breaker)
+
+    assert breaker.state(30.0) == BreakerState.HALF_OPEN
+    assert breaker.allow(30.0)
+    assert breaker.allow(30.0)
+    assert not breaker.allow(30.0)  # Only `half_open_probes` at a time
+
+    breaker.record(True, 31.0)
+    breaker.record(True, 31.0)
+    assert breaker.state(31.0) == BreakerState.CLOSED
+    assert breaker.allow(31.0)
+
+
+def test_failed_probe_reopens_breaker():
+    """A failing probe opens the breaker for another full period."""
+    breaker = CircuitBreaker(
+        failure_ratio=0.5,
+        window_size=10,
+        min_calls=4,
+        open_seconds=30.0,
+        half_open_probes=2,
+    )
+    trip(breaker)
+    assert breaker.allow(30.0)
+
+    assert breaker.record(False, 31.0) is True
+    assert breaker.state(31.0) == BreakerState.OPEN
+    assert breaker.state(60.0) == BreakerState.OPEN
+    assert breaker.state(61.0) == BreakerState.HALF_OPEN
+
+
+def test_released_probe_can_be_reused():
+    """A probe slot given back without a call is available again."""
+    breaker = CircuitBreaker(
+        failure_ratio=0.5,
+        window_size=10,
+        min_calls=4,
+        open_seconds=30.0,
+        half_open_probes=1,
+    )
+    trip(breaker)
+    assert breaker.allow(30.0)
+    assert not breaker.allow(30.0)
+
+    breaker.release()
+    assert breaker.allow(30.0)
+
+
+def test_breakers_are_per_processor():
+    """Each processor gets its own breaker."""
+    breakers = ProcessorBreakers(
+        failure_ratio=0.5,
+        window_size=10,
+        min_calls=1,
+        open_seconds=30.0,
+        half_open_probes=1,
+    )
+    breakers.get("stripe").record(False, 0.0)
+
+    assert breakers.get("stripe").state(0.0) == BreakerState.OPEN
+    assert breakers.get("pse").state(0.0) == BreakerState.CLOSED
+    assert set(breakers.snapshot()) == {"pse", "stripe"}
+
+
+def test_invalid_configuration():
+    """Degenerate breakers are rejected."""
+    with pytest.raises(ValueError):
+        CircuitBreaker(
+            failure_ratio=0.0,
+            window_size=10,
+            min_calls=4,
+            open_seconds=30.0,
+            half_open_probes=2,
+        )
@@ -0,0 +1,142 @@
+"""
+Unit tests for batch failure classification.
+"""
+
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import event
+
+from app.api.v1.endpoints import retry_logic
+from app.api.v1.endpoints.retry_logic import (
+    ClassifyFailureBatchRequest,
+    ClassifyFailureRequest,
+    classify_failure_batch,
+)
+from app.models.merchant import Merchant
+from app.models.payment import FailureType
+from app.models.retry_config import MerchantRetryConfig
+
+
+async def make_merchant(session, configured=True, **config) -> Merchant:
+    """A merchant with a retry config built from `config`, if configured."""
+    merchant = Merchant(name="Merchant", email=f"{uuid4()}@example.com")
+    session.add(merchant)
+    await session.flush()
+    if configured:
+        session.add(MerchantRetryConfig(merchant_id=merchant.id, **config))
+    await session.commit()
+    return merchant
+
+
+def classify_request(merchant, failure_type) -> ClassifyFailureRequest:
+    return ClassifyFailureRequest(
+        payment_id=uuid4(), merchant_id=merchant.id, failure_type=failure_type
+    )
+
+
+@pytest.fixture
+def recorded_logs(monkeypatch) -> list:
+    """Audit logs handed to the audit writer by the endpoint."""
+    logs = []
+    monkeypatch.setattr(
+        retry_logic.audit_writer,
+        "record",
+        lambda session, *new_logs: logs.extend(new_logs) or False,
+    )
+    return logs
+
+
+@pytest.fixture
+def selects(async_engine) -> list:
+    """SELECT statements run against the test database."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    yield statements
+    event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+
+
+# ============== TESTS ==============
+
+
+@pytest.mark.asyncio
+async def test_results_follow_request_order(service_session, recorded_logs):
+    """Every item gets its own decision, in request order."""
+    merchant = await make_merchant(service_session, card_declined_enabled=False)
+    disabled = await make_merchant(service_session, retry_enabled=False)
+    unconfigured = await make_merchant(service_session, configured=False)
+    items = [
+        classify_request(merchant, FailureType.INSUFFICIENT_FUNDS),
+        classify_request(merchant, FailureType.FRAUD),
+        classify_request(merchant, FailureType.CARD_DECLINED),
+        classify_request(disabled, FailureType.NETWORK_TIMEOUT),
+        classify_request(unconfigured, FailureType.NETWORK_TIMEOUT),
+    ]
+
+    response = await classify_failure_batch(
+        ClassifyFailureBatchRequest(items=items), service_session
+    )
+
+    assert [r.payment_id for r in response.results] == [i.payment_id for i in items]
+    assert [(r.is_retriable, r.retry_enabled) for r in response.results] == [
+        (True, True),
+        (False, False),
+        (True, False),
+        (True, False),
+        (False, False),
+    ]
+    assert response.results[0].delay_minutes == 1440
+    assert response.results[0].max_attempts == 3
+    assert response.results[4].reason == "Merchant retry configuration not found"
+    # Only the eligible item is logged as classified
+    assert [(log.event_type, log.payment_id) for log in recorded_logs] == [
+        ("classified", items[0].payment_id)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_policies_are_loaded_in_one_query(
+    service_session, recorded_logs, selects
+):
+    """All merchants' policies come from one IN query, then from the cache."""
+    merchants = [await make_merchant(service_session) for _ in range(3)]
+    request = ClassifyFailureBatchRequest(
+        items=[
+            classify_request(merchant, failure_type)
+            for merchant in merchants
+            for failure_type in (FailureType.CARD_DECLINED, FailureType.NETWORK_TIMEOUT)
+        ]
+    )
+
+    await classify_failure_batch(request, service_session)
+    assert len(selects) == 1
+    assert "merchant_retry_configs" in selects[0]
+
+    await classify_failure_batch(request, service_session)
+    assert len(selects) == 1
+    assert len(recorded_logs) == 12
+
+
+@pytest.mark.asyncio
+async def test_non_retriable_batches_skip_the_database(
+    service_session, recorded_logs, selects
+):
+    """A batch of only non-retriable failures needs no policy lookup."""
+    merchant = await make_merchant(service_session, configured=False)
+    request = ClassifyFailureBatchRequest(
+        items=[
+            classify_request(merchant, FailureType.FRAUD),
+            classify_request(merchant, FailureType.EXPIRED),
+        ]
+    )
+
+    response = await classify_failure_batch(request, service_session)
+
+    assert not any(r.is_retriable for r in response.results)
+    assert selects == []
+    assert recorded_logs == []
@@ -0,0 +1,36 @@
+"""
+Unit tests for keyset pagination cursors.
+"""
+
+from datetime import datetime
+from uuid import uuid4
+
+import pytest
+
+from app.services.cursors import InvalidCursor, decode_cursor, encode_cursor
+
+
+def make_key():
+    return datetime(2025, 3, 14, 15, 9, 26, 535897), uuid4()
+
+
+# ============== TESTS ==============
+
+
+def test_round_trip():
+    """A cursor decodes to the exact key it was built from."""
+    created_at, row_id = make_key()
+    assert decode_cursor(encode_cursor(created_at, row_id)) == (created_at, row_id)
+
+
+def test_cursor_is_url_safe():
+    """Cursors can go in a query string without escaping."""
+    cursor = encode_cursor(*make_key())
+    assert all(c.isalnum() or c in "-_" for c in cursor)
+
+
+@pytest.mark.parametrize("cursor", ["", "not a cursor", "Zm9vfGJhcg", "////"])
+def test_garbage_is_rejected(cursor):
+    """Anything not produced by encode_cursor raises InvalidCursor."""
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor)
@@ -0,0 +1,83 @@
+"""
+Unit tests for export encoders.
+"""
+
+import csv
+import gzip
+import io
+import json
+from datetime import datetime
+from uuid import uuid4
+
+import pytest
+
+from app.models.payment import PaymentStatus
+from app.services.export_formats import encode_chunks, gzip_chunks
+
+COLUMNS = ("id", "status", "amount_cents", "metadata_json", "created_at")
+
+
+def make_row(amount_cents: int = 100):
+    return (
+        uuid4(),
+        PaymentStatus.FAILED,
+        amount_cents,
+        {"result_code": "declined"},
+        datetime(2025, 1, 1, 12, 30),
+    )
+
+
+async def make_chunks(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+async def collect(stream) -> bytes:
+    return b"".join([chunk async for chunk in stream])
+
+
+# ============== TESTS ==============
+
+
+@pytest.mark.asyncio
+async def test_ndjson_one_object_per_row():
+    """Each row becomes one JSON line with ISO timestamps and enum values."""
+    rows = [make_row(1), make_row(2)]
+    body = await collect(
+        encode_chunks("ndjson", COLUMNS, make_chunks(rows[:1], rows[1:]))
+    )
+    lines = [json.loads(line) for line in body.decode().splitlines()]
+    assert [line["amount_cents"] for line in lines] == [1, 2]
+    assert lines[0]["id"] == str(rows[0][0])
+    assert lines[0]["status"] == "failed"
+    assert lines[0]["metadata_json"] == {"result_code": "declined"}
+    assert lines[0]["created_at"] == "2025-01-01T12:30:00"
+
+
+@pytest.mark.asyncio
+async def test_csv_has_a_single_header():
+    """CSV output starts with one header line followed by every row."""
+    body = await collect(
+        encode_chunks("csv", COLUMNS, make_chunks([make_row(1)], [make_row(2)]))
+    )
+    records = list(csv.reader(io.StringIO(body.decode())))
+    assert records[0] == list(COLUMNS)
+    assert [record[2] for record in records[1:]] == ["1", "2"]
+    assert records[1][1] == "failed"
+    assert json.loads(records[1][3]) == {"result_code": "declined"}
+
+
+@pytest.mark.asyncio
+async def test_empty_export():
+    """An empty CSV export is just the header; an empty NDJSON one is empty."""
+    assert await collect(encode_chunks("ndjson", COLUMNS, make_chunks())) == b""
+    body = await collect(encode_chunks("csv", COLUMNS, make_chunks()))
+    assert body.decode().strip() == ",".join(COLUMNS)
+
+
+@pytest.mark.asyncio
+async def test_gzip_round_trip():
+    """Compressed chunks form one valid gzip stream."""
+    chunks = [b"a" * 1000, b"b" * 1000, b""]
+    body = await collect(gzip_chunks(make_chunks(*chunks)))
+    assert gzip.decompress(body) == b"".join(chunks)
@@ -0,0 +1,112 @@
+"""
+Unit tests for bulk failed-payment parsing.
+"""
+
+import gzip
+import json
+from datetime import datetime, timezone
+from uuid import uuid4
+
+import pytest
+
+from app.models.payment import FailureType
+from app.services.ingest_records import (
+    BodyTooLarge,
+    FailedPaymentRecord,
+    decode_body,
+    parse_records,
+)
+
+
+def make_record(**kwargs) -> dict:
+    record = {
+        "merchant_id": str(uuid4()),
+        "amount_cents": 1500,
+        "failure_type": "card_declined",
+    }
+    record.update(kwargs)
+    return record
+
+
+# ============== TESTS ==============
+
+
+def test_ndjson_records():
+    """Each NDJSON line becomes a record with defaults filled in."""
+    lines = [json.dumps(make_record()), "", json.dumps(make_record(currency="COP"))]
+    results = [record for _, record in parse_records(lines, "ndjson")]
+    assert all(isinstance(r, FailedPaymentRecord) for r in results)
+    assert [r.currency for r in results] == ["USD", "COP"]
+    assert results[0].failure_type == FailureType.CARD_DECLINED
+    assert results[0].processor == "stripe"
+
+
+def test_ndjson_bad_lines_are_reported():
+    """Invalid lines are rejected with their line number; others still parse."""
+    lines = [
+        json.dumps(make_record()),
+        "{not json",
+        json.dumps([1, 2]),
+        json.dumps(make_record(amount_cents=0)),
+        json.dumps(make_record(failure_type="meteor_strike")),
+    ]
+    results = list(parse_records(lines, "ndjson"))
+    assert isinstance(results[0][1], FailedPaymentRecord)
+    rejected = [(line, error) for line, error in results if isinstance(error, str)]
+    assert [line for line, _ in rejected] == [2, 3, 4, 5]
+    assert "amount_cents" in rejected[2][1]
+    assert "failure_type" in rejected[3][1]
+
+
+def test_csv_records():
+    """CSV rows map by header; empty cells fall back to defaults."""
+    merchant_id = uuid4()
+    lines = [
+        "merchant_id,amount_cents,failure_type,currency,failed_at\n",
+        f"{merchant_id},2500,network_timeout,,2025-01-01T10:00:00\n",
+        f"{merchant_id},abc,network_timeout,USD,\n",
+    ]
+    (_, record), (line, error) = parse_records(lines, "csv")
+    assert record.merchant_id == merchant_id
+    assert record.currency == "USD"
+    assert record.failed_at.hour == 10
+    assert isinstance(error, str)
+    assert line == 3
+
+
+def test_aware_timestamps_become_local():
+    """failed_at with an offset is stored as naive local time."""
+    aware = datetime(2025, 1, 1, 10, tzinfo=timezone.utc)
+    [(_, record)] = parse_records(
+        [json.dumps(make_record(failed_at=aware.isoformat()))], "ndjson"
+    )
+    assert record.failed_at.tzinfo is None
+    assert record.failed_at == aware.astimezone().replace(tzinfo=None)
+
+
+def test_gzipped_body_is_decoded():
+    """Gzip bodies, including concatenated members, decode to their text."""
+    body = gzip.compress("línea 1\n".encode()) + gzip.compress(b"line 2\n")
+    assert decode_body(body, gzipped=True, max_bytes=100) == "línea 1\nline 2\n"
+
+
+def test_decompression_stops_at_max_bytes():
+    """A body that inflates past max_bytes is rejected without inflating it all."""
+    bomb = gzip.compress(b"0" * 10_000_000)
+    with pytest.raises(BodyTooLarge):
+        decode_body(bomb, gzipped=True, max_bytes=1000)
+    with pytest.raises(BodyTooLarge):
+        decode_body(b"0" * 1001, gzipped=False, max_bytes=1000)
+
+
+def test_invalid_bodies_raise_value_error():
+    """Corrupt or truncated gzip and non UTF-8 bytes are ValueErrors."""
+    compressed = gzip.compress(b"line\n")
+    for body, gzipped in [
+        (b"not gzip", True),
+        (compressed[:-4], True),
+        (b"\xff\xfe", False),
+    ]:
+        with pytest.raises(ValueError) as error:
+            decode_body(body, gzipped=gzipped, max_bytes=1000)
+        assert not isinstance(error.value, BodyTooLarge)
@@ -0,0 +1,51 @@
+"""
+Unit tests for JSON encoding of plain rows.
+"""
+
+import json
+from datetime import datetime
+from uuid import uuid4
+
+from app.models.payment import PaymentStatus
+from app.services.json_rows import encode_json, encode_rows, row_dicts
+
+COLUMNS = ("id", "status", "amount_cents", "metadata_json", "created_at")
+
+
+def make_row(amount_cents: int = 100):
+    return (
+        uuid4(),
+        PaymentStatus.FAILED,
+        amount_cents,
+        {"result_code": "declined"},
+        datetime(2025, 1, 1, 12, 30),
+    )
+
+
+# ============== TESTS ==============
+
+
+def test_encode_rows_as_array_of_objects():
+    """Rows become objects keyed by column, with ISO timestamps and enum values."""
+    rows = [make_row(1), make_row(2)]
+    decoded = json.loads(encode_rows(COLUMNS, rows))
+    assert [item["amount_cents"] for item in decoded] == [1, 2]
+    assert decoded[0] == {
+        "id": str(rows[0][0]),
+        "status": "failed",
+        "amount_cents": 1,
+        "metadata_json": {"result_code": "declined"},
+        "created_at": "2025-01-01T12:30:00",
+    }
+
+
+def test_encode_rows_empty_page():
+    """An empty page is an empty array."""
+    assert encode_rows(COLUMNS, []) == b"[]"
+
+
+def test_row_dicts_nest_in_response_bodies():
+    """row_dicts() output can be embedded in a larger body."""
+    row = make_row()
+    body = json.loads(encode_json({"items": row_dicts(COLUMNS, [row])}))
+    assert body["items"][0]["id"] == str(row[0])
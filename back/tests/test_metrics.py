@@ -0,0 +1,87 @@
+"""
+Unit tests for the Prometheus metrics registry.
+"""
+
+import pytest
+
+from app.services.metrics import Counter, Gauge, Histogram, Registry
+
+
+def make_registry() -> Registry:
+    return Registry()
+
+
+# ============== TESTS ==============
+
+
+def test_histogram_buckets_are_cumulative():
+    """Each bucket counts observations at or below its bound."""
+    histogram = Histogram("wait_seconds", "Wait", buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value)
+    samples = histogram.samples()
+    assert 'wait_seconds_bucket{le="0.1"} 2' in samples
+    assert 'wait_seconds_bucket{le="1"} 3' in samples
+    assert 'wait_seconds_bucket{le="+Inf"} 4' in samples
+    assert "wait_seconds_count 4" in samples
+
+
+def test_histogram_rejects_unsorted_buckets():
+    """Buckets must be given in increasing order."""
+    with pytest.raises(ValueError):
+        Histogram("h", "h", buckets=(1.0, 0.1))
+
+
+def test_gauge_reads_at_render_time():
+    """Gauges call their callback on every render."""
+    registry = make_registry()
+    values = [3]
+    registry.register(Gauge("in_use", "In use", lambda: values[0]))
+    assert "in_use 3" in registry.render()
+    values[0] = 5
+    assert "in_use 5" in registry.render()
+
+
+def test_render_includes_help_and_type():
+    """Every metric is preceded by its HELP and TYPE lines."""
+    registry = make_registry()
+    counter = registry.register(Counter("timeouts_total", "Timeouts"))
+    counter.inc()
+    lines = registry.render().splitlines()
+    assert lines == [
+        "# HELP timeouts_total Timeouts",
+        "# TYPE timeouts_total counter",
+        "timeouts_total 1",
+    ]
+
+
+def test_duplicate_names_are_rejected():
+    """A metric name can only be registered once per label set and kind."""
+    registry = make_registry()
+    registry.register(Counter("c", "c"))
+    with pytest.raises(ValueError):
+        registry.register(Counter("c", "c"))
+    with pytest.raises(ValueError):
+        registry.register(Gauge("c", "c", lambda: 0, labels={"engine": "replica"}))
+
+
+def test_labelled_metrics_share_a_family():
+    """Same-named metrics with different labels render under one HELP/TYPE."""
+    registry = make_registry()
+    for engine, value in (("primary", 20), ("replica", 5)):
+        registry.register(
+            Gauge(
+                "pool_size", "Pool size", lambda v=value: v, labels={"engine": engine}
+            )
+        )
+    histogram = registry.register(
+        Histogram("wait", "Wait", buckets=(1.0,), labels={"engine": "replica"})
+    )
+    histogram.observe(0.5)
+
+    lines = registry.render().splitlines()
+    assert lines.count("# TYPE pool_size gauge") == 1
+    assert 'pool_size{engine="primary"} 20' in lines
+    assert 'pool_size{engine="replica"} 5' in lines
+    assert 'wait_bucket{engine="replica",le="1"} 1' in lines
+    assert 'wait_count{engine="replica"} 1' in lines
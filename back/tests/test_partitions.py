@@ -0,0 +1,74 @@
+"""
+Unit tests for monthly partition helpers.
+"""
+
+from datetime import date, datetime
+
+import pytest
+
+from app.services.partitions import (
+    add_months,
+    archive_cutoff,
+    month_start,
+    months_to_create,
+    partition_month,
+    partition_name,
+)
+
+TABLE = "retry_audit_logs"
+
+
+# ============== TESTS ==============
+
+
+@pytest.mark.parametrize(
+    "month, months, expected",
+    [
+        (date(2025, 1, 1), 1, date(2025, 2, 1)),
+        (date(2025, 11, 1), 3, date(2026, 2, 1)),
+        (date(2025, 1, 1), -1, date(2024, 12, 1)),
+        (date(2025, 3, 1), -15, date(2023, 12, 1)),
+    ],
+)
+def test_add_months(month, months, expected):
+    """Month arithmetic wraps across years in both directions."""
+    assert add_months(month, months) == expected
+
+
+def test_name_round_trip():
+    """Partition names encode the month and parse back to it."""
+    name = partition_name(TABLE, date(2025, 7, 1))
+    assert name == "retry_audit_logs_p2025_07"
+    assert partition_month(TABLE, name) == date(2025, 7, 1)
+
+
+@pytest.mark.parametrize(
+    "name",
+    [
+        "retry_audit_logs",
+        "retry_audit_logs_default",
+        "retry_audit_logs_p2025_13",
+        "other_table_p2025_01",
+        "retry_audit_logs_p2025_01_old",
+    ],
+)
+def test_other_names_are_not_partitions(name):
+    """Only `<table>_pYYYY_MM` names with a valid month are partitions."""
+    assert partition_month(TABLE, name) is None
+
+
+def test_months_to_create():
+    """The current month plus the requested months ahead."""
+    now = datetime(2025, 12, 31, 23, 59)
+    assert months_to_create(now, 2) == [
+        date(2025, 12, 1),
+        date(2026, 1, 1),
+        date(2026, 2, 1),
+    ]
+
+
+def test_archive_cutoff():
+    """Retention counts whole months back from the current one."""
+    now = datetime(2025, 3, 15)
+    assert month_start(now) == date(2025, 3, 1)
+    assert archive_cutoff(now, 12) == date(2024, 3, 1)
@@ -0,0 +1,138 @@
+"""
+Unit tests for the per-merchant payment stats rollup.
+"""
+
+from uuid import uuid4
+
+import pytest
+import sqlalchemy
+
+from app.models.merchant import Merchant
+from app.models.merchant_payment_stats import MerchantPaymentStats
+from app.models.payment import Payment, PaymentStatus
+from app.services import payment_stats
+from app.services.payment_stats import (
+    PaymentStatsDelta,
+    apply_payment_stats_delta,
+    get_payment_stats_by_merchant_id,
+    rebuild_payment_stats,
+)
+
+
+async def make_merchant(session) -> Merchant:
+    merchant = Merchant(name="Merchant", email=f"{uuid4()}@example.com")
+    session.add(merchant)
+    await session.commit()
+    return merchant
+
+
+@pytest.fixture
+def no_table_lock(monkeypatch):
+    """SQLite has no LOCK TABLE; run the rebuild without it."""
+    monkeypatch.setattr(payment_stats, "text", lambda sql: sqlalchemy.text("SELECT 1"))
+
+
+# ============== TESTS ==============
+
+
+def test_move_takes_one_payment_from_old_status_to_new():
+    """A move is +1/+amount on the new status and -1/-amount on the old one."""
+    merchant_id = uuid4()
+    delta = PaymentStatsDelta()
+    delta.add(merchant_id, PaymentStatus.FAILED, 1000)
+    delta.move(merchant_id, 1000, PaymentStatus.FAILED, PaymentStatus.RETRYING)
+    delta.move(merchant_id, 400, PaymentStatus.RETRYING, PaymentStatus.RECOVERED)
+
+    assert {row["status"]: row["payment_count"] for row in delta.rows()} == {
+        PaymentStatus.RETRYING: 0,
+        PaymentStatus.RECOVERED: 1,
+    }
+    assert {row["status"]: row["amount_cents"] for row in delta.rows()} == {
+        PaymentStatus.RETRYING: 600,
+        PaymentStatus.RECOVERED: 400,
+    }
+
+
+def test_unchanged_rows_are_dropped():
+    """Moves to the same status and deltas that cancel out write nothing."""
+    merchant_id = uuid4()
+    delta = PaymentStatsDelta()
+    delta.move(merchant_id, 1000, PaymentStatus.FAILED, PaymentStatus.FAILED)
+    delta.move(merchant_id, 1000, PaymentStatus.FAILED, PaymentStatus.RETRYING)
+    delta.move(merchant_id, 1000, PaymentStatus.RETRYING, PaymentStatus.FAILED)
+    assert delta.rows() == []
+
+
+def test_rows_are_in_lock_order():
+    """Rows are sorted by merchant and status for a consistent lock order."""
+    delta = PaymentStatsDelta()
+    merchants = [uuid4() for _ in range(5)]
+    for merchant_id in merchants:
+        delta.add(merchant_id, PaymentStatus.RETRYING, 1)
+        delta.add(merchant_id, PaymentStatus.FAILED, 1)
+
+    keys = [(str(row["merchant_id"]), row["status"]) for row in delta.rows()]
+    assert keys == sorted(keys)
+
+
+@pytest.mark.asyncio
+async def test_upsert_adds_deltas_to_existing_rows(service_session):
+    """Applying deltas inserts missing rows and adds to existing ones."""
+    merchant = await make_merchant(service_session)
+    first = PaymentStatsDelta()
+    first.add(merchant.id, PaymentStatus.FAILED, 1000)
+    first.add(merchant.id, PaymentStatus.FAILED, 500)
+    await apply_payment_stats_delta(service_session, first)
+
+    second = PaymentStatsDelta()
+    second.move(merchant.id, 1000, PaymentStatus.FAILED, PaymentStatus.RECOVERED)
+    await apply_payment_stats_delta(service_session, second)
+    await service_session.commit()
+
+    stats = await get_payment_stats_by_merchant_id(service_session, merchant.id)
+    assert stats[PaymentStatus.FAILED] == (1, 500)
+    assert stats[PaymentStatus.RECOVERED] == (1, 1000)
+    assert stats[PaymentStatus.EXHAUSTED] == (0, 0)
+
+
+@pytest.mark.asyncio
+async def test_rebuild_recomputes_from_payments(service_session, no_table_lock):
+    """A drifted rollup is replaced by totals from payments, per merchant."""
+    merchant = await make_merchant(service_session)
+    other = await make_merchant(service_session)
+    service_session.add_all(
+        [
+            Payment(merchant_id=merchant.id, amount_cents=1000, status=status)
+            for status in (
+                PaymentStatus.FAILED,
+                PaymentStatus.FAILED,
+                PaymentStatus.RECOVERED,
+            )
+        ]
+        + [
+            MerchantPaymentStats(
+                merchant_id=merchant.id,
+                status=PaymentStatus.EXHAUSTED,
+                payment_count=7,
+                amount_cents=7,
+            ),
+            MerchantPaymentStats(
+                merchant_id=other.id,
+                status=PaymentStatus.FAILED,
+                payment_count=3,
+                amount_cents=3,
+            ),
+        ]
+    )
+    await service_session.commit()
+
+    rows = await rebuild_payment_stats(service_session, merchant.id)
+
+    assert rows == 2
+    stats = await get_payment_stats_by_merchant_id(service_session, merchant.id)
+    assert stats[PaymentStatus.FAILED] == (2, 2000)
+    assert stats[PaymentStatus.RECOVERED] == (1, 1000)
+    assert stats[PaymentStatus.EXHAUSTED] == (0, 0)
+    # Other merchants' rows are left alone
+    other_stats = await get_payment_stats_by_merchant_id(service_session, other.id)
+    assert other_stats[PaymentStatus.FAILED] == (3, 3)
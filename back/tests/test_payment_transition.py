@@ -0,0 +1,179 @@
+"""
+Unit tests for the single-statement payment transition after a retry attempt.
+"""
+
+import re
+from uuid import uuid4
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.dialects.postgresql.asyncpg import dialect as asyncpg_dialect
+
+from app.models.payment import Payment, PaymentStatus
+from app.services.payments import transition_payment_after_attempt
+from app.services.retry_policy import DEFAULT_MAX_ATTEMPTS
+from app.services.statements import TRANSITION_PAYMENT
+
+DIALECT = asyncpg_dialect()
+
+
+class FakeResult:
+    def __init__(self, row):
+        self.row = row
+
+    def scalar_one_or_none(self):
+        return self.row
+
+
+class FakeSession:
+    """Returns `updated` from the transition and `stored` from session.get."""
+
+    def __init__(self, updated=None, stored=None):
+        self.updated = updated
+        self.stored = stored
+        self.params: list[dict] = []
+
+    async def execute(self, statement, params):
+        self.params.append(params)
+        return FakeResult(self.updated)
+
+    async def get(self, model, ident):
+        return self.stored
+
+
+def compiled_sql(success: bool) -> tuple[str, dict, dict]:
+    """Single-line SQL, the $N -> bind name map and the bound values."""
+    compiled = TRANSITION_PAYMENT[success].compile(dialect=DIALECT)
+    sql = " ".join(str(compiled).split())
+    names = {f"${i}": name for i, name in enumerate(compiled.positiontup, start=1)}
+    return sql, names, compiled.params
+
+
+def make_payment(status=PaymentStatus.RETRYING, retry_count=1) -> Payment:
+    return Payment(
+        id=uuid4(),
+        merchant_id=uuid4(),
+        amount_cents=1000,
+        status=status,
+        retry_count=retry_count,
+    )
+
+
+# ============== TESTS ==============
+
+
+@pytest.mark.asyncio
+async def test_unknown_payment_is_404():
+    """No matched row and no stored payment means the payment doesn't exist."""
+    session = FakeSession(updated=None, stored=None)
+
+    with pytest.raises(HTTPException) as error:
+        await transition_payment_after_attempt(session, uuid4(), 1, success=False)
+
+    assert error.value.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_final_payment_is_409():
+    """A stored payment the CTE didn't lock is in a final status."""
+    session = FakeSession(
+        updated=None, stored=make_payment(status=PaymentStatus.RECOVERED)
+    )
+
+    with pytest.raises(HTTPException) as error:
+        await transition_payment_after_attempt(session, uuid4(), 1, success=True)
+
+    assert error.value.status_code == 409
+
+
+@pytest.mark.asyncio
+async def test_updated_payment_is_returned_with_call_values():
+    """The transitioned row comes back; per-call values go as parameters."""
+    payment = make_payment(status=PaymentStatus.EXHAUSTED, retry_count=3)
+    session = FakeSession(updated=payment)
+
+    result = await transition_payment_after_attempt(
+        session,
+        payment.id,
+        3,
+        success=False,
+        result_code="exhausted",
+        result_message="No more attempts",
+    )
+
+    assert result is payment
+    params = session.params[0]
+    assert params["payment_id"] == payment.id
+    assert params["attempt_number"] == 3
+    assert params["retry_count"] is None
+    assert params["metadata_json"] == {
+        "result_code": "exhausted",
+        "result_message": "No more attempts",
+    }
+
+    await transition_payment_after_attempt(
+        session, payment.id, 3, success=False, retry_count=7
+    )
+    assert session.params[1]["retry_count"] == 7
+
+
+def test_failure_increments_retry_count_unless_given():
+    """retry_count is the given count, or the stored count plus one."""
+    sql, names, params = compiled_sql(success=False)
+
+    match = re.search(
+        r"retry_count=coalesce\((\$\d+)::INTEGER, "
+        r"payments\.retry_count \+ (\$\d+)::INTEGER\)",
+        sql,
+    )
+    assert match
+    assert names[match[1]] == "retry_count"
+    assert params[names[match[2]]] == 1
+
+
+def test_failure_exhausts_at_merchant_max_attempts():
+    """The new count is compared with the merchant's max_attempts or the default."""
+    sql, names, params = compiled_sql(success=False)
+
+    match = re.search(
+        r"status=CASE WHEN \(coalesce\(\$\d+::INTEGER, payments\.retry_count "
+        r"\+ \$\d+::INTEGER\) >= coalesce\(\(SELECT "
+        r"merchant_retry_configs\.max_attempts FROM merchant_retry_configs "
+        r"WHERE merchant_retry_configs\.merchant_id = payments\.merchant_id\), "
+        r"(\$\d+)::INTEGER\)\) THEN (\$\d+)::public\.payment_status "
+        r"ELSE (\$\d+)::public\.payment_status END",
+        sql,
+    )
+    assert match
+    default, exhausted, retrying = (params[names[p]] for p in match.groups())
+    assert default == DEFAULT_MAX_ATTEMPTS
+    assert exhausted == PaymentStatus.EXHAUSTED
+    assert retrying == PaymentStatus.RETRYING
+
+
+def test_success_recovers_without_counting_an_attempt():
+    """A success marks the payment recovered and leaves retry_count alone."""
+    sql, names, params = compiled_sql(success=True)
+
+    match = re.search(
+        r"UPDATE payments SET status=(\$\d+)::public\.payment_status, "
+        r"recovered_via_retry=(\$\d+)::BOOLEAN, updated_at=",
+        sql,
+    )
+    assert match
+    assert params[names[match[1]]] == PaymentStatus.RECOVERED
+    assert params[names[match[2]]] is True
+    assert "retry_count=" not in sql
+
+
+@pytest.mark.parametrize("success", [True, False])
+def test_only_retryable_payments_are_locked(success):
+    """The CTE locks the payment only while it is in a retryable status."""
+    sql, _, _ = compiled_sql(success)
+
+    assert re.search(
+        r"WITH previous AS \(SELECT payments\.id AS id, payments\.status AS status "
+        r"FROM payments WHERE payments\.id = \$\d+::UUID AND payments\.status "
+        r"IN \(__\[POSTCOMPILE_\w+\]\) FOR UPDATE\)",
+        sql,
+    )
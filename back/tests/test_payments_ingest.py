@@ -0,0 +1,40 @@
+"""
+Unit tests for the bulk payment ingest endpoint.
+"""
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from app.api.v1.endpoints.payments import ingest_payments
+from app.core.config import settings
+
+
+class UnusedSession:
+    """Fails on any database access."""
+
+    def __getattr__(self, name):
+        raise AssertionError(f"session.{name} used")
+
+
+def ndjson_request(body: bytes) -> Request:
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    return Request({"type": "http", "method": "POST", "headers": []}, receive)
+
+
+# ============== TESTS ==============
+
+
+@pytest.mark.asyncio
+async def test_ingest_is_refused_without_native_scheduling(monkeypatch):
+    """Without native scheduling nothing would run the jobs, so nothing is written."""
+    monkeypatch.setattr(settings, "RETRY_NATIVE_SCHEDULING", False)
+    monkeypatch.setattr(settings, "RETRY_SCHEDULER_ENABLED", False)
+
+    with pytest.raises(HTTPException) as error:
+        await ingest_payments(ndjson_request(b"{}\n"), UnusedSession(), "ndjson")
+
+    assert error.value.status_code == 409
+    assert "RETRY_NATIVE_SCHEDULING" in error.value.detail
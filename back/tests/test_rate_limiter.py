@@ -0,0 +1,106 @@
+"""
+Unit tests for the per-processor rate limiter.
+"""
+
+import asyncio
+
+import pytest
+
+from app.services.rate_limiter import ProcessorLimit, ProcessorLimiter, TokenBucket
+
+
+def make_limiter(**limits: ProcessorLimit) -> ProcessorLimiter:
+    return ProcessorLimiter(
+        limits=limits,
+        default=ProcessorLimit(rate_per_second=1.0, max_concurrency=1),
+    )
+
+
+# ============== TESTS ==============
+
+
+def test_bucket_allows_burst_then_refills():
+    """A full bucket serves its capacity at once, then refills at its rate."""
+    bucket = TokenBucket(rate=2.0, capacity=2.0, now=0.0)
+
+    assert bucket.try_acquire(0.0)
+    assert bucket.try_acquire(0.0)
+    assert not bucket.try_acquire(0.0)
+    assert bucket.retry_after(0.0) == pytest.approx(0.5)
+    assert bucket.try_acquire(0.5)
+
+
+def test_bucket_never_exceeds_capacity():
+    """Idle time does not accumulate tokens beyond the capacity."""
+    bucket = TokenBucket(rate=10.0, capacity=3.0, now=0.0)
+
+    assert sum(bucket.try_acquire(100.0) for _ in range(10)) == 3
+
+
+def test_invalid_bucket():
+    """Non-positive rates are rejected."""
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0.0, capacity=1.0, now=0.0)
+
+
+def test_rate_limit_per_processor():
+    """Each processor has its own bucket."""
+    limiter = make_limiter(
+        stripe=ProcessorLimit(rate_per_second=2.0, max_concurrency=10)
+    )
+
+    granted = 0
+    for _ in range(5):
+        if limiter.try_acquire("stripe", now=0.0):
+            granted += 1
+            limiter.release("stripe")
+    assert granted == 2
+    # Unknown processors fall back to the default limit
+    assert limiter.try_acquire("nequi", now=0.0)
+
+
+def test_concurrency_cap():
+    """Slots are held until released, whatever the token balance."""
+    limiter = make_limiter(pse=ProcessorLimit(rate_per_second=100.0, max_concurrency=2))
+
+    assert limiter.try_acquire("pse", now=0.0)
+    assert limiter.try_acquire("pse", now=0.0)
+    assert not limiter.try_acquire("pse", now=0.0)
+
+    limiter.release("pse")
+    assert limiter.try_acquire("pse", now=0.0)
+
+
+def test_retry_after_spreads_queued_callers():
+    """Callers queued behind each other get increasing delays."""
+    limiter = make_limiter(
+        dlocal=ProcessorLimit(rate_per_second=10.0, max_concurrency=10)
+    )
+    while limiter.try_acquire("dlocal", now=0.0):
+        limiter.release("dlocal")
+
+    first = limiter.retry_after("dlocal", 0, now=0.0)
+    fifth = limiter.retry_after("dlocal", 4, now=0.0)
+    assert fifth - first == pytest.approx(0.4)
+
+
+def test_acquire_waits_for_token():
+    """acquire() waits for the next token up to its timeout."""
+    limiter = make_limiter(
+        stripe=ProcessorLimit(rate_per_second=20.0, max_concurrency=10)
+    )
+    while limiter.try_acquire("stripe"):
+        limiter.release("stripe")
+
+    assert asyncio.run(limiter.acquire("stripe", timeout=1.0))
+    assert not asyncio.run(limiter.acquire("stripe", timeout=0.0))
+
+
+def test_take_token_ignores_concurrency():
+    """try_take_token() spends tokens without touching in-flight slots."""
+    limiter = make_limiter(pse=ProcessorLimit(rate_per_second=2.0, max_concurrency=1))
+    assert limiter.try_acquire("pse", now=0.0)
+
+    assert limiter.try_take_token("pse", now=0.0)
+    assert not limiter.try_take_token("pse", now=0.0)
+    assert limiter.snapshot()["pse"]["in_flight"] == 1
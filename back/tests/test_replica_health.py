@@ -0,0 +1,47 @@
+"""
+Unit tests for the read replica staleness gate.
+"""
+
+from app.services.replica_health import ReplicaHealth
+
+
+def make_health(max_lag_seconds: float = 5.0, max_age_seconds: float = 15.0):
+    return ReplicaHealth(
+        max_lag_seconds=max_lag_seconds, max_age_seconds=max_age_seconds
+    )
+
+
+# ============== TESTS ==============
+
+
+def test_unknown_lag_uses_primary():
+    """Until the first measurement, reads stay on the primary."""
+    assert not make_health().usable(now=0)
+
+
+def test_lag_within_bound_uses_replica():
+    """A fresh measurement within the bound allows replica reads."""
+    health = make_health()
+    health.record(1.5, now=100)
+    assert health.usable(now=101)
+    health.record(5.1, now=102)
+    assert not health.usable(now=103)
+
+
+def test_stale_measurement_falls_back():
+    """A measurement older than max_age is not trusted."""
+    health = make_health()
+    health.record(0.0, now=100)
+    assert health.usable(now=115)
+    assert not health.usable(now=116)
+
+
+def test_errors_fall_back_until_next_measurement():
+    """An unreachable replica sends reads to the primary."""
+    health = make_health()
+    health.record(0.0, now=100)
+    health.record_error("connection refused")
+    assert not health.usable(now=100)
+    assert health.snapshot(now=100)["error"] == "connection refused"
+    health.record(0.0, now=101)
+    assert health.usable(now=101)
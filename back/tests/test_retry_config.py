@@ -8,6 +8,11 @@ from uuid import uuid4
 import pytest
 from sqlmodel import Field, SQLModel, select
 
+from app.models.merchant import Merchant
+from app.models.retry_config import MerchantRetryConfig
+from app.services import retry_config
+from app.services.ttl_cache import MISSING
+
 
 # Simplified RetryConfig model for SQLite testing
 class RetryConfigTest(SQLModel, table=True):
@@ -187,3 +192,26 @@ async def test_disable_specific_failure_type(async_session):
 
     assert config.insufficient_funds_enabled is False
     assert config.card_declined_enabled is True  # Others remain enabled
+
+
+@pytest.mark.asyncio
+async def test_update_during_load_is_not_cached_stale(service_session, monkeypatch):
+    """A config read before an update commits is returned but not cached."""
+    merchant = Merchant(name="Merchant", email=f"{uuid4()}@example.com")
+    service_session.add(merchant)
+    await service_session.flush()
+    service_session.add(MerchantRetryConfig(merchant_id=merchant.id))
+    await service_session.commit()
+    load_config = retry_config._load_config
+
+    async def load_then_update(session, merchant_id):
+        config = await load_config(session, merchant_id)
+        # An update commits and invalidates the merchant while this load runs
+        retry_config.config_cache.invalidate(merchant_id)
+        return config
+
+    monkeypatch.setattr(retry_config, "_load_config", load_then_update)
+    policy = await retry_config.get_policy_by_merchant_id(service_session, merchant.id)
+
+    assert policy is not None
+    assert retry_config.config_cache.get(merchant.id) is MISSING
@@ -0,0 +1,240 @@
+"""
+Unit tests for set-based retry execution.
+"""
+
+from datetime import datetime
+from uuid import uuid4
+
+import pytest
+from sqlmodel import select
+
+from app.models.merchant import Merchant
+from app.models.merchant_payment_stats import MerchantPaymentStats
+from app.models.payment import FailureType, Payment, PaymentStatus
+from app.models.retry_job import RetryJob, RetryJobStatus
+from app.services import retry_execution
+from app.services.retry_execution import RetryAttempt, execute_retry_batch
+
+
+async def make_payment(session, status=PaymentStatus.FAILED, amount_cents=1000):
+    merchant = Merchant(name="Merchant", email=f"{uuid4()}@example.com")
+    session.add(merchant)
+    await session.flush()
+    payment = Payment(
+        merchant_id=merchant.id,
+        amount_cents=amount_cents,
+        status=status,
+        failure_type=FailureType.INSUFFICIENT_FUNDS,
+        card_fingerprint=str(uuid4()),
+    )
+    session.add(payment)
+    await session.commit()
+    return payment
+
+
+async def make_job(session, payment, status=RetryJobStatus.PROCESSING, attempt=1):
+    job = RetryJob(
+        payment_id=payment.id,
+        merchant_id=payment.merchant_id,
+        attempt_number=attempt,
+        failure_type=FailureType.INSUFFICIENT_FUNDS,
+        scheduled_at=datetime.now(),
+        status=status,
+    )
+    session.add(job)
+    await session.commit()
+    return job
+
+
+async def get_stats(session, merchant_id):
+    result = await session.exec(
+        select(MerchantPaymentStats).where(
+            MerchantPaymentStats.merchant_id == merchant_id
+        )
+    )
+    return {row.status: (row.payment_count, row.amount_cents) for row in result.all()}
+
+
+async def get_jobs(session, payment):
+    result = await session.exec(
+        select(RetryJob)
+        .where(RetryJob.payment_id == payment.id)
+        .order_by(RetryJob.attempt_number)
+        .execution_options(populate_existing=True)
+    )
+    return list(result.all())
+
+
+@pytest.fixture
+def processor_succeeds(monkeypatch):
+    """Make every simulated processor call succeed."""
+    monkeypatch.setattr(
+        retry_execution, "simulate_processor_retry", lambda failure_type: (True, 1, 0)
+    )
+
+
+@pytest.fixture
+def processor_fails(monkeypatch):
+    """Make every simulated processor call fail."""
+    monkeypatch.setattr(
+        retry_execution, "simulate_processor_retry", lambda failure_type: (False, 0, 1)
+    )
+
+
+# ============== TESTS ==============
+
+
+@pytest.mark.asyncio
+async def test_jobs_no_longer_processing_are_skipped(
+    service_session, processor_succeeds
+):
+    """A job whose lease expired is not executed by its old claimer."""
+    payment = await make_payment(service_session)
+    job = await make_job(service_session, payment, status=RetryJobStatus.PENDING)
+
+    outcomes = await execute_retry_batch(service_session, [RetryAttempt.from_job(job)])
+
+    assert outcomes[0].result_code == "job_not_claimed"
+    await service_session.refresh(payment)
+    await service_session.refresh(job)
+    assert payment.status == PaymentStatus.FAILED
+    assert job.status == RetryJobStatus.PENDING
+
+
+@pytest.mark.asyncio
+async def test_claimed_job_is_executed(service_session, processor_succeeds):
+    """A job still PROCESSING runs and is completed."""
+    payment = await make_payment(service_session)
+    job = await make_job(service_session, payment)
+
+    outcomes = await execute_retry_batch(service_session, [RetryAttempt.from_job(job)])
+
+    assert outcomes[0].success
+    await service_session.refresh(job)
+    assert job.status == RetryJobStatus.COMPLETED
+
+
+@pytest.mark.asyncio
+async def test_success_recovers_payment_and_moves_stats(
+    service_session, processor_succeeds
+):
+    """A successful attempt marks the payment recovered and moves its rollup."""
+    payment = await make_payment(service_session, amount_cents=2500)
+
+    outcomes = await execute_retry_batch(
+        service_session,
+        [RetryAttempt.from_job(await make_job(service_session, payment))],
+    )
+
+    assert outcomes[0].new_status == PaymentStatus.RECOVERED
+    await service_session.refresh(payment)
+    assert payment.status == PaymentStatus.RECOVERED
+    assert payment.recovered_via_retry
+    assert await get_stats(service_session, payment.merchant_id) == {
+        PaymentStatus.FAILED: (-1, -2500),
+        PaymentStatus.RECOVERED: (1, 2500),
+    }
+
+
+@pytest.mark.asyncio
+async def test_failure_schedules_next_attempt(service_session, processor_fails):
+    """A failed attempt below max_attempts retries later with a new job."""
+    payment = await make_payment(service_session)
+    job = await make_job(service_session, payment)
+
+    outcomes = await execute_retry_batch(
+        service_session, [RetryAttempt.from_job(job)], schedule_next=True
+    )
+
+    assert outcomes[0].should_continue
+    assert outcomes[0].next_attempt == 2
+    await service_session.refresh(payment)
+    assert payment.status == PaymentStatus.RETRYING
+    assert payment.retry_count == 1
+    jobs = await get_jobs(service_session, payment)
+    assert [(j.attempt_number, j.status) for j in jobs] == [
+        (1, RetryJobStatus.FAILED),
+        (2, RetryJobStatus.PENDING),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_last_failed_attempt_exhausts_payment(service_session, processor_fails):
+    """The attempt reaching max_attempts exhausts the payment, with no new job."""
+    payment = await make_payment(service_session, status=PaymentStatus.RETRYING)
+    job = await make_job(service_session, payment, attempt=3)
+
+    outcomes = await execute_retry_batch(
+        service_session, [RetryAttempt.from_job(job)], schedule_next=True
+    )
+
+    assert outcomes[0].new_status == PaymentStatus.EXHAUSTED
+    assert outcomes[0].next_job is None
+    await service_session.refresh(payment)
+    assert payment.status == PaymentStatus.EXHAUSTED
+    assert payment.retry_count == 3
+    assert await get_stats(service_session, payment.merchant_id) == {
+        PaymentStatus.RETRYING: (-1, -1000),
+        PaymentStatus.EXHAUSTED: (1, 1000),
+    }
+
+
+@pytest.mark.asyncio
+async def test_final_payments_are_skipped(service_session, processor_succeeds):
+    """Attempts on payments in a final status cancel their job and change nothing."""
+    payment = await make_payment(service_session, status=PaymentStatus.RECOVERED)
+    job = await make_job(service_session, payment)
+
+    outcomes = await execute_retry_batch(service_session, [RetryAttempt.from_job(job)])
+
+    assert outcomes[0].result_code == "not_retryable"
+    assert (await get_jobs(service_session, payment))[0].status == (
+        RetryJobStatus.CANCELLED
+    )
+    assert await get_stats(service_session, payment.merchant_id) == {}
+
+
+@pytest.mark.asyncio
+async def test_second_attempt_for_same_payment_is_cancelled(
+    service_session, processor_fails
+):
+    """Only the first attempt of a payment in a batch runs."""
+    payment = await make_payment(service_session)
+    first = await make_job(service_session, payment, attempt=1)
+    second = await make_job(service_session, payment, attempt=2)
+
+    outcomes = await execute_retry_batch(
+        service_session,
+        [RetryAttempt.from_job(first), RetryAttempt.from_job(second)],
+    )
+
+    assert [o.result_code for o in outcomes][1] == "duplicate_attempt"
+    await service_session.refresh(payment)
+    assert payment.retry_count == 1
+    jobs = await get_jobs(service_session, payment)
+    assert [j.status for j in jobs] == [
+        RetryJobStatus.FAILED,
+        RetryJobStatus.CANCELLED,
+    ]
+
+
+@pytest.mark.asyncio
+async def test_card_over_budget_is_deferred(
+    service_session, processor_succeeds, monkeypatch
+):
+    """A card without retry budget puts its job back to PENDING for later."""
+    payment = await make_payment(service_session)
+    job = await make_job(service_session, payment)
+    monkeypatch.setattr(
+        retry_execution.card_limiter, "retry_after", lambda card, now: 600.0
+    )
+
+    outcomes = await execute_retry_batch(service_session, [RetryAttempt.from_job(job)])
+
+    assert outcomes[0].result_code == "card_limited"
+    assert outcomes[0].should_continue
+    job = (await get_jobs(service_session, payment))[0]
+    assert job.status == RetryJobStatus.PENDING
+    assert job.scheduled_at > datetime.now()
+    await service_session.refresh(payment)
+    assert payment.status == PaymentStatus.FAILED
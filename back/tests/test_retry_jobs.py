@@ -3,12 +3,16 @@ Unit tests for retry_jobs service.
 """
 
 from datetime import datetime
+from types import SimpleNamespace
 from typing import ClassVar
 from uuid import uuid4
 
 import pytest
+from sqlalchemy.dialects.postgresql.asyncpg import dialect as asyncpg_dialect
 from sqlmodel import Field, SQLModel, select
 
+from app.services.retry_jobs import defer_pending_jobs_for_processor
+
 
 # Simplified RetryJob model for SQLite testing
 class RetryJobTest(SQLModel, table=True):
@@ -249,3 +253,32 @@ async def test_multiple_payments_different_jobs(async_session):
     assert len(jobs2) == 1
     assert jobs1[0].failure_type == "network_timeout"
     assert jobs2[0].failure_type == "insufficient_funds"
+
+
+class RecordingSession:
+    """Captures executed statements instead of running them."""
+
+    def __init__(self):
+        self.statements = []
+
+    async def execute(self, statement, *args, **kwargs):
+        self.statements.append(statement)
+        return SimpleNamespace(rowcount=0)
+
+
+@pytest.mark.asyncio
+async def test_defer_finds_jobs_from_the_pending_queue():
+    """Deferral joins pending jobs to payments by key, no processor subquery."""
+    session = RecordingSession()
+    await defer_pending_jobs_for_processor(
+        session, "stripe", datetime.now(), spread_seconds=60
+    )
+
+    sql = " ".join(
+        str(session.statements[0].compile(dialect=asyncpg_dialect())).split()
+    )
+    assert sql.startswith("UPDATE retry_jobs SET")
+    assert "FROM payments WHERE" in sql
+    assert "retry_jobs.payment_id = payments.id" in sql
+    assert "payments.processor = $" in sql
+    assert "IN (SELECT" not in sql
@@ -0,0 +1,125 @@
+"""
+Unit tests for retry time planning (jitter and per-minute capacity).
+"""
+
+import random
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services.retry_planner import RetryPlanner
+
+NOW = datetime(2026, 1, 1, 12, 0, 0)
+
+
+# ============== TESTS ==============
+
+
+def test_jitter_is_bounded_and_never_early():
+    """Retries land between the delay and the delay plus its jitter window."""
+    planner = RetryPlanner(
+        jitter_ratio=0.1,
+        max_jitter_seconds=600.0,
+        capacity_per_minute=0,
+        max_shift_minutes=60,
+        rng=random.Random(7),
+    )
+    delay = 300.0  # 5 minutes -> 30s window
+
+    for _ in range(200):
+        at = planner.plan(NOW, delay)
+        assert NOW + timedelta(seconds=delay) <= at
+        assert at <= NOW + timedelta(seconds=delay + 30)
+
+
+def test_jitter_window_is_capped():
+    """Long delays use at most max_jitter_seconds of jitter."""
+    planner = RetryPlanner(
+        jitter_ratio=0.1,
+        max_jitter_seconds=600.0,
+        capacity_per_minute=0,
+        max_shift_minutes=60,
+        rng=random.Random(7),
+    )
+    day = 24 * 3600.0
+
+    for _ in range(200):
+        at = planner.plan(NOW, day)
+        assert at <= NOW + timedelta(seconds=day + 600)
+
+
+def test_burst_is_spread_over_the_window():
+    """A burst with the same delay no longer comes due in the same second."""
+    planner = RetryPlanner(
+        jitter_ratio=0.1,
+        max_jitter_seconds=600.0,
+        capacity_per_minute=0,
+        max_shift_minutes=60,
+        rng=random.Random(7),
+    )
+    seconds = {
+        planner.plan(NOW, 24 * 3600.0).replace(microsecond=0) for _ in range(1000)
+    }
+
+    assert len(seconds) > 400
+
+
+def test_capacity_per_minute_is_respected():
+    """Full minutes push retries to the next minute with room."""
+    planner = RetryPlanner(
+        jitter_ratio=0.0,
+        max_jitter_seconds=600.0,
+        capacity_per_minute=10,
+        max_shift_minutes=60,
+        rng=random.Random(7),
+    )
+    planned = [planner.plan(NOW, 3600.0) for _ in range(35)]
+
+    per_minute = Counter(at.replace(second=0, microsecond=0) for at in planned)
+    assert max(per_minute.values()) <= 10
+    assert len(per_minute) == 4
+    assert min(planned) == NOW + timedelta(hours=1)
+
+
+def test_shift_is_bounded():
+    """Past max_shift_minutes, retries keep their desired time."""
+    planner = RetryPlanner(
+        jitter_ratio=0.0,
+        max_jitter_seconds=600.0,
+        capacity_per_minute=1,
+        max_shift_minutes=2,
+        rng=random.Random(7),
+    )
+    planned = [planner.plan(NOW, 60.0) for _ in range(5)]
+
+    assert planned[-1] == NOW + timedelta(minutes=1)
+    assert max(planned) < NOW + timedelta(minutes=4)
+
+
+def test_past_minutes_are_forgotten():
+    """Capacity booked in past minutes does not leak into later planning."""
+    planner = RetryPlanner(
+        jitter_ratio=0.0,
+        max_jitter_seconds=600.0,
+        capacity_per_minute=1,
+        max_shift_minutes=60,
+        rng=random.Random(7),
+    )
+    planner.plan(NOW, 0.0)
+    later = NOW + timedelta(minutes=5)
+
+    assert planner.plan(later, 0.0) == later
+    assert planner.planned_in_minute(NOW) == 0
+
+
+def test_invalid_configuration():
+    """Negative settings are rejected."""
+    with pytest.raises(ValueError):
+        RetryPlanner(
+            jitter_ratio=0.1,
+            max_jitter_seconds=600.0,
+            capacity_per_minute=-1,
+            max_shift_minutes=60,
+            rng=random.Random(7),
+        )
@@ -0,0 +1,59 @@
+"""
+Unit tests for compiled retry policies.
+"""
+
+from uuid import uuid4
+
+import pytest
+from app.models.payment import FailureType
+from app.models.retry_config import MerchantRetryConfig
+from app.services.retry_policy import (
+    DEFAULT_DELAY_MINUTES,
+    DEFAULT_RETRY_POLICY,
+    RetryPolicy,
+)
+
+
+def make_config(**overrides) -> MerchantRetryConfig:
+    return MerchantRetryConfig(merchant_id=uuid4(), **overrides)
+
+
+# ============== TESTS ==============
+
+
+def test_rules_follow_config_columns():
+    """Each failure type with columns gets its enabled flag and delay."""
+    config = make_config(card_declined_enabled=False, network_timeout_delay=5)
+    policy = RetryPolicy.from_config(config)
+    assert policy.allows(FailureType.INSUFFICIENT_FUNDS)
+    assert not policy.allows(FailureType.CARD_DECLINED)
+    assert policy.delay_minutes(FailureType.NETWORK_TIMEOUT) == 5
+    assert policy.rule(FailureType.INSUFFICIENT_FUNDS).max_attempts == 3
+
+
+def test_types_without_columns_are_disabled():
+    """Failure types with no config columns are never retried."""
+    policy = RetryPolicy.from_config(make_config())
+    for failure_type in (FailureType.FRAUD, FailureType.EXPIRED, FailureType.UNKNOWN):
+        assert not policy.allows(failure_type)
+        assert policy.delay_minutes(failure_type) == DEFAULT_DELAY_MINUTES
+
+
+def test_global_switch_disables_every_type():
+    """retry_enabled=False turns off every rule."""
+    policy = RetryPolicy.from_config(make_config(retry_enabled=False))
+    assert not policy.retry_enabled
+    assert not any(policy.allows(failure_type) for failure_type in FailureType)
+
+
+def test_policy_is_immutable():
+    """Policies are shared between requests and cannot be changed."""
+    policy = RetryPolicy.from_config(make_config())
+    with pytest.raises(AttributeError):
+        policy.max_attempts = 5
+
+
+def test_default_policy():
+    """The fallback policy retries nothing but keeps the default limits."""
+    assert DEFAULT_RETRY_POLICY.max_attempts == 3
+    assert not DEFAULT_RETRY_POLICY.allows(FailureType.NETWORK_TIMEOUT)
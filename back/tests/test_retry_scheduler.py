@@ -0,0 +1,137 @@
+"""
+Unit tests for the native retry scheduler.
+"""
+
+import re
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from sqlalchemy.dialects.postgresql.asyncpg import dialect as asyncpg_dialect
+
+from app.models.payment import FailureType
+from app.models.retry_job import RetryJob, RetryJobStatus
+from app.services.retry_scheduler import RetryScheduler, build_claim_statement
+
+
+def make_scheduler(
+    batch_size=10, concurrency=1, max_held=None, merchant_cap=None, lookahead=1
+) -> RetryScheduler:
+    return RetryScheduler(
+        batch_size=batch_size,
+        poll_interval=1.0,
+        concurrency=concurrency,
+        lease_seconds=300,
+        horizon_seconds=60,
+        tick_seconds=0.1,
+        wheel_slots=64,
+        wheel_levels=3,
+        merchant_cap=merchant_cap,
+        claim_lookahead=lookahead,
+        max_held=max_held,
+    )
+
+
+def make_job(merchant_id=None, due_in_seconds=0.0) -> RetryJob:
+    return RetryJob(
+        id=uuid4(),
+        payment_id=uuid4(),
+        merchant_id=merchant_id or uuid4(),
+        attempt_number=1,
+        failure_type=FailureType.INSUFFICIENT_FUNDS,
+        scheduled_at=datetime.now() + timedelta(seconds=due_in_seconds),
+        status=RetryJobStatus.PROCESSING,
+    )
+
+
+# ============== TESTS ==============
+
+
+def test_claims_stop_while_too_many_jobs_are_held():
+    """The loader claims only up to max_held jobs waiting in memory."""
+    scheduler = make_scheduler(batch_size=10, max_held=15)
+    assert scheduler.claim_size() == 10
+
+    for _ in range(4):
+        scheduler.schedule(make_job(due_in_seconds=30), priority=1.0)
+    scheduler._enqueue([(1.0, make_job()) for _ in range(8)])
+
+    assert scheduler.held == 12
+    assert scheduler.claim_size() == 3
+
+    scheduler._enqueue([(1.0, make_job()) for _ in range(3)])
+    assert scheduler.claim_size() == 0
+
+
+def test_default_bound_covers_every_executor():
+    """Without max_held, two batches per executor may wait in memory."""
+    assert make_scheduler(batch_size=10, concurrency=4).max_held == 80
+
+
+def test_next_batch_is_highest_priority_first():
+    """Due jobs leave the queue in priority order, not arrival order."""
+    scheduler = make_scheduler(batch_size=3)
+    jobs = {priority: make_job() for priority in (5.0, 1.0, 9.0, 3.0)}
+    scheduler._enqueue(list(jobs.items()))
+
+    assert scheduler._next_batch() == [jobs[9.0], jobs[5.0], jobs[3.0]]
+    assert scheduler._next_batch() == [jobs[1.0]]
+
+
+def test_next_batch_caps_each_merchant_while_others_wait():
+    """A merchant with the top jobs gets merchant_cap slots, others the rest."""
+    scheduler = make_scheduler(batch_size=4, merchant_cap=2, lookahead=4)
+    big, small = uuid4(), uuid4()
+    big_jobs = [make_job(merchant_id=big) for _ in range(4)]
+    small_jobs = [make_job(merchant_id=small) for _ in range(2)]
+    scheduler._enqueue([(100.0 - i, job) for i, job in enumerate(big_jobs)])
+    scheduler._enqueue([(10.0 - i, job) for i, job in enumerate(small_jobs)])
+
+    assert scheduler._next_batch() == big_jobs[:2] + small_jobs
+    # The capped jobs went back to the queue, still in priority order
+    assert scheduler._next_batch() == big_jobs[2:]
+
+
+def test_next_batch_fills_leftover_room_with_capped_jobs():
+    """With no other merchant waiting, the cap does not leave slots empty."""
+    scheduler = make_scheduler(batch_size=4, merchant_cap=1, lookahead=4)
+    merchant_id = uuid4()
+    jobs = [make_job(merchant_id=merchant_id) for _ in range(5)]
+    scheduler._enqueue([(10.0 - i, job) for i, job in enumerate(jobs)])
+
+    assert scheduler._next_batch() == jobs[:4]
+    assert scheduler.held == 1
+
+
+def test_next_batch_scans_at_most_batch_times_lookahead():
+    """Finding other merchants' jobs stops after batch_size * lookahead pops."""
+    scheduler = make_scheduler(batch_size=2, merchant_cap=1, lookahead=2)
+    merchant_id = uuid4()
+    capped = [make_job(merchant_id=merchant_id) for _ in range(4)]
+    other = make_job()
+    scheduler._enqueue([(10.0 - i, job) for i, job in enumerate(capped)])
+    scheduler._enqueue([(1.0, other)])
+
+    # The other merchant's job is beyond the scan window
+    assert scheduler._next_batch() == capped[:2]
+    assert scheduler.held == 3
+
+
+def test_claim_statement_postgres_sql():
+    """The claim ranks in tiers per merchant and skips rows locked elsewhere."""
+    statement = build_claim_statement(
+        batch_size=10, merchant_cap=3, lookahead=2, attempt_decay=0.5
+    )
+    sql = " ".join(str(statement.compile(dialect=asyncpg_dialect())).split())
+
+    assert "row_number() OVER (PARTITION BY candidates.merchant_id ORDER BY" in sql
+    assert "payments.amount_cents * CASE candidates.failure_type" in sql
+    assert "power(" in sql
+    # Lower fairness tiers first, then priority
+    assert re.search(
+        r"ORDER BY \(ranked\.merchant_rank - \$\d+::INTEGER\) / \$\d+::INTEGER, "
+        r"ranked\.priority DESC LIMIT",
+        sql,
+    )
+    assert "FOR UPDATE OF retry_jobs SKIP LOCKED" in sql
+    assert sql.startswith("WITH candidates AS")
+    assert "RETURNING retry_jobs.id" in sql and sql.endswith("chosen.priority")
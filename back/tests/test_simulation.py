@@ -0,0 +1,102 @@
+"""
+Unit tests for the failure simulation endpoint.
+"""
+
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+
+from app.api.v1.endpoints import simulation
+from app.api.v1.endpoints.simulation import (
+    SimulateFailureRequest,
+    simulate_payment_failure,
+)
+from app.core.config import settings
+from app.models.merchant import Merchant
+from app.models.payment import FailureType
+from app.models.retry_config import MerchantRetryConfig
+
+
+class RecordingClient:
+    """Stands in for httpx.AsyncClient and records every POST."""
+
+    posts: list[tuple[str, dict]] = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def post(self, url, json, timeout):
+        self.posts.append((url, json))
+        return SimpleNamespace(status_code=200)
+
+
+async def make_merchant(session) -> Merchant:
+    merchant = Merchant(name="Merchant", email=f"{uuid4()}@example.com")
+    session.add(merchant)
+    await session.flush()
+    session.add(MerchantRetryConfig(merchant_id=merchant.id))
+    await session.commit()
+    return merchant
+
+
+@pytest.fixture
+def webhooks(monkeypatch) -> list:
+    """Webhooks the endpoint posts to n8n."""
+    monkeypatch.setattr(RecordingClient, "posts", [])
+    monkeypatch.setattr(simulation.httpx, "AsyncClient", RecordingClient)
+    return RecordingClient.posts
+
+
+# ============== TESTS ==============
+
+
+@pytest.mark.asyncio
+async def test_native_scheduling_skips_n8n_without_local_scheduler(
+    service_session, webhooks, monkeypatch
+):
+    """With dedicated workers (API scheduler off), n8n is not notified."""
+    monkeypatch.setattr(settings, "RETRY_NATIVE_SCHEDULING", True)
+    monkeypatch.setattr(settings, "RETRY_SCHEDULER_ENABLED", False)
+    merchant = await make_merchant(service_session)
+
+    response = await simulate_payment_failure(
+        SimulateFailureRequest(
+            merchant_id=merchant.id, failure_type=FailureType.CARD_DECLINED
+        ),
+        service_session,
+    )
+
+    assert response.retry_scheduled
+    assert not response.n8n_triggered
+    assert webhooks == []
+
+
+@pytest.mark.asyncio
+async def test_n8n_scheduling_sends_the_webhook(service_session, webhooks, monkeypatch):
+    """Without native scheduling the retry chain is handed to n8n."""
+    monkeypatch.setattr(settings, "RETRY_NATIVE_SCHEDULING", False)
+    monkeypatch.setattr(settings, "RETRY_SCHEDULER_ENABLED", False)
+    merchant = await make_merchant(service_session)
+
+    response = await simulate_payment_failure(
+        SimulateFailureRequest(
+            merchant_id=merchant.id, failure_type=FailureType.CARD_DECLINED
+        ),
+        service_session,
+    )
+
+    assert response.n8n_triggered
+    [(url, payload)] = webhooks
+    assert url.endswith("/payment-failed")
+    assert payload["payment_id"] == str(response.payment_id)
+
+
+def test_local_scheduler_implies_native_scheduling(monkeypatch):
+    """Running the scheduler in the API never also hands retries to n8n."""
+    monkeypatch.setattr(settings, "RETRY_NATIVE_SCHEDULING", False)
+    monkeypatch.setattr(settings, "RETRY_SCHEDULER_ENABLED", True)
+    assert settings.native_scheduling
@@ -0,0 +1,58 @@
+"""
+Unit tests for the prebuilt hot-path statements.
+"""
+
+import pytest
+from sqlalchemy.dialects.postgresql.asyncpg import dialect as asyncpg_dialect
+
+from app.services.statements import (
+    CLOSE_RETRY_JOB,
+    CONFIG_BY_MERCHANT,
+    INSERT_AUDIT_LOGS,
+    PAYMENT_BY_ID,
+    TRANSITION_PAYMENT,
+)
+
+PREBUILT = [
+    PAYMENT_BY_ID,
+    CONFIG_BY_MERCHANT,
+    CLOSE_RETRY_JOB,
+    INSERT_AUDIT_LOGS,
+    TRANSITION_PAYMENT[True],
+    TRANSITION_PAYMENT[False],
+]
+
+
+DIALECT = asyncpg_dialect()
+
+
+def compile_cached(statement, cache: dict):
+    return statement._compile_w_cache(
+        DIALECT, compiled_cache=cache, column_keys=[], for_executemany=False
+    )
+
+
+# ============== TESTS ==============
+
+
+@pytest.mark.parametrize("statement", PREBUILT)
+def test_prebuilt_statements_hit_compiled_cache(statement):
+    """Every prebuilt statement is cacheable, so it compiles only once."""
+    cache: dict = {}
+    compile_cached(statement, cache)
+    _, _, cache_hit = compile_cached(statement, cache)
+    assert cache_hit == cache_hit.CACHE_HIT
+
+
+def test_transition_takes_values_as_parameters():
+    """Per-call values are bind parameters, not literals baked into the SQL."""
+    compiled = TRANSITION_PAYMENT[False].compile(dialect=DIALECT)
+    assert {
+        "payment_id",
+        "now",
+        "attempt_number",
+        "retry_count",
+        "audit_id",
+        "metadata_json",
+    } <= set(compiled.binds)
+    assert "ON CONFLICT (merchant_id, status)" in str(compiled)
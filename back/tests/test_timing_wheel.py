@@ -0,0 +1,102 @@
+"""
+Unit tests for the hierarchical timing wheel.
+"""
+
+import random
+
+import pytest
+
+from app.services.timing_wheel import TimingWheel
+
+
+# ============== TESTS ==============
+
+
+def test_item_expires_on_its_tick():
+    """Items are returned only once their expiry tick is reached."""
+    wheel = TimingWheel(tick_seconds=1.0, slots=4, levels=3, now=0.0)
+    assert wheel.add("job-1", 3.0, "job-1")
+
+    assert wheel.advance(2.0) == []
+    assert wheel.advance(3.0) == ["job-1"]
+    assert len(wheel) == 0
+
+
+def test_items_cascade_from_higher_levels():
+    """Items stored in upper levels cascade down and expire on time."""
+    wheel = TimingWheel(tick_seconds=1.0, slots=4, levels=3, now=0.0)
+    wheel.add("far", 37.0, "far")  # Level 2 with 4 slots per level
+
+    assert wheel.advance(36.0) == []
+    assert wheel.advance(37.0) == ["far"]
+
+
+def test_past_due_items_expire_on_next_advance():
+    """Items already due when inserted are returned immediately."""
+    wheel = TimingWheel(tick_seconds=1.0, slots=4, levels=3, now=100.0)
+    wheel.add("late", 50.0, "late")
+
+    assert wheel.advance(100.0) == ["late"]
+
+
+def test_add_beyond_horizon_is_rejected():
+    """Items past the horizon stay out of the wheel."""
+    wheel = TimingWheel(tick_seconds=1.0, slots=4, levels=3, now=0.0)
+
+    assert wheel.horizon_seconds == 64.0
+    assert wheel.add("too-far", 64.0, "too-far") is False
+    assert "too-far" not in wheel
+
+
+def test_remove_cancels_item():
+    """Removed items never expire."""
+    wheel = TimingWheel(tick_seconds=1.0, slots=4, levels=3, now=0.0)
+    wheel.add("job-1", 5.0, "job-1")
+
+    assert wheel.remove("job-1") is True
+    assert wheel.remove("job-1") is False
+    assert wheel.advance(10.0) == []
+
+
+def test_re_adding_key_reschedules():
+    """Adding an existing key moves it instead of duplicating it."""
+    wheel = TimingWheel(tick_seconds=1.0, slots=4, levels=3, now=0.0)
+    wheel.add("job-1", 5.0, "job-1")
+    wheel.add("job-1", 20.0, "job-1")
+
+    assert len(wheel) == 1
+    assert wheel.advance(10.0) == []
+    assert wheel.advance(20.0) == ["job-1"]
+
+
+def test_drain_returns_everything():
+    """Draining empties the wheel whatever the expiry times."""
+    wheel = TimingWheel(tick_seconds=1.0, slots=4, levels=3, now=0.0)
+    wheel.add("soon", 1.0, "soon")
+    wheel.add("later", 50.0, "later")
+
+    assert sorted(wheel.drain()) == ["later", "soon"]
+    assert len(wheel) == 0
+    assert wheel.advance(60.0) == []
+
+
+def test_invalid_configuration():
+    """Degenerate wheels are rejected."""
+    with pytest.raises(ValueError):
+        TimingWheel(tick_seconds=1.0, slots=1, levels=3, now=0.0)
+
+
+def test_matches_reference_schedule():
+    """Randomized schedule expires every item exactly on its tick."""
+    rng = random.Random(42)
+    wheel = TimingWheel(tick_seconds=1.0, slots=8, levels=3, now=0.0)
+    expected: dict[int, list[int]] = {}
+
+    for key in range(500):
+        tick = rng.randrange(1, 500)
+        wheel.add(key, float(tick), key)
+        expected.setdefault(tick, []).append(key)
+
+    for tick in range(1, 500):
+        assert sorted(wheel.advance(float(tick))) == sorted(expected.get(tick, []))
+    assert len(wheel) == 0
@@ -0,0 +1,109 @@
+"""
+Unit tests for the TTL + LRU cache.
+"""
+
+import pytest
+
+from app.services.ttl_cache import MISSING, TTLCache
+
+
+def make_cache(max_entries: int = 3, ttl_seconds: float = 10.0) -> TTLCache:
+    return TTLCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+
+
+# ============== TESTS ==============
+
+
+def test_miss_then_hit():
+    """A stored value is returned until it expires."""
+    cache = make_cache()
+    assert cache.get("a", now=0) is MISSING
+    cache.set("a", 1, now=0)
+    assert cache.get("a", now=5) == 1
+    assert cache.hits == 1
+    assert cache.misses == 1
+
+
+def test_none_is_a_cached_value():
+    """None is cached and distinguishable from a miss."""
+    cache = make_cache()
+    cache.set("a", None, now=0)
+    assert cache.get("a", now=1) is None
+    assert cache.hits == 1
+
+
+def test_entries_expire_after_ttl():
+    """Expired entries count as misses and are dropped."""
+    cache = make_cache(ttl_seconds=10)
+    cache.set("a", 1, now=0)
+    assert cache.get("a", now=10) is MISSING
+    assert len(cache) == 0
+
+
+def test_least_recently_used_is_evicted():
+    """Past max_entries the least recently used entry goes first."""
+    cache = make_cache(max_entries=2)
+    cache.set("a", 1, now=0)
+    cache.set("b", 2, now=0)
+    cache.get("a", now=1)
+    cache.set("c", 3, now=2)
+    assert cache.get("b", now=3) is MISSING
+    assert cache.get("a", now=3) == 1
+    assert cache.evictions == 1
+
+
+def test_invalidate():
+    """Invalidated keys miss on the next lookup."""
+    cache = make_cache()
+    cache.set("a", 1, now=0)
+    assert cache.invalidate("a") is True
+    assert cache.invalidate("a") is False
+    assert cache.get("a", now=1) is MISSING
+
+
+def test_value_loaded_across_an_invalidation_is_dropped():
+    """set() with a generation taken before invalidate() caches nothing."""
+    cache = make_cache()
+    generation = cache.generation("a")
+    cache.invalidate("a")
+
+    cache.set("a", "stale", now=0, generation=generation)
+    assert cache.get("a", now=1) is MISSING
+
+    cache.set("a", "fresh", now=0, generation=cache.generation("a"))
+    assert cache.get("a", now=1) == "fresh"
+
+
+def test_clear_outdates_every_generation():
+    """Generations taken before clear() or a counter reset no longer match."""
+    cache = make_cache()
+    before_clear = cache.generation("a")
+    cache.clear()
+    cache.set("a", 1, now=0, generation=before_clear)
+    assert cache.get("a", now=1) is MISSING
+
+    # Invalidating more keys than max_entries resets the counters
+    generation = cache.generation("a")
+    for key in range(cache.max_entries + 1):
+        cache.invalidate(key)
+    cache.set("a", 1, now=0, generation=generation)
+    assert cache.get("a", now=1) is MISSING
+
+
+def test_stats_hit_ratio():
+    """Stats report counters and the hit ratio."""
+    cache = make_cache()
+    cache.set("a", 1, now=0)
+    cache.get("a", now=1)
+    cache.get("b", now=1)
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1
+    assert stats["hit_ratio"] == 0.5
+
+
+def test_rejects_invalid_settings():
+    """Zero capacity or TTL is rejected."""
+    with pytest.raises(ValueError):
+        make_cache(max_entries=0)
+    with pytest.raises(ValueError):
+        make_cache(ttl_seconds=0)